@@ -1,13 +1,17 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 
 from fastapi import APIRouter, Depends, Query, HTTPException
+from pydantic import BaseModel
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import CATALOG, invalidate
 from app.core.database import get_db
 from app.core.config import settings
-from app.core.security import require_admin, hash_password
+from app.core.passwords import passwords
+from app.core.security import require_admin
 from app.models.user import User
 from app.models.order import Order
 from app.models.booking import Booking
@@ -17,9 +21,18 @@ from app.models.payment import Payment
 from app.models.transaction import Transaction
 from app.models.payout import Payout
 from app.models.delivery import Delivery
+from app.utils.pagination import Keyset, count_strategy, fetch_page
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+ORDERS_NEWEST = Keyset("newest", Order.created_at, Order.id)
+USERS_NEWEST = Keyset("newest", User.created_at, User.id)
+BOOKINGS_NEWEST = Keyset("newest", Booking.created_at, Booking.id)
+PAYMENTS_NEWEST = Keyset("newest", Payment.created_at, Payment.id)
+TRANSACTIONS_NEWEST = Keyset("newest", Transaction.created_at, Transaction.id)
+PAYOUTS_NEWEST = Keyset("newest", Payout.created_at, Payout.id)
+DELIVERIES_NEWEST = Keyset("newest", Delivery.created_at, Delivery.id)
+
 
 def _id():
     return str(uuid.uuid4())
@@ -106,7 +119,7 @@ async def seed_database(
     # Admin user
     existing = await db.execute(select(User).where(User.email == "admin@quickgift.ng"))
     if not existing.scalars().first():
-        db.add(User(id=_id(), full_name="QuickGift Admin", phone="+2348000000000", email="admin@quickgift.ng", password_hash=hash_password("admin123"), role="admin", city="Lagos", is_active=True))
+        db.add(User(id=_id(), full_name="QuickGift Admin", phone="+2348000000000", email="admin@quickgift.ng", password_hash=await passwords.hash("admin123"), role="admin", city="Lagos", is_active=True))
         await db.flush()
         results.append("Admin user created")
     else:
@@ -154,9 +167,11 @@ async def seed_database(
     # Providers
     prov_count = await db.scalar(select(func.count()).select_from(Provider))
     if not prov_count or prov_count == 0:
+        # Every seed provider shares the demo password — hash it once
+        provider_hash = await passwords.hash("provider123")
         for entry in SEED_PROVIDERS:
             uid = _id()
-            db.add(User(id=uid, **entry["user"], is_active=True, password_hash=hash_password("provider123")))
+            db.add(User(id=uid, **entry["user"], is_active=True, password_hash=provider_hash))
             pid = _id()
             db.add(Provider(id=pid, user_id=uid, **entry["provider"]))
             for svc in entry["services"]:
@@ -167,73 +182,19 @@ async def seed_database(
         results.append(f"Providers: already has {prov_count}")
 
     await db.commit()
+    await invalidate(CATALOG)
     return {"status": "ok", "results": results}
 
 
 @router.get("/dashboard")
 async def dashboard_stats(
+    refresh: bool = False,
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    # Total revenue
-    order_revenue = (await db.execute(
-        select(func.coalesce(func.sum(Order.total), 0)).where(Order.payment_status == "paid")
-    )).scalar()
-
-    booking_revenue = (await db.execute(
-        select(func.coalesce(func.sum(Booking.price), 0)).where(Booking.payment_status == "paid")
-    )).scalar()
-
-    # Counts
-    total_orders = (await db.execute(select(func.count(Order.id)))).scalar()
-    total_bookings = (await db.execute(select(func.count(Booking.id)))).scalar()
-    total_users = (await db.execute(select(func.count(User.id)))).scalar()
-    total_providers = (await db.execute(select(func.count(Provider.id)))).scalar()
-    total_products = (await db.execute(select(func.count(Product.id)))).scalar()
-
-    # Pending items
-    pending_orders = (await db.execute(
-        select(func.count(Order.id)).where(Order.status == "pending")
-    )).scalar()
-    pending_providers = (await db.execute(
-        select(func.count(Provider.id)).where(Provider.status == "pending")
-    )).scalar()
-    pending_bookings = (await db.execute(
-        select(func.count(Booking.id)).where(Booking.status == "pending")
-    )).scalar()
-
-    # Commission earned
-    order_commission = (await db.execute(
-        select(func.coalesce(func.sum(Order.commission), 0)).where(Order.payment_status == "paid")
-    )).scalar()
-    booking_commission = (await db.execute(
-        select(func.coalesce(func.sum(Booking.commission), 0)).where(Booking.payment_status == "paid")
-    )).scalar()
-
-    return {
-        "revenue": {
-            "total": order_revenue + booking_revenue,
-            "gifts": order_revenue,
-            "beauty": booking_revenue,
-        },
-        "commission": {
-            "total": order_commission + booking_commission,
-            "gifts": order_commission,
-            "beauty": booking_commission,
-        },
-        "counts": {
-            "orders": total_orders,
-            "bookings": total_bookings,
-            "users": total_users,
-            "providers": total_providers,
-            "products": total_products,
-        },
-        "pending": {
-            "orders": pending_orders,
-            "providers": pending_providers,
-            "bookings": pending_bookings,
-        },
-    }
+    """Headline revenue, commission, count and pending figures (one query)."""
+    from app.services.stats import get_dashboard_stats
+    return await get_dashboard_stats(db, refresh=refresh)
 
 
 @router.get("/orders")
@@ -242,6 +203,8 @@ async def admin_list_orders(
     order_type: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -252,13 +215,12 @@ async def admin_list_orders(
     if order_type:
         query = query.where(Order.order_type == order_type)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-
-    query = query.order_by(Order.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    orders = result.scalars().all()
+    orders, total, next_cursor = await fetch_page(
+        db, query, ORDERS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if (status or order_type) else Order.__table__,
+    )
 
-    return {"items": orders, "total": total, "page": page, "per_page": per_page}
+    return {"items": orders, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 @router.get("/users")
@@ -266,6 +228,8 @@ async def admin_list_users(
     search: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -276,11 +240,10 @@ async def admin_list_users(
             User.full_name.ilike(f"%{search}%") | User.email.ilike(f"%{search}%") | User.phone.ilike(f"%{search}%")
         )
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-
-    query = query.order_by(User.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    users = result.scalars().all()
+    users, total, next_cursor = await fetch_page(
+        db, query, USERS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if search else User.__table__,
+    )
 
     # Strip password_hash from response
     safe_users = []
@@ -288,7 +251,7 @@ async def admin_list_users(
         d = {c.name: getattr(u, c.name) for c in u.__table__.columns if c.name != 'password_hash'}
         safe_users.append(d)
 
-    return {"items": safe_users, "total": total, "page": page, "per_page": per_page}
+    return {"items": safe_users, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 @router.get("/providers")
@@ -312,6 +275,8 @@ async def admin_list_bookings(
     status: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -320,13 +285,12 @@ async def admin_list_bookings(
     if status:
         query = query.where(Booking.status == status)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-
-    query = query.order_by(Booking.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    bookings = result.scalars().all()
+    bookings, total, next_cursor = await fetch_page(
+        db, query, BOOKINGS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if status else Booking.__table__,
+    )
 
-    return {"items": bookings, "total": total, "page": page, "per_page": per_page}
+    return {"items": bookings, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 # ---------------------------------------------------------------------------
@@ -338,6 +302,8 @@ async def admin_list_payments(
     status: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -345,12 +311,12 @@ async def admin_list_payments(
     if status:
         query = query.where(Payment.status == status)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-    query = query.order_by(Payment.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    payments = result.scalars().all()
+    payments, total, next_cursor = await fetch_page(
+        db, query, PAYMENTS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if status else Payment.__table__,
+    )
 
-    return {"items": payments, "total": total, "page": page, "per_page": per_page}
+    return {"items": payments, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 # ---------------------------------------------------------------------------
@@ -362,6 +328,8 @@ async def admin_list_transactions(
     type: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -369,12 +337,12 @@ async def admin_list_transactions(
     if type:
         query = query.where(Transaction.type == type)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-    query = query.order_by(Transaction.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    txns = result.scalars().all()
+    txns, total, next_cursor = await fetch_page(
+        db, query, TRANSACTIONS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if type else Transaction.__table__,
+    )
 
-    return {"items": txns, "total": total, "page": page, "per_page": per_page}
+    return {"items": txns, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 # ---------------------------------------------------------------------------
@@ -386,6 +354,8 @@ async def admin_list_payouts(
     status: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -393,12 +363,12 @@ async def admin_list_payouts(
     if status:
         query = query.where(Payout.status == status)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-    query = query.order_by(Payout.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    payouts = result.scalars().all()
+    payouts, total, next_cursor = await fetch_page(
+        db, query, PAYOUTS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if status else Payout.__table__,
+    )
 
-    return {"items": payouts, "total": total, "page": page, "per_page": per_page}
+    return {"items": payouts, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 @router.patch("/payouts/{payout_id}/release")
@@ -523,6 +493,8 @@ async def admin_list_deliveries(
     status: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -530,12 +502,12 @@ async def admin_list_deliveries(
     if status:
         query = query.where(Delivery.status == status)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-    query = query.order_by(Delivery.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    deliveries = result.scalars().all()
+    deliveries, total, next_cursor = await fetch_page(
+        db, query, DELIVERIES_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+        estimate_table=None if status else Delivery.__table__,
+    )
 
-    return {"items": deliveries, "total": total, "page": page, "per_page": per_page}
+    return {"items": deliveries, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 # ---------------------------------------------------------------------------
@@ -554,6 +526,123 @@ async def get_settings(admin: dict = Depends(require_admin)):
     }
 
 
+@router.get("/integrations/http")
+async def http_client_stats(admin: dict = Depends(require_admin)):
+    """Request counts, latency and pool usage of the outbound HTTP clients."""
+    from app.core.http import HTTP2_AVAILABLE, http_clients
+    return {"http2": HTTP2_AVAILABLE, "clients": http_clients.stats()}
+
+
+# ---------------------------------------------------------------------------
+# Broadcast notifications (Admin)
+# ---------------------------------------------------------------------------
+
+class BroadcastRequest(BaseModel):
+    title: str
+    body: str
+    role: Optional[str] = None  # "user" / "provider"; all users when omitted
+    city: Optional[str] = None
+    data: Optional[dict] = None
+
+
+@router.post("/notifications/broadcast")
+async def broadcast_notification(
+    req: BroadcastRequest,
+    admin: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """In-app + push notification to every matching active user."""
+    from app.core.notify import notify_many
+    query = select(User.id).where(User.is_active == True)
+    if req.role:
+        query = query.where(User.role == req.role)
+    if req.city:
+        query = query.where(func.lower(User.city) == req.city.lower())
+    user_ids = (await db.execute(query)).scalars().all()
+    recipients = await notify_many(user_ids, req.title, req.body, "system", req.data or {"type": "broadcast"}, db)
+    await db.commit()
+    return {"status": "queued", "recipients": recipients}
+
+
+@router.get("/integrations/push")
+async def push_queue_stats(admin: dict = Depends(require_admin)):
+    """Push queue depth, receipts awaited and dropped messages."""
+    from app.core.push import dispatcher
+    return dispatcher.stats()
+
+
+@router.get("/integrations/passwords")
+async def password_hashing_stats(admin: dict = Depends(require_admin)):
+    """bcrypt pool size, operations, waiting callers and average cost."""
+    return passwords.stats()
+
+
+# ---------------------------------------------------------------------------
+# Payment webhooks (Admin)
+# ---------------------------------------------------------------------------
+
+@router.get("/webhooks")
+async def admin_list_webhook_events(
+    status: str = None,
+    reference: str = None,
+    limit: int = Query(50, ge=1, le=200),
+    admin: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Stored Paystack webhook events, newest first."""
+    from app.models.payment import WebhookEvent
+    query = select(WebhookEvent).order_by(WebhookEvent.received_at.desc()).limit(limit)
+    if status:
+        query = query.where(WebhookEvent.status == status)
+    if reference:
+        query = query.where(WebhookEvent.reference == reference)
+    events = (await db.execute(query)).scalars().all()
+    return [
+        {
+            "id": e.id, "event": e.event, "reference": e.reference, "status": e.status,
+            "attempts": e.attempts, "last_error": e.last_error,
+            "received_at": e.received_at, "processed_at": e.processed_at,
+        }
+        for e in events
+    ]
+
+
+@router.post("/webhooks/{event_id}/replay")
+async def replay_webhook_event(
+    event_id: str,
+    admin: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue a stored webhook event to be processed again."""
+    from app.core.jobs import enqueue_job
+    from app.models.payment import WebhookEvent
+    event = await db.get(WebhookEvent, event_id)
+    if not event:
+        raise HTTPException(status_code=404, detail="Webhook event not found")
+    event.status = "received"
+    await enqueue_job(db, "paystack.webhook", {"event_id": event.id})
+    await db.commit()
+    return {"status": "queued", "event_id": event.id}
+
+
+# ---------------------------------------------------------------------------
+# Ratings maintenance (Admin)
+# ---------------------------------------------------------------------------
+
+@router.post("/ratings/reconcile")
+async def reconcile_rating_aggregates(
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    admin: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Rebuild rating aggregates from the reviews table (all, or one target)."""
+    from app.services.ratings import reconcile_ratings
+    rebuilt = await reconcile_ratings(db, target_type, target_id)
+    await db.commit()
+    return {"status": "ok", "aggregates_rebuilt": rebuilt}
+
+
 # ---------------------------------------------------------------------------
 # Revenue analytics (Admin)
 # ---------------------------------------------------------------------------
@@ -564,32 +653,38 @@ async def revenue_analytics(
     db: AsyncSession = Depends(get_db),
 ):
     """Get revenue data grouped by day for the last 7 days."""
-    from sqlalchemy import text
-    rows = []
-    for i in range(6, -1, -1):
-        day_label = (datetime.utcnow() - __import__('datetime').timedelta(days=i)).strftime('%a')
-        day_start = (datetime.utcnow() - __import__('datetime').timedelta(days=i)).replace(hour=0, minute=0, second=0)
-        day_end = day_start + __import__('datetime').timedelta(days=1)
-
-        gift_rev = (await db.execute(
-            select(func.coalesce(func.sum(Order.total), 0)).where(
-                Order.payment_status == "paid",
-                Order.created_at >= day_start,
-                Order.created_at < day_end,
-            )
-        )).scalar()
-
-        beauty_rev = (await db.execute(
-            select(func.coalesce(func.sum(Booking.price), 0)).where(
-                Booking.payment_status == "paid",
-                Booking.created_at >= day_start,
-                Booking.created_at < day_end,
-            )
-        )).scalar()
-
-        rows.append({"name": day_label, "gifts": gift_rev, "beauty": beauty_rev})
+    from app.services.analytics import revenue_series
+    series = await revenue_series(db, "day")
+    await db.commit()  # Keep any rollups materialized for settled days
+    return [
+        {"name": date.fromisoformat(b["period"]).strftime("%a"), "gifts": b["gifts"], "beauty": b["beauty"]}
+        for b in series
+    ]
+
+
+@router.get("/analytics/revenue/series")
+async def revenue_time_series(
+    interval: str = Query("day", pattern="^(day|week|month)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tz: Optional[str] = None,
+    refresh: bool = False,
+    admin: dict = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Paid revenue bucketed by local day/week/month between start and end (inclusive).
 
-    return rows
+    Defaults to the last 7 days in ANALYTICS_TIMEZONE (WAT). ``refresh``
+    rebuilds the stored rollups for the range.
+    """
+    from app.services.analytics import revenue_series
+    buckets = await revenue_series(db, interval, start, end, tz, refresh)
+    await db.commit()
+    return {
+        "interval": interval,
+        "timezone": tz or settings.ANALYTICS_TIMEZONE,
+        "buckets": buckets,
+    }
 
 
 # ---------------------------------------------------------------------------
@@ -601,6 +696,8 @@ async def admin_list_withdrawals(
     status: str = None,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    count: str = Depends(count_strategy),
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
@@ -609,11 +706,11 @@ async def admin_list_withdrawals(
     if status:
         query = query.where(Transaction.status == status)
 
-    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
-    query = query.order_by(Transaction.created_at.desc()).offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
+    items, total, next_cursor = await fetch_page(
+        db, query, TRANSACTIONS_NEWEST, page=page, per_page=per_page, cursor=cursor, count=count,
+    )
 
-    return {"items": result.scalars().all(), "total": total, "page": page, "per_page": per_page}
+    return {"items": items, "total": total, "page": page, "per_page": per_page, "next_cursor": next_cursor}
 
 
 @router.patch("/withdrawals/{transaction_id}/complete")
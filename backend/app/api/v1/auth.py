@@ -1,17 +1,14 @@
-from datetime import datetime, timedelta
-
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import (
-    hash_password, verify_password, create_access_token,
-    generate_otp, get_current_user,
-)
+from app.core.otp import consume_otp, issue_otp, limiter
+from app.core.passwords import passwords
+from app.core.security import create_access_token, get_current_user
 from app.core.config import settings
 from app.core.sms import send_otp_sms
-from app.models.user import User, OTP
+from app.models.user import User
 from app.models.provider import Provider
 from pydantic import BaseModel
 from app.schemas.auth import (
@@ -50,24 +47,11 @@ async def send_otp(req: SendOTPRequest, db: AsyncSession = Depends(get_db)):
             detail="Invalid phone number. Please use a valid Nigerian number (e.g. +2348012345678, 08012345678).",
         )
 
-    # Rate limit: max 5 OTPs per phone in 10 minutes
-    from sqlalchemy import func
-    recent_count = await db.scalar(
-        select(func.count(OTP.id)).where(
-            OTP.phone == req.phone,
-            OTP.created_at >= datetime.utcnow() - timedelta(minutes=10),
-        )
-    )
-    if (recent_count or 0) >= 5:
+    # Rate limit: OTP_RATE_BURST codes per phone, refilled over OTP_RATE_WINDOW
+    if not await limiter.allow(req.phone):
         raise HTTPException(status_code=429, detail="Too many OTP requests. Please wait a few minutes.")
 
-    code = generate_otp()
-    otp = OTP(
-        phone=req.phone,
-        code=code,
-        expires_at=datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRE_MINUTES),
-    )
-    db.add(otp)
+    code = await issue_otp(req.phone, db)
     await db.commit()
 
     # Send OTP via Termii SMS
@@ -84,18 +68,9 @@ async def send_otp(req: SendOTPRequest, db: AsyncSession = Depends(get_db)):
 
 @router.post("/verify-otp", response_model=TokenResponse)
 async def verify_otp(req: VerifyOTPRequest, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(OTP)
-        .where(OTP.phone == req.phone, OTP.code == req.code, OTP.is_used == False)
-        .order_by(OTP.created_at.desc())
-    )
-    otp = result.scalars().first()
-
-    if not otp or otp.expires_at < datetime.utcnow():
+    if not await consume_otp(req.phone, req.code, db):
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
-    otp.is_used = True
-
     # Find existing user
     user_result = await db.execute(select(User).where(User.phone == req.phone))
     user = user_result.scalars().first()
@@ -145,18 +120,9 @@ async def register(req: RegisterRequest, db: AsyncSession = Depends(get_db)):
         )
 
     # Verify OTP first
-    otp_result = await db.execute(
-        select(OTP)
-        .where(OTP.phone == req.phone, OTP.code == req.otp, OTP.is_used == False)
-        .order_by(OTP.created_at.desc())
-    )
-    otp = otp_result.scalars().first()
-
-    if not otp or otp.expires_at < datetime.utcnow():
+    if not await consume_otp(req.phone, req.otp, db):
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
 
-    otp.is_used = True
-
     # Check if phone already exists
     existing = await db.execute(select(User).where(User.phone == req.phone))
     existing_user = existing.scalars().first()
@@ -175,7 +141,7 @@ async def register(req: RegisterRequest, db: AsyncSession = Depends(get_db)):
         if req.email:
             existing_user.email = req.email
         if req.password:
-            existing_user.password_hash = hash_password(req.password)
+            existing_user.password_hash = await passwords.hash(req.password)
         if req.city:
             existing_user.city = req.city
 
@@ -199,7 +165,7 @@ async def register(req: RegisterRequest, db: AsyncSession = Depends(get_db)):
             full_name=req.full_name,
             phone=req.phone,
             email=req.email,
-            password_hash=hash_password(req.password) if req.password else None,
+            password_hash=await passwords.hash(req.password) if req.password else None,
             city=req.city,
             role=role,
         )
@@ -243,12 +209,18 @@ async def login(req: LoginRequest, db: AsyncSession = Depends(get_db)):
     if not user or not user.password_hash:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    if not verify_password(req.password, user.password_hash):
+    ok, new_hash = await passwords.verify(req.password, user.password_hash)
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account deactivated")
 
+    if new_hash:
+        # Hashed with an older bcrypt cost — upgrade while we have the password
+        user.password_hash = new_hash
+        await db.commit()
+
     # Check if provider has completed profile
     profile_complete = True
     if user.role == "provider":
@@ -7,7 +7,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import get_current_user, require_admin
+from app.core.security import CurrentUser, get_current_user, require_admin
 from app.core.config import settings
 from app.core.push import send_push
 from app.core.notify import notify_user
@@ -66,12 +66,10 @@ async def create_booking(
         notes=req.notes,
     )
     db.add(booking)
-    await db.commit()
-    await db.refresh(booking)
+    await db.flush()
 
-    # Notify provider (push + in-app)
-    buyer_result = await db.execute(select(User).where(User.id == current_user["user_id"]))
-    buyer = buyer_result.scalars().first()
+    # Notify provider (in-app now, push after commit) — one transaction
+    buyer = await db.get(User, current_user["user_id"])
     buyer_name = buyer.full_name if buyer else "A customer"
     await notify_user(
         provider.user_id,
@@ -82,6 +80,7 @@ async def create_booking(
         db,
     )
     await db.commit()
+    await db.refresh(booking)
 
     return booking
 
@@ -92,18 +91,14 @@ async def list_bookings(
     date: Optional[str] = None,
     page: int = 1,
     per_page: int = 20,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     if current_user.get("role") == "provider":
-        # Look up Provider record by user_id to get the provider's id
-        provider_result = await db.execute(
-            select(Provider).where(Provider.user_id == current_user["user_id"])
-        )
-        provider = provider_result.scalars().first()
-        if not provider:
+        provider_id = await current_user.provider_id(db)
+        if not provider_id:
             raise HTTPException(status_code=404, detail="Provider profile not found")
-        query = select(Booking).where(Booking.provider_id == provider.id)
+        query = select(Booking).where(Booking.provider_id == provider_id)
     else:
         query = select(Booking).where(Booking.user_id == current_user["user_id"])
 
@@ -144,7 +139,7 @@ async def get_booking(
 async def update_booking_status(
     booking_id: str,
     req: BookingStatusUpdate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(select(Booking).where(Booking.id == booking_id))
@@ -153,11 +148,7 @@ async def update_booking_status(
         raise HTTPException(status_code=404, detail="Booking not found")
 
     # Only the provider associated with this booking can update status
-    provider_result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = provider_result.scalars().first()
-    if not provider or provider.id != booking.provider_id:
+    if await current_user.provider_id(db) != booking.provider_id:
         if current_user.get("role") != "admin":
             raise HTTPException(status_code=403, detail="Only the assigned provider can update booking status")
 
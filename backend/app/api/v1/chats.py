@@ -1,11 +1,11 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, or_
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, or_, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.security import CurrentUser, get_current_user
 from app.core.push import send_push
 from app.models.chat import Conversation, Message
 from app.models.user import User
@@ -15,31 +15,41 @@ from app.schemas.chat import (
     ConversationResponse,
     MessageResponse,
 )
+from app.utils.pagination import Keyset
 
 router = APIRouter(prefix="/chats", tags=["Chats"])
 
+# Most recent activity first; conversations with no messages yet rank by creation time
+CONVERSATIONS_RECENT = Keyset(
+    "recent",
+    func.coalesce(Conversation.last_message_at, Conversation.created_at),
+    Conversation.id,
+    key=lambda c: [c.last_message_at or c.created_at, c.id],
+)
+
 
 @router.get("", response_model=List[ConversationResponse])
 async def list_conversations(
+    response: Response,
     page: int = 1,
     per_page: int = 30,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     user_id = current_user["user_id"]
-    query = (
-        select(Conversation)
-        .where(
-            or_(
-                Conversation.buyer_id == user_id,
-                Conversation.provider_id == user_id,
-            )
+    query = select(Conversation).where(
+        or_(
+            Conversation.buyer_id == user_id,
+            Conversation.provider_id == user_id,
         )
-        .order_by(Conversation.last_message_at.desc().nullslast(), Conversation.created_at.desc())
-        .offset((page - 1) * per_page).limit(per_page)
     )
+    query = CONVERSATIONS_RECENT.paginate(query, cursor, per_page, page)
     result = await db.execute(query)
-    return result.scalars().all()
+    items, next_cursor = CONVERSATIONS_RECENT.page_items(result.scalars().all(), per_page)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.get("/{conversation_id}/messages", response_model=List[MessageResponse])
@@ -78,7 +88,7 @@ async def get_messages(
 async def send_message(
     conversation_id: str,
     req: SendMessageRequest,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     user_id = current_user["user_id"]
@@ -117,8 +127,7 @@ async def send_message(
     await db.refresh(message)
 
     # Push notification to the other participant
-    sender = await db.execute(select(User).where(User.id == user_id))
-    sender_user = sender.scalars().first()
+    sender_user = await current_user.user(db)
     sender_name = sender_user.full_name if sender_user else "Someone"
 
     # Determine the recipient (the other participant)
@@ -3,7 +3,7 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
@@ -11,7 +11,7 @@ from app.core.security import get_current_user, require_admin
 from app.core.config import settings
 from app.models.delivery import Delivery
 from app.models.order import Order
-from app.services import kwik as kwik_service
+from app.services import delivery_quotes, delivery_sync, kwik as kwik_service
 
 router = APIRouter(prefix="/delivery", tags=["Delivery"])
 
@@ -51,39 +51,27 @@ async def get_delivery_quote(
     req: DeliveryQuoteRequest,
     current_user: dict = Depends(get_current_user),
 ):
-    """Get a delivery price quote from Kwik."""
+    """Get a delivery price quote from Kwik (cached per route), or an estimate."""
     if not settings.KWIK_EMAIL:
-        # Fallback: return a flat estimate if Kwik not configured
+        # Fallback: return a distance-based estimate if Kwik not configured
         return {
-            "amount": 1500,
+            "amount": delivery_quotes.estimate_fee(
+                req.pickup_lat, req.pickup_lng, req.delivery_lat, req.delivery_lng, req.vehicle_id,
+            ),
             "currency": "NGN",
             "source": "estimate",
-            "message": "Kwik not configured — returning flat estimate",
+            "message": "Kwik not configured — returning estimate",
         }
 
-    try:
-        quote = await kwik_service.get_quote(
-            pickup_address=req.pickup_address,
-            pickup_lat=req.pickup_lat,
-            pickup_lng=req.pickup_lng,
-            delivery_address=req.delivery_address,
-            delivery_lat=req.delivery_lat,
-            delivery_lng=req.delivery_lng,
-            vehicle_id=req.vehicle_id,
-        )
-        return {
-            "amount": quote["amount"],
-            "currency": "NGN",
-            "source": "kwik",
-        }
-    except Exception as e:
-        # Fallback on error
-        return {
-            "amount": 1500,
-            "currency": "NGN",
-            "source": "estimate",
-            "message": str(e),
-        }
+    return await delivery_quotes.quote_with_fallback(
+        pickup_address=req.pickup_address,
+        pickup_lat=req.pickup_lat,
+        pickup_lng=req.pickup_lng,
+        delivery_address=req.delivery_address,
+        delivery_lat=req.delivery_lat,
+        delivery_lng=req.delivery_lng,
+        vehicle_id=req.vehicle_id,
+    )
 
 
 @router.post("/create")
@@ -127,11 +115,19 @@ async def create_delivery(
         vehicle_type="motorcycle" if req.vehicle_id == 0 else "car",
     )
 
+    if settings.KWIK_EMAIL and settings.DELIVERY_BATCH_WINDOW > 0 and not order.is_express:
+        # Queued for a multi-stop task with the vendor's other orders
+        # (services.delivery_batching); the fee is settled at dispatch
+        delivery.status = "pending"
+        delivery.delivery_fee = delivery_quotes.estimate_fee(
+            req.pickup_lat, req.pickup_lng, req.delivery_lat, req.delivery_lng, req.vehicle_id,
+        )
+
     # Try dispatching to Kwik
-    if settings.KWIK_EMAIL:
+    elif settings.KWIK_EMAIL:
         try:
-            # Get quote first for the fee
-            quote = await kwik_service.get_quote(
+            # Get quote first for the fee (usually cached from checkout)
+            quote = await delivery_quotes.kwik_quote(
                 pickup_address=req.pickup_address,
                 pickup_lat=req.pickup_lat,
                 pickup_lng=req.pickup_lng,
@@ -172,7 +168,9 @@ async def create_delivery(
         except Exception as e:
             # If Kwik fails, still save the delivery as pending
             delivery.status = "pending"
-            delivery.delivery_fee = 1500  # fallback estimate
+            delivery.delivery_fee = delivery_quotes.estimate_fee(
+                req.pickup_lat, req.pickup_lng, req.delivery_lat, req.delivery_lng, req.vehicle_id,
+            )
 
     else:
         delivery.status = "pending"
@@ -223,37 +221,11 @@ async def track_delivery(
         "delivered_at": delivery.delivered_at,
     }
 
-    # If dispatched to Kwik, get real-time status
-    if delivery.kwik_order_id and settings.KWIK_EMAIL:
-        try:
-            kwik_status = await kwik_service.track_delivery(delivery.kwik_order_id)
-            response["kwik_status"] = kwik_status["status"]
-            response["kwik_raw"] = kwik_status.get("raw")
-
-            # Sync status back to our DB
-            status_mapping = {
-                "upcoming": "dispatched",
-                "started": "in_transit",
-                "accepted": "in_transit",
-                "arrived": "in_transit",
-                "ended": "delivered",
-                "failed": "failed",
-                "cancelled": "cancelled",
-            }
-            new_status = status_mapping.get(kwik_status["status"])
-            if new_status and new_status != delivery.status:
-                delivery.status = new_status
-                if new_status == "delivered":
-                    delivery.delivered_at = datetime.utcnow()
-                    # Also update order
-                    order_result = await db.execute(select(Order).where(Order.id == order_id))
-                    order = order_result.scalars().first()
-                    if order:
-                        order.status = "delivered"
-                await db.commit()
-
-        except Exception as e:
-            response["kwik_error"] = str(e)
+    # Last status from the background Kwik sync — no live call per refresh
+    if delivery.kwik_order_id:
+        response["kwik_status"] = delivery.kwik_status
+        response["kwik_raw"] = delivery_sync.kwik_payload(delivery)
+        response["status_checked_at"] = delivery.status_checked_at
 
     return response
 
@@ -277,6 +249,25 @@ async def cancel_delivery(
 
     if delivery.status in ("delivered", "cancelled"):
         raise HTTPException(status_code=400, detail=f"Cannot cancel delivery in '{delivery.status}' status")
+    if delivery.status == "batching":
+        # A batch worker is sending it to Kwik right now
+        raise HTTPException(status_code=409, detail="Delivery is being dispatched. Try again in a moment.")
+
+    # A stop on a multi-stop task can only be cancelled on Kwik by its own
+    # drop job; cancelling the task would call off every buyer's delivery
+    # (batches dispatched before per-drop ids were kept share the task's id)
+    if delivery.batch_id and delivery.kwik_order_id:
+        per_drop = delivery.kwik_job_id is not None and await db.scalar(
+            select(func.count(Delivery.id)).where(
+                Delivery.batch_id == delivery.batch_id,
+                Delivery.kwik_job_id == delivery.kwik_job_id,
+            )
+        ) == 1
+        if not per_drop:
+            raise HTTPException(
+                status_code=400,
+                detail="This delivery shares a rider with other orders and cannot be cancelled here. Contact support.",
+            )
 
     # Cancel on Kwik if dispatched
     if delivery.kwik_job_id and settings.KWIK_EMAIL:
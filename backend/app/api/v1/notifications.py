@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -8,26 +8,29 @@ from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.notification import Notification
 from app.schemas.notification import NotificationResponse
+from app.utils.pagination import Keyset
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
+NOTIFICATIONS_NEWEST = Keyset("newest", Notification.created_at, Notification.id)
+
 
 @router.get("", response_model=List[NotificationResponse])
 async def list_notifications(
+    response: Response,
     page: int = 1,
     per_page: int = 20,
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    query = (
-        select(Notification)
-        .where(Notification.user_id == current_user["user_id"])
-        .order_by(Notification.created_at.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-    )
+    query = select(Notification).where(Notification.user_id == current_user["user_id"])
+    query = NOTIFICATIONS_NEWEST.paginate(query, cursor, per_page, page)
     result = await db.execute(query)
-    return result.scalars().all()
+    items, next_cursor = NOTIFICATIONS_NEWEST.page_items(result.scalars().all(), per_page)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 @router.patch("/{notification_id}/read", response_model=NotificationResponse)
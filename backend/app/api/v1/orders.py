@@ -7,10 +7,11 @@ from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import get_current_user, require_admin
+from app.core.security import CurrentUser, get_current_user, require_admin
 from app.core.config import settings
 from app.core.push import send_push
-from app.core.notify import notify_user
+from app.core.notify import notify_each, notify_user
+from app.core.jobs import enqueue_job, job
 from app.models.order import Order, OrderItem
 from app.models.product import Product
 from app.models.user import User
@@ -189,19 +190,8 @@ async def cancel_order(
             f"Order {order.order_number} has been cancelled.",
             "system", {"type": "order_cancelled", "order_id": order_id}, db)
 
-    # Notify vendor(s) of cancellation
-    items_result = await db.execute(select(OrderItem).where(OrderItem.order_id == order_id))
-    notified = set()
-    for item in items_result.scalars().all():
-        prod = (await db.execute(select(Product).where(Product.id == item.product_id))).scalars().first()
-        if prod and prod.vendor_id and prod.vendor_id not in notified:
-            from app.models.provider import Provider
-            prov = (await db.execute(select(Provider).where(Provider.id == prod.vendor_id))).scalars().first()
-            if prov:
-                await notify_user(prov.user_id, "Order Cancelled",
-                    f"Order {order.order_number} for {item.product_name} has been cancelled by the buyer.",
-                    "system", {"type": "order_cancelled", "order_id": order_id}, db)
-                notified.add(prod.vendor_id)
+    # Notify vendor(s) of cancellation — in the background, after commit
+    await enqueue_job(db, "order.cancelled", {"order_id": order_id}, key=f"order-cancelled:{order_id}")
 
     await db.commit()
     return {
@@ -212,23 +202,41 @@ async def cancel_order(
     }
 
 
+@job("order.cancelled")
+async def _notify_vendors_of_cancellation(payload: dict, db: AsyncSession):
+    from app.models.provider import Provider
+
+    order = await db.get(Order, payload["order_id"])
+    if not order:
+        return
+    rows = (await db.execute(
+        select(Provider.user_id, OrderItem.product_name)
+        .join(Product, Product.vendor_id == Provider.id)
+        .join(OrderItem, OrderItem.product_id == Product.id)
+        .where(OrderItem.order_id == order.id)
+    )).all()
+    notifications = {}
+    for vendor_user_id, product_name in rows:
+        notifications.setdefault(vendor_user_id, {
+            "user_id": vendor_user_id,
+            "title": "Order Cancelled",
+            "body": f"Order {order.order_number} for {product_name} has been cancelled by the buyer.",
+            "data": {"type": "order_cancelled", "order_id": order.id},
+        })
+    await notify_each(list(notifications.values()), db)
+
+
 @router.get("/my-vendor-orders")
 async def list_vendor_orders(
     status: Optional[str] = None,
     page: int = 1,
     per_page: int = 20,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """List orders containing the current provider's products."""
-    from app.models.provider import Provider
-
-    # Find provider
-    prov_result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = prov_result.scalars().first()
-    if not provider:
+    provider_id = await current_user.provider_id(db)
+    if not provider_id:
         return []
 
     # Find order IDs that contain this provider's products
@@ -236,7 +244,7 @@ async def list_vendor_orders(
     order_ids_query = (
         select(OrderItem.order_id)
         .join(Product, OrderItem.product_id == Product.id)
-        .where(Product.vendor_id == provider.id)
+        .where(Product.vendor_id == provider_id)
         .distinct()
     )
     order_ids_result = await db.execute(order_ids_query)
@@ -257,26 +265,22 @@ async def list_vendor_orders(
 async def provider_update_order_status(
     order_id: str,
     req: OrderStatusUpdate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Provider updates order status (confirmed -> in_transit, in_transit -> delivered)."""
-    from app.models.provider import Provider
     from app.models.product import Product
 
     # Verify this provider owns products in this order
-    prov_result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = prov_result.scalars().first()
-    if not provider:
+    provider_id = await current_user.provider_id(db)
+    if not provider_id:
         raise HTTPException(status_code=403, detail="Not a provider")
 
     # Check order has their products
     has_items = await db.execute(
         select(OrderItem.id)
         .join(Product, OrderItem.product_id == Product.id)
-        .where(OrderItem.order_id == order_id, Product.vendor_id == provider.id)
+        .where(OrderItem.order_id == order_id, Product.vendor_id == provider_id)
     )
     if not has_items.scalars().first():
         raise HTTPException(status_code=403, detail="This order doesn't contain your products")
@@ -1,17 +1,20 @@
 import uuid
 import hashlib
 import hmac
+import json
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
-import httpx
 
-from app.core.database import get_db
+from app.core.database import dialect_insert, get_db
 from app.core.security import get_current_user
 from app.core.config import settings
-from app.models.payment import Payment
+from app.core.http import get_client
+from app.core.jobs import enqueue_job, job
+from app.core.notify import notify_each
+from app.models.payment import Payment, WebhookEvent
 from app.models.order import Order, OrderItem
 from app.models.booking import Booking
 from app.models.user import User
@@ -24,41 +27,48 @@ from app.schemas.payment import InitializePayment, PaymentResponse
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
 
-async def _create_payout_for_order(order: Order, db: AsyncSession):
-    """Create payout records for each provider involved in the order."""
-    items_result = await db.execute(
-        select(OrderItem).where(OrderItem.order_id == order.id)
-    )
-    items = items_result.scalars().all()
-
-    for item in items:
-        product_result = await db.execute(
-            select(Product).where(Product.id == item.product_id)
+async def _order_vendor_lines(order: Order, db: AsyncSession) -> list:
+    """Every item of the order that belongs to a linked provider, with that
+    provider and its user — one joined query for the whole payment pipeline."""
+    result = await db.execute(
+        select(
+            OrderItem.product_name,
+            OrderItem.quantity,
+            OrderItem.total_price,
+            Provider.id.label("provider_id"),
+            Provider.user_id,
+            User.id.label("vendor_user_id"),
         )
-        product = product_result.scalars().first()
-        if not product:
-            continue
+        .select_from(OrderItem)
+        .join(Product, Product.id == OrderItem.product_id)
+        .join(Provider, Provider.id == Product.vendor_id)
+        .outerjoin(User, User.id == Provider.user_id)
+        .where(OrderItem.order_id == order.id)
+        .order_by(OrderItem.id)
+    )
+    return result.all()
 
-        commission = item.total_price * (settings.GIFT_COMMISSION_PERCENT / 100)
-        provider_amount = item.total_price - commission
 
-        # Find the actual provider by vendor_id, or skip payout if no linked provider
-        if product.vendor_id:
-            provider_result = await db.execute(
-                select(Provider).where(Provider.id == product.vendor_id)
-            )
-            provider = provider_result.scalars().first()
-            if provider:
-                payout = Payout(
-                    provider_id=provider.id,
-                    user_id=provider.user_id,
-                    order_id=order.id,
-                    amount=provider_amount,
-                    commission=commission,
-                    status="held",
-                    hold_until=datetime.utcnow() + timedelta(hours=settings.PAYOUT_HOLD_HOURS),
-                )
-                db.add(payout)
+async def _create_payout_for_order(order: Order, db: AsyncSession, lines: list = None):
+    """Create payout records for each provider involved in the order."""
+    if lines is None:
+        lines = await _order_vendor_lines(order, db)
+    hold_until = datetime.utcnow() + timedelta(hours=settings.PAYOUT_HOLD_HOURS)
+
+    payouts = []
+    for line in lines:
+        commission = line.total_price * (settings.GIFT_COMMISSION_PERCENT / 100)
+        payouts.append({
+            "provider_id": line.provider_id,
+            "user_id": line.user_id,
+            "order_id": order.id,
+            "amount": line.total_price - commission,
+            "commission": commission,
+            "status": "held",
+            "hold_until": hold_until,
+        })
+    if payouts:
+        await db.execute(insert(Payout), payouts)
 
 
 async def _create_payout_for_booking(booking: Booking, db: AsyncSession):
@@ -87,54 +97,26 @@ async def _create_payout_for_booking(booking: Booking, db: AsyncSession):
     db.add(payout)
 
 
-async def _notify_vendors_of_order(order, db: AsyncSession):
+async def _notify_vendors_of_order(order, db: AsyncSession, lines: list = None):
     """Notify all vendors in an order that they have a new order."""
-    from app.models.notification import Notification
-    from app.core.push import send_push
-
-    items_result = await db.execute(
-        select(OrderItem).where(OrderItem.order_id == order.id)
-    )
-    items = items_result.scalars().all()
-
-    notified_vendors = set()
-    for item in items:
-        product_result = await db.execute(select(Product).where(Product.id == item.product_id))
-        product = product_result.scalars().first()
-        if not product or not product.vendor_id or product.vendor_id in notified_vendors:
-            continue
-
-        notified_vendors.add(product.vendor_id)
-        provider_result = await db.execute(select(Provider).where(Provider.id == product.vendor_id))
-        provider = provider_result.scalars().first()
-        if not provider:
-            continue
+    if lines is None:
+        lines = await _order_vendor_lines(order, db)
 
-        from app.models.user import User
-        user_result = await db.execute(select(User).where(User.id == provider.user_id))
-        vendor_user = user_result.scalars().first()
-        if not vendor_user:
+    notifications, notified_vendors = [], set()
+    for line in lines:
+        if line.vendor_user_id is None or line.provider_id in notified_vendors:
             continue
-
-        # In-app notification
-        db.add(Notification(
-            user_id=vendor_user.id,
-            title="New Order!",
-            description=f"Order {order.order_number}: {item.product_name} x{item.quantity}",
-            type="system",
-        ))
-
-        # Push notification
-        if vendor_user.push_token:
-            try:
-                await send_push(
-                    vendor_user.push_token,
-                    "New Order Received!",
-                    f"You have a new order for {item.product_name}. Tap to view.",
-                    {"type": "new_order", "order_id": order.id},
-                )
-            except Exception:
-                pass
+        notified_vendors.add(line.provider_id)
+        notifications.append({
+            "user_id": line.vendor_user_id,
+            "title": "New Order!",
+            "body": f"Order {order.order_number}: {line.product_name} x{line.quantity}",
+            "push_title": "New Order Received!",
+            "push_body": f"You have a new order for {line.product_name}. Tap to view.",
+            "data": {"type": "new_order", "order_id": order.id},
+        })
+    # verify and the webhook can both land here — push once
+    await notify_each(notifications, db, key=f"order-paid:{order.id}")
 
 
 async def _create_pending_delivery(order, db: AsyncSession):
@@ -160,22 +142,29 @@ async def _create_pending_delivery(order, db: AsyncSession):
 
 
 async def _process_successful_payment(payment: Payment, db: AsyncSession):
-    """Handle post-payment: update order/booking, create payouts, notify providers, create delivery."""
+    """Handle post-payment: update order/booking, create payouts, notify providers, create delivery.
+
+    verify and the webhook can race here; the row lock and "paid" check make
+    the second pass a no-op rather than a second round of payouts and notifications.
+    """
     if payment.order_id:
-        order_result = await db.execute(select(Order).where(Order.id == payment.order_id))
+        order_result = await db.execute(select(Order).where(Order.id == payment.order_id).with_for_update())
         order = order_result.scalars().first()
-        if order:
+        if order and order.payment_status != "paid":
             order.payment_status = "paid"
             order.payment_ref = payment.reference
             order.status = "confirmed"
-            await _create_payout_for_order(order, db)
-            await _notify_vendors_of_order(order, db)
+            lines = await _order_vendor_lines(order, db)
+            await _create_payout_for_order(order, db, lines)
+            await _notify_vendors_of_order(order, db, lines)
             await _create_pending_delivery(order, db)
 
     if payment.booking_id:
-        booking_result = await db.execute(select(Booking).where(Booking.id == payment.booking_id))
+        booking_result = await db.execute(
+            select(Booking).where(Booking.id == payment.booking_id).with_for_update()
+        )
         booking = booking_result.scalars().first()
-        if booking:
+        if booking and booking.payment_status != "paid":
             booking.payment_status = "paid"
             booking.payment_ref = payment.reference
             booking.status = "confirmed"
@@ -247,32 +236,32 @@ async def initialize_payment(
 
     # ── Card payment (Paystack) ─────────────────────────────────
     if settings.PAYSTACK_SECRET_KEY:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/initialize",
-                json={
-                    "email": req.email or f"{current_user['user_id']}@quickgift.ng",
-                    "amount": int(req.amount * 100),  # Paystack uses kobo
-                    "reference": reference,
-                    "callback_url": req.callback_url or "https://quickgift.ng/payment/callback",
-                    "currency": "NGN",
-                    "metadata": {
-                        "order_id": req.order_id,
-                        "booking_id": req.booking_id,
-                        "user_id": current_user["user_id"],
-                    },
+        client = get_client("paystack")
+        resp = await client.post(
+            "/transaction/initialize",
+            json={
+                "email": req.email or f"{current_user['user_id']}@quickgift.ng",
+                "amount": int(req.amount * 100),  # Paystack uses kobo
+                "reference": reference,
+                "callback_url": req.callback_url or "https://quickgift.ng/payment/callback",
+                "currency": "NGN",
+                "metadata": {
+                    "order_id": req.order_id,
+                    "booking_id": req.booking_id,
+                    "user_id": current_user["user_id"],
                 },
-                headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-            )
+            },
+            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        )
 
-            if resp.status_code == 200:
-                data = resp.json()
-                await db.commit()
-                return {
-                    "reference": reference,
-                    "authorization_url": data["data"]["authorization_url"],
-                    "access_code": data["data"]["access_code"],
-                }
+        if resp.status_code == 200:
+            data = resp.json()
+            await db.commit()
+            return {
+                "reference": reference,
+                "authorization_url": data["data"]["authorization_url"],
+                "access_code": data["data"]["access_code"],
+            }
 
     # Fallback for dev (no Paystack key)
     await db.commit()
@@ -303,23 +292,23 @@ async def verify_payment(
         return {"status": "success", "reference": reference}
 
     if settings.PAYSTACK_SECRET_KEY:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/verify/{reference}",
-                headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-            )
+        client = get_client("paystack")
+        resp = await client.get(
+            f"/transaction/verify/{reference}",
+            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        )
 
-            if resp.status_code == 200:
-                data = resp.json()["data"]
-                payment.status = "success" if data["status"] == "success" else "failed"
-                payment.channel = data.get("channel")
+        if resp.status_code == 200:
+            data = resp.json()["data"]
+            payment.status = "success" if data["status"] == "success" else "failed"
+            payment.channel = data.get("channel")
 
-                if payment.status == "success":
-                    await _process_successful_payment(payment, db)
+            if payment.status == "success":
+                await _process_successful_payment(payment, db)
 
-                await db.commit()
-                await db.refresh(payment)
-                return {"status": payment.status, "reference": reference}
+            await db.commit()
+            await db.refresh(payment)
+            return {"status": payment.status, "reference": reference}
 
     # Dev mode: auto-succeed (only when no Paystack key configured)
     if not settings.PAYSTACK_SECRET_KEY:
@@ -329,6 +318,73 @@ async def verify_payment(
     return {"status": "success", "reference": reference, "message": "Dev mode auto-verified"}
 
 
+def _webhook_event_key(data: dict) -> str:
+    event = data.get("event") or "unknown"
+    payload = data.get("data") or {}
+    ident = payload.get("id") or payload.get("reference")
+    if ident is None:
+        ident = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+    return f"{event}:{ident}"[:150]
+
+
+async def _apply_webhook_event(event: WebhookEvent, db: AsyncSession):
+    """Apply one stored Paystack event. Safe to run more than once."""
+    data = json.loads(event.payload)
+    event.attempts += 1
+
+    if event.event != "charge.success":
+        event.status = "ignored"
+    else:
+        reference = data["data"]["reference"]
+        result = await db.execute(
+            select(Payment).where(Payment.reference == reference).with_for_update()
+        )
+        payment = result.scalars().first()
+        if payment and payment.status != "success":
+            payment.status = "success"
+            payment.channel = data["data"].get("channel")
+            await _process_successful_payment(payment, db)
+        event.status = "processed"
+    event.processed_at = datetime.utcnow()
+    event.last_error = None
+
+
+async def process_webhook_events(event_id: str, db: AsyncSession):
+    """Process an event and, first, any earlier unprocessed events for the
+    same payment reference — so a reference's events apply in arrival order."""
+    event = await db.get(WebhookEvent, event_id)
+    if event is None or event.status in ("processed", "ignored"):
+        return
+    earlier = []
+    if event.reference:
+        earlier = (await db.execute(
+            select(WebhookEvent)
+            .where(
+                WebhookEvent.reference == event.reference,
+                WebhookEvent.status.in_(["received", "failed"]),
+                WebhookEvent.received_at < event.received_at,
+            )
+            .order_by(WebhookEvent.received_at)
+        )).scalars().all()
+    for pending in [*earlier, event]:
+        await _apply_webhook_event(pending, db)
+
+
+@job("paystack.webhook")
+async def _webhook_job(payload: dict, db: AsyncSession):
+    try:
+        await process_webhook_events(payload["event_id"], db)
+    except Exception as e:
+        await db.rollback()
+        event = await db.get(WebhookEvent, payload["event_id"])
+        if event:
+            event.status = "failed"
+            event.attempts += 1
+            event.last_error = f"{type(e).__name__}: {e}"[:1000]
+            await db.commit()
+        raise  # let the runner retry with backoff
+
+
 @router.post("/webhook/paystack")
 async def paystack_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     body = await request.body()
@@ -341,21 +397,33 @@ async def paystack_webhook(request: Request, db: AsyncSession = Depends(get_db))
             body,
             hashlib.sha512,
         ).hexdigest()
-        if signature != expected:
+        if not hmac.compare_digest(signature, expected):
             raise HTTPException(status_code=400, detail="Invalid signature")
 
-    data = await request.json()
-    event = data.get("event")
-
-    if event == "charge.success":
-        reference = data["data"]["reference"]
-        result = await db.execute(select(Payment).where(Payment.reference == reference))
-        payment = result.scalars().first()
-
-        if payment and payment.status != "success":
-            payment.status = "success"
-            payment.channel = data["data"].get("channel")
-            await _process_successful_payment(payment, db)
-            await db.commit()
-
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    # Store once per event — Paystack retries slow or failed deliveries
+    insert_stmt = dialect_insert(db.bind.dialect.name)
+    event_id = (await db.execute(
+        insert_stmt(WebhookEvent)
+        .values(
+            event_key=_webhook_event_key(data),
+            event=data.get("event") or "unknown",
+            reference=(data.get("data") or {}).get("reference"),
+            payload=body.decode("utf-8", errors="replace"),
+        )
+        .on_conflict_do_nothing(index_elements=["event_key"])
+        .returning(WebhookEvent.id)
+    )).scalar()
+    if event_id is None:
+        return {"status": "ok", "duplicate": True}
+
+    if settings.PAYSTACK_WEBHOOK_MODE == "inline":
+        await process_webhook_events(event_id, db)
+    else:
+        await enqueue_job(db, "paystack.webhook", {"event_id": event_id}, key=f"webhook:{event_id}")
+    await db.commit()
     return {"status": "ok"}
@@ -1,29 +1,47 @@
+import logging
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import cache
+from app.core.cache import CATALOG, cached_response, invalidate
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.security import get_current_user, require_admin
+from app.core.security import CurrentUser, get_current_user, require_admin
+from app.core.search import apply_product_search
+from app.utils.pagination import Keyset, count_strategy, exact_count, fetch_page
 from app.models.product import Product, Category, Occasion
-from app.models.provider import Provider
 from app.schemas.product import (
     ProductCreate, ProductUpdate, ProductResponse,
     ProductListResponse, CategoryCreate, CategoryResponse, OccasionResponse,
 )
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/products", tags=["Products & Gifts"])
 
+PRODUCT_SORTS = {
+    "popular": Keyset("popular", Product.order_count, Product.id),
+    "price_asc": Keyset("price_asc", Product.price, Product.id, descending=False),
+    "price_desc": Keyset("price_desc", Product.price, Product.id),
+    "rating": Keyset("rating", Product.rating, Product.id),
+    "newest": Keyset("newest", Product.created_at, Product.id),
+}
+
 
 # --- Categories ---
 
 @router.get("/categories", response_model=List[CategoryResponse])
-async def list_categories(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Category).where(Category.is_active == True).order_by(Category.sort_order)
-    )
-    return result.scalars().all()
+async def list_categories(request: Request, db: AsyncSession = Depends(get_db)):
+    async def load():
+        result = await db.execute(
+            select(Category).where(Category.is_active == True).order_by(Category.sort_order)
+        )
+        return [CategoryResponse.model_validate(c) for c in result.scalars().all()]
+
+    return await cached_response(request, CATALOG, "categories", load)
 
 
 @router.post("/categories", response_model=CategoryResponse)
@@ -36,23 +54,28 @@ async def create_category(
     db.add(cat)
     await db.commit()
     await db.refresh(cat)
+    await invalidate(CATALOG)
     return cat
 
 
 # --- Occasions ---
 
 @router.get("/occasions", response_model=List[OccasionResponse])
-async def list_occasions(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Occasion).where(Occasion.is_active == True).order_by(Occasion.sort_order)
-    )
-    return result.scalars().all()
+async def list_occasions(request: Request, db: AsyncSession = Depends(get_db)):
+    async def load():
+        result = await db.execute(
+            select(Occasion).where(Occasion.is_active == True).order_by(Occasion.sort_order)
+        )
+        return [OccasionResponse.model_validate(o) for o in result.scalars().all()]
+
+    return await cached_response(request, CATALOG, "occasions", load)
 
 
 # --- Products ---
 
 @router.get("", response_model=ProductListResponse)
 async def list_products(
+    request: Request,
     category_id: Optional[str] = None,
     city: Optional[str] = None,
     search: Optional[str] = None,
@@ -60,22 +83,41 @@ async def list_products(
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
     min_rating: Optional[float] = Query(None, ge=0, le=5),
-    sort: str = Query("popular", pattern="^(popular|price_asc|price_desc|rating|newest)$"),
+    sort: Optional[str] = Query(None, pattern="^(relevance|popular|price_asc|price_desc|rating|newest)$"),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    count: Optional[str] = Depends(count_strategy),
     db: AsyncSession = Depends(get_db),
 ):
+    async def load():
+        return await _load_products(
+            db, category_id, city, search, featured, min_price, max_price,
+            min_rating, sort, page, per_page, cursor, count,
+        )
+
+    # The featured shelf is on every home screen and rarely changes
+    if featured and not search and not cursor:
+        return await cached_response(request, CATALOG, f"products?{request.url.query}", load)
+    return await load()
+
+
+async def _load_products(
+    db, category_id, city, search, featured, min_price, max_price,
+    min_rating, sort, page, per_page, cursor, count,
+) -> ProductListResponse:
     query = select(Product).where(Product.status == "active")
+    filtered = any(v is not None for v in (category_id, city, search, min_price, max_price, min_rating, featured))
 
     if category_id:
         query = query.where(Product.category_id == category_id)
     if city:
         query = query.where(Product.city == city)
+
+    rank = None
     if search:
-        # Search by name OR vendor_name
-        query = query.where(
-            Product.name.ilike(f"%{search}%") | Product.vendor_name.ilike(f"%{search}%")
-        )
+        # Full-text match on name, vendor, description and tags (prefix-aware)
+        query, rank = apply_product_search(query, search, db.bind.dialect.name)
     if min_price is not None:
         query = query.where(Product.price >= min_price)
     if max_price is not None:
@@ -85,33 +127,52 @@ async def list_products(
     if featured is not None:
         query = query.where(Product.is_featured == featured)
 
-    # Count
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
-
-    # Sort
-    if sort == "popular":
-        query = query.order_by(Product.order_count.desc())
-    elif sort == "price_asc":
-        query = query.order_by(Product.price.asc())
-    elif sort == "price_desc":
-        query = query.order_by(Product.price.desc())
-    elif sort == "rating":
-        query = query.order_by(Product.rating.desc())
-    elif sort == "newest":
-        query = query.order_by(Product.created_at.desc())
-
-    query = query.offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
+    # Sort — search results default to relevance, everything else to popularity
+    if sort is None:
+        sort = "relevance" if search else "popular"
+
+    if sort == "relevance" and rank is not None:
+        # Relevance is per-query, so it pages by offset only
+        query = query.order_by(rank, Product.order_count.desc(), Product.id)
+        keyset = None
+    else:
+        keyset = PRODUCT_SORTS.get(sort, PRODUCT_SORTS["popular"])
+
+    # The table-wide estimate would include inactive products, so the bare
+    # listing's "estimate" is an exact active count cached until the next write
+    cached_total = count == "estimate" and not filtered
+    items, total, next_cursor = await fetch_page(
+        db, query, keyset,
+        page=page, per_page=per_page, cursor=cursor, count=None if cached_total else count,
+    )
+    if cached_total:
+        total = await _active_product_count(db, query)
 
     return ProductListResponse(
-        items=result.scalars().all(),
+        items=items,
         total=total,
         page=page,
         per_page=per_page,
+        next_cursor=next_cursor,
     )
 
 
+async def _active_product_count(db, query) -> int:
+    key = f"{CATALOG}:products:active-count"
+    try:
+        body = await cache.cache.get(key)
+        if body is not None:
+            return int(body)
+    except Exception as e:
+        logger.error(f"Cache read failed for {key}: {e}")
+    total = await exact_count(db, query)
+    try:
+        await cache.cache.set(key, str(total).encode(), settings.CATALOG_CACHE_TTL)
+    except Exception as e:
+        logger.error(f"Cache write failed for {key}: {e}")
+    return total
+
+
 @router.get("/{product_id}", response_model=ProductResponse)
 async def get_product(product_id: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(Product).where(Product.id == product_id))
@@ -131,6 +192,7 @@ async def create_product(
     db.add(product)
     await db.commit()
     await db.refresh(product)
+    await invalidate(CATALOG)
     return product
 
 
@@ -152,6 +214,7 @@ async def update_product(
 
     await db.commit()
     await db.refresh(product)
+    await invalidate(CATALOG)
     return product
 
 
@@ -170,6 +233,7 @@ async def delete_product(
     # This preserves OrderItem references to the product
     product.status = "deleted"
     await db.commit()
+    await invalidate(CATALOG)
     return {"message": "Product deleted"}
 
 
@@ -177,19 +241,16 @@ async def delete_product(
 
 @router.get("/my-products", response_model=List[ProductResponse])
 async def list_my_products(
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """List products belonging to the current provider."""
-    provider_result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = provider_result.scalars().first()
-    if not provider:
+    provider_id = await current_user.provider_id(db)
+    if not provider_id:
         return []
 
     result = await db.execute(
-        select(Product).where(Product.vendor_id == provider.id).order_by(Product.created_at.desc())
+        select(Product).where(Product.vendor_id == provider_id).order_by(Product.created_at.desc())
     )
     return result.scalars().all()
 
@@ -197,14 +258,11 @@ async def list_my_products(
 @router.post("/my-products", response_model=ProductResponse)
 async def create_my_product(
     req: ProductCreate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Create a product as a provider/seller."""
-    provider_result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = provider_result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider profile not found. Complete your business setup first.")
 
@@ -223,4 +281,5 @@ async def create_my_product(
     db.add(product)
     await db.commit()
     await db.refresh(product)
+    await invalidate(CATALOG)
     return product
@@ -2,13 +2,17 @@ import math
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select
+from sqlalchemy import and_, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.core.security import get_current_user, require_admin
+from app.core.security import CurrentUser, forget_provider, get_current_user, require_admin
+from app.core.upload import image_variants
 from app.models.provider import Provider, Service, Portfolio
-from app.utils.geo import haversine_km
+from app.utils.geo import (
+    bounding_box, distance_sql, geohash_cover, geohash_prefix_filter, haversine_many,
+)
+from app.services.provider_locations import provider_locations
 from app.schemas.provider import (
     ProviderCreate, ProviderUpdate, ProviderResponse,
     ProviderDetailResponse, ServiceCreate, ServiceResponse,
@@ -34,9 +38,8 @@ async def list_providers(
 ):
     query = select(Provider).where(Provider.status == "verified")
 
-    # When user provides coordinates, don't apply SQL-level bounding box
-    # (Python-side distance calc handles filtering + includes null-coord providers)
-    # Only apply city filter when no coordinates provided
+    # Coordinates replace the city filter (nearby providers may sit across
+    # a city boundary); only apply city filter when no coordinates provided
     if lat is None or lng is None:
         if city:
             query = query.where(Provider.city == city)
@@ -50,36 +53,40 @@ async def list_providers(
     if min_rating is not None:
         query = query.where(Provider.rating >= min_rating)
 
-    # For distance sort, fetch all matching and sort in Python
     if sort == "distance" and lat is not None and lng is not None:
-        result = await db.execute(query)
-        providers = result.scalars().all()
-
-        # Compute distance for providers WITH coordinates
-        with_distance = []
-        without_coords = []
-        for p in providers:
-            if p.lat is not None and p.lng is not None:
-                dist = haversine_km(lat, lng, p.lat, p.lng)
-                if dist <= radius_km:
-                    with_distance.append((p, round(dist, 2)))
-            else:
-                # Providers without coords: include but deprioritize (show at end)
-                without_coords.append((p, None))
-
-        # Sort by distance ascending, then append no-coord providers
-        with_distance.sort(key=lambda x: x[1])
-        all_results = with_distance + without_coords
-
-        # Paginate
-        start = (page - 1) * per_page
-        page_items = all_results[start : start + per_page]
-
-        # Build response with distance_km
+        # Prefilter in SQL: geohash prefix ranges (indexed) narrow to the
+        # cells around the user, the bounding box trims the cell corners,
+        # and the distance expression does the exact radius cut + ordering
+        distance, squared = distance_sql(Provider.lat, Provider.lng, lat, lng, db.bind.dialect.name)
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        nearby = and_(
+            Provider.lat.between(min_lat, max_lat),
+            Provider.lng.between(min_lng, max_lng),
+            distance <= (radius_km ** 2 if squared else radius_km),
+        )
+        cover = geohash_cover(lat, lng, radius_km)
+        if cover:
+            nearby = and_(geohash_prefix_filter(Provider.geohash, cover), nearby)
+
+        # Providers without coords: include but deprioritize (show at end)
+        no_coords = or_(Provider.lat.is_(None), Provider.lng.is_(None))
+        query = (
+            query.where(or_(nearby, no_coords))
+            .order_by(no_coords, distance, Provider.id)
+            .offset((page - 1) * per_page)
+            .limit(per_page)
+        )
+        providers = (await db.execute(query)).scalars().all()
+
+        # Build response with distance_km (one batch call for the page)
+        located = [p for p in providers if p.lat is not None and p.lng is not None]
+        distances = haversine_many(lat, lng, [p.lat for p in located], [p.lng for p in located])
+        distance_by_id = {p.id: round(float(d), 2) for p, d in zip(located, distances)}
+
         results = []
-        for provider, dist in page_items:
+        for provider in providers:
             data = {c.name: getattr(provider, c.name) for c in provider.__table__.columns}
-            data["distance_km"] = dist
+            data["distance_km"] = distance_by_id.get(provider.id)
             results.append(ProviderResponse(**data))
         return results
 
@@ -100,16 +107,42 @@ async def list_providers(
     return result.scalars().all()
 
 
+@router.get("/nearby", response_model=List[ProviderResponse])
+async def nearby_providers(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(15.0, ge=1, le=100),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+):
+    """Closest verified providers, ranked from the in-memory coordinate snapshot."""
+    ranked = await provider_locations.nearest(db, lat, lng, radius_km, limit)
+    if not ranked:
+        return []
+
+    result = await db.execute(
+        select(Provider).where(Provider.id.in_([pid for pid, _ in ranked]), Provider.status == "verified")
+    )
+    providers = {p.id: p for p in result.scalars().all()}
+
+    results = []
+    for pid, dist in ranked:
+        provider = providers.get(pid)
+        if provider is None:
+            continue  # Status changed since the snapshot was taken
+        data = {c.name: getattr(provider, c.name) for c in provider.__table__.columns}
+        data["distance_km"] = round(dist, 2)
+        results.append(ProviderResponse(**data))
+    return results
+
+
 @router.get("/me", response_model=ProviderDetailResponse)
 async def get_my_provider(
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Get the current user's provider profile."""
-    result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="You don't have a provider profile")
 
@@ -121,7 +154,10 @@ async def get_my_provider(
     portfolio_result = await db.execute(
         select(Portfolio).where(Portfolio.provider_id == provider.id).order_by(Portfolio.created_at.desc())
     )
-    portfolio = [{"id": p.id, "image_url": p.image_url, "caption": p.caption} for p in portfolio_result.scalars().all()]
+    portfolio = [
+        {"id": p.id, "image_url": p.image_url, "variants": image_variants(p.image_url), "caption": p.caption}
+        for p in portfolio_result.scalars().all()
+    ]
 
     return ProviderDetailResponse(
         **{c.name: getattr(provider, c.name) for c in provider.__table__.columns},
@@ -133,14 +169,11 @@ async def get_my_provider(
 @router.patch("/me", response_model=ProviderResponse)
 async def update_my_provider(
     req: ProviderUpdate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Update the current user's provider profile."""
-    result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider profile not found")
 
@@ -149,6 +182,7 @@ async def update_my_provider(
         setattr(provider, field, value)
 
     await db.commit()
+    await forget_provider(current_user["user_id"])
     await db.refresh(provider)
     return provider
 
@@ -156,14 +190,11 @@ async def update_my_provider(
 @router.post("/me/services", response_model=ServiceResponse)
 async def add_my_service(
     req: ServiceCreate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Add a service to the current user's provider profile."""
-    result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="You don't have a provider profile. Complete your business setup first.")
 
@@ -191,7 +222,10 @@ async def get_provider(provider_id: str, db: AsyncSession = Depends(get_db)):
     portfolio_result = await db.execute(
         select(Portfolio).where(Portfolio.provider_id == provider_id).order_by(Portfolio.created_at.desc())
     )
-    portfolio = [{"id": p.id, "image_url": p.image_url, "caption": p.caption} for p in portfolio_result.scalars().all()]
+    portfolio = [
+        {"id": p.id, "image_url": p.image_url, "variants": image_variants(p.image_url), "caption": p.caption}
+        for p in portfolio_result.scalars().all()
+    ]
 
     return ProviderDetailResponse(
         **{c.name: getattr(provider, c.name) for c in provider.__table__.columns},
@@ -209,6 +243,7 @@ async def register_provider(
     provider = Provider(user_id=current_user["user_id"], **req.model_dump())
     db.add(provider)
     await db.commit()
+    await forget_provider(current_user["user_id"])
     await db.refresh(provider)
     return provider
 
@@ -232,6 +267,7 @@ async def update_provider(
         setattr(provider, field, value)
 
     await db.commit()
+    await forget_provider(current_user["user_id"])
     await db.refresh(provider)
     return provider
 
@@ -409,14 +445,11 @@ class AvailabilityUpdate(_BaseModel):
 
 @router.get("/me/availability")
 async def get_my_availability(
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Get provider's saved availability. Stored in provider bio field as JSON for now."""
-    result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider profile not found")
 
@@ -445,14 +478,11 @@ async def get_my_availability(
 @router.put("/me/availability")
 async def update_my_availability(
     req: AvailabilityUpdate,
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
     """Save provider availability schedule."""
-    result = await db.execute(
-        select(Provider).where(Provider.user_id == current_user["user_id"])
-    )
-    provider = result.scalars().first()
+    provider = await current_user.provider(db)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider profile not found")
 
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
@@ -8,10 +8,10 @@ from datetime import datetime
 from app.core.database import get_db
 from app.core.security import get_current_user, require_admin
 from app.core.notify import notify_user
-from app.models.review import Review
+from app.models.review import Review, RatingAggregate
 from app.models.user import User
-from app.models.product import Product
 from app.models.provider import Provider
+from app.services.ratings import add_rating, remove_rating, summary as rating_summary
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -83,42 +83,12 @@ async def create_review(
         comment=req.comment,
     )
     db.add(review)
-    await db.flush()  # Flush first so the new review is included in aggregation
-
-    # Update target's average rating (AFTER adding the review)
-    if req.target_type == "product":
-        avg = (await db.execute(
-            select(func.avg(Review.rating)).where(
-                Review.target_type == "product", Review.target_id == req.target_id
-            )
-        )).scalar()
-        count = (await db.execute(
-            select(func.count(Review.id)).where(
-                Review.target_type == "product", Review.target_id == req.target_id
-            )
-        )).scalar()
-
-        product = (await db.execute(select(Product).where(Product.id == req.target_id))).scalars().first()
-        if product:
-            product.rating = round(avg or req.rating, 1)
-            product.review_count = count or 1
-
-    elif req.target_type == "provider":
-        avg = (await db.execute(
-            select(func.avg(Review.rating)).where(
-                Review.target_type == "provider", Review.target_id == req.target_id
-            )
-        )).scalar()
-        count = (await db.execute(
-            select(func.count(Review.id)).where(
-                Review.target_type == "provider", Review.target_id == req.target_id
-            )
-        )).scalar()
-
-        provider = (await db.execute(select(Provider).where(Provider.id == req.target_id))).scalars().first()
-        if provider:
-            provider.rating = round(avg or req.rating, 1)
-            provider.review_count = count or 1
+    await db.flush()  # Unique constraint fires here, before the aggregate moves
+
+    # Fold into the running aggregate — constant time, same transaction
+    target = await add_rating(db, req.target_type, req.target_id, req.rating)
+    product = target if req.target_type == "product" else None
+    provider = target if req.target_type == "provider" else None
 
     # Notify the provider/product owner about the new review
     reviewer_name = user.full_name if user else "A customer"
@@ -157,8 +127,14 @@ async def list_reviews(
     target_id: str,
     page: int = 1,
     per_page: int = 20,
+    include_summary: bool = False,
     db: AsyncSession = Depends(get_db),
 ):
+    """Reviews for a target, newest first.
+
+    With ``include_summary=true`` the response is ``{"reviews": [...],
+    "summary": {"average", "count", "histogram"}}`` instead of a bare list.
+    """
     result = await db.execute(
         select(Review)
         .where(Review.target_type == target_type, Review.target_id == target_id)
@@ -166,7 +142,19 @@ async def list_reviews(
         .offset((page - 1) * per_page)
         .limit(per_page)
     )
-    return result.scalars().all()
+    reviews = result.scalars().all()
+    if not include_summary:
+        return reviews
+
+    agg = (await db.execute(
+        select(RatingAggregate).where(
+            RatingAggregate.target_type == target_type, RatingAggregate.target_id == target_id
+        )
+    )).scalars().first()
+    return {
+        "reviews": [ReviewResponse.model_validate(r) for r in reviews],
+        "summary": rating_summary(agg),
+    }
 
 
 # --- Admin moderation ---
@@ -177,7 +165,7 @@ async def delete_review(
     admin: dict = Depends(require_admin),
     db: AsyncSession = Depends(get_db),
 ):
-    """Admin deletes a review and recalculates target rating."""
+    """Admin deletes a review and takes it out of the target's rating."""
     result = await db.execute(select(Review).where(Review.id == review_id))
     review = result.scalars().first()
     if not review:
@@ -185,32 +173,11 @@ async def delete_review(
 
     target_type = review.target_type
     target_id = review.target_id
+    rating = review.rating
 
     await db.delete(review)
     await db.flush()
-
-    # Recalculate rating after deletion
-    avg = (await db.execute(
-        select(func.avg(Review.rating)).where(
-            Review.target_type == target_type, Review.target_id == target_id
-        )
-    )).scalar()
-    count = (await db.execute(
-        select(func.count(Review.id)).where(
-            Review.target_type == target_type, Review.target_id == target_id
-        )
-    )).scalar()
-
-    if target_type == "product":
-        product = (await db.execute(select(Product).where(Product.id == target_id))).scalars().first()
-        if product:
-            product.rating = round(avg or 0, 1)
-            product.review_count = count or 0
-    elif target_type == "provider":
-        provider = (await db.execute(select(Provider).where(Provider.id == target_id))).scalars().first()
-        if provider:
-            provider.rating = round(avg or 0, 1)
-            provider.review_count = count or 0
+    await remove_rating(db, target_type, target_id, rating)
 
     await db.commit()
     return {"message": "Review deleted", "review_id": review_id}
@@ -1,22 +1,25 @@
 import uuid
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-import httpx
 
 from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.security import CurrentUser, get_current_user
 from app.core.config import settings
+from app.core.http import get_client
 from app.models.user import User
 from app.models.transaction import Transaction
 from app.models.bank_account import BankAccount
 from app.schemas.transaction import FundWalletRequest, TransferRequest, TransactionResponse
+from app.utils.pagination import Keyset
 
 router = APIRouter(prefix="/wallet", tags=["Wallet"])
 
+TRANSACTIONS_NEWEST = Keyset("newest", Transaction.created_at, Transaction.id)
+
 
 # ── Schemas ──────────────────────────────────────────────
 
@@ -85,11 +88,10 @@ NIGERIAN_BANKS = [
 
 @router.get("/balance")
 async def get_balance(
-    current_user: dict = Depends(get_current_user),
+    current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(User).where(User.id == current_user["user_id"]))
-    user = result.scalars().first()
+    user = await current_user.user(db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return {"balance": user.wallet_balance}
@@ -97,21 +99,20 @@ async def get_balance(
 
 @router.get("/transactions", response_model=List[TransactionResponse])
 async def list_transactions(
+    response: Response,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: dict = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    offset = (page - 1) * per_page
-    query = (
-        select(Transaction)
-        .where(Transaction.user_id == current_user["user_id"])
-        .order_by(Transaction.created_at.desc())
-        .offset(offset)
-        .limit(per_page)
-    )
+    query = select(Transaction).where(Transaction.user_id == current_user["user_id"])
+    query = TRANSACTIONS_NEWEST.paginate(query, cursor, per_page, page)
     result = await db.execute(query)
-    return result.scalars().all()
+    items, next_cursor = TRANSACTIONS_NEWEST.page_items(result.scalars().all(), per_page)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
 
 
 # ── Fund ─────────────────────────────────────────────────
@@ -127,26 +128,26 @@ async def initialize_fund(
     reference = f"WF-{_uuid.uuid4().hex[:12].upper()}"
 
     if settings.PAYSTACK_SECRET_KEY:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/initialize",
-                json={
-                    "email": current_user.get("email") or f"{current_user['user_id']}@quickgift.ng",
-                    "amount": int(amount * 100),
-                    "reference": reference,
-                    "currency": "NGN",
-                    "metadata": {"type": "wallet_fund", "user_id": current_user["user_id"]},
-                },
-                headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-            )
-            if resp.status_code == 200:
-                data = resp.json()
-                return {
-                    "reference": reference,
-                    "amount": amount,
-                    "authorization_url": data["data"]["authorization_url"],
-                    "access_code": data["data"]["access_code"],
-                }
+        client = get_client("paystack")
+        resp = await client.post(
+            "/transaction/initialize",
+            json={
+                "email": current_user.get("email") or f"{current_user['user_id']}@quickgift.ng",
+                "amount": int(amount * 100),
+                "reference": reference,
+                "currency": "NGN",
+                "metadata": {"type": "wallet_fund", "user_id": current_user["user_id"]},
+            },
+            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        )
+        if resp.status_code == 200:
+            data = resp.json()
+            return {
+                "reference": reference,
+                "amount": amount,
+                "authorization_url": data["data"]["authorization_url"],
+                "access_code": data["data"]["access_code"],
+            }
 
     # Dev mode fallback
     return {"reference": reference, "amount": amount, "authorization_url": None, "message": "Dev mode"}
@@ -170,16 +171,16 @@ async def verify_fund(
     verified = False
 
     if settings.PAYSTACK_SECRET_KEY:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(
-                f"{settings.PAYSTACK_BASE_URL}/transaction/verify/{reference}",
-                headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-            )
-            if resp.status_code == 200:
-                data = resp.json()["data"]
-                if data["status"] == "success":
-                    amount = data["amount"] / 100  # kobo to naira
-                    verified = True
+        client = get_client("paystack")
+        resp = await client.get(
+            f"/transaction/verify/{reference}",
+            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        )
+        if resp.status_code == 200:
+            data = resp.json()["data"]
+            if data["status"] == "success":
+                amount = data["amount"] / 100  # kobo to naira
+                verified = True
     else:
         # Dev mode: auto-verify, extract amount from reference metadata
         amount = 5000  # dev fallback
@@ -348,13 +349,13 @@ async def resolve_bank_account(
     if not settings.PAYSTACK_SECRET_KEY:
         raise HTTPException(status_code=503, detail="Payment service not configured")
 
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"{settings.PAYSTACK_BASE_URL}/bank/resolve",
-            params={"account_number": account_number, "bank_code": bank_code},
-            headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
-            timeout=15.0,
-        )
+    client = get_client("paystack")
+    resp = await client.get(
+        "/bank/resolve",
+        params={"account_number": account_number, "bank_code": bank_code},
+        headers={"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"},
+        timeout=15.0,
+    )
 
     data = resp.json()
     if resp.status_code == 200 and data.get("status"):
@@ -0,0 +1,166 @@
+"""
+Read-through cache for rarely-changing reference data (categories,
+occasions, featured products).
+
+Two interchangeable backends:
+- MemoryCache: per-process TTL + LRU (default)
+- RedisCache: any redis.asyncio-compatible client, shared across workers.
+  Enabled by REDIS_URL; tests or local runs can pass a stand-in client.
+
+Entries are grouped by namespace so writes can drop everything derived
+from a table with a single ``invalidate(namespace)`` call.
+
+Usage:
+    return await cached_response(request, CATALOG, "categories", load)
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CATALOG = "catalog"
+
+
+class MemoryCache:
+    """In-process cache with per-entry TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    async def clear(self):
+        self._entries.clear()
+
+
+class RedisCache:
+    """Cache backed by a Redis-compatible async client."""
+
+    def __init__(self, client, key_prefix: str = "qg:cache:"):
+        self.client = client
+        self.key_prefix = key_prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.client.get(self.key_prefix + key)
+        if isinstance(value, str):
+            value = value.encode()
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int):
+        await self.client.set(self.key_prefix + key, value, ex=ttl)
+
+    async def delete(self, key: str):
+        await self.client.delete(self.key_prefix + key)
+
+    async def delete_prefix(self, prefix: str):
+        keys = [k async for k in self.client.scan_iter(match=f"{self.key_prefix}{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self):
+        await self.delete_prefix("")
+
+
+def _build_cache():
+    if settings.REDIS_URL:
+        try:
+            import redis.asyncio as redis
+            return RedisCache(redis.from_url(settings.REDIS_URL))
+        except ImportError:
+            logger.warning("REDIS_URL set but the redis package is not installed — using in-process cache")
+    return MemoryCache(max_entries=settings.CACHE_MAX_ENTRIES)
+
+
+cache = _build_cache()
+
+
+def use_cache(backend):
+    """Swap the active cache backend (e.g. a Redis stand-in)."""
+    global cache
+    cache = backend
+
+
+async def invalidate(namespace: str):
+    """Drop every cached entry in ``namespace``. Never raises."""
+    try:
+        await cache.delete_prefix(f"{namespace}:")
+    except Exception as e:
+        logger.error(f"Cache invalidation failed for {namespace}: {e}")
+
+
+def etag_for(body: bytes) -> str:
+    return 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value matches ``etag``."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison: W/"x" and "x" are equivalent for If-None-Match
+    wanted = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag.removeprefix("W/") in wanted
+
+
+async def cached_response(
+    request: Request,
+    namespace: str,
+    key: str,
+    loader: Callable[[], Awaitable],
+    ttl: Optional[int] = None,
+) -> Response:
+    """Serve ``loader()``'s JSON from cache, with ETag / 304 support."""
+    full_key = f"{namespace}:{key}"
+    body = None
+    try:
+        body = await cache.get(full_key)
+    except Exception as e:
+        logger.error(f"Cache read failed for {full_key}: {e}")
+
+    if body is None:
+        data = await loader()
+        body = json.dumps(jsonable_encoder(data), separators=(",", ":")).encode()
+        try:
+            await cache.set(full_key, body, ttl or settings.CATALOG_CACHE_TTL)
+        except Exception as e:
+            logger.error(f"Cache write failed for {full_key}: {e}")
+
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -23,10 +23,23 @@ class Settings(BaseModel):
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-only-insecure-key" if _debug else "")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    # Verified tokens remembered per worker, and seconds a user's provider id is cached
+    TOKEN_CACHE_SIZE: int = 4096
+    PROVIDER_LOOKUP_TTL: int = int(os.getenv("PROVIDER_LOOKUP_TTL", "300"))
+
+    # Passwords — bcrypt cost (hashes with a different cost are upgraded on login)
+    # and hashing threads (0 = one per CPU core)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_WORKERS: int = int(os.getenv("PASSWORD_WORKERS", "0"))
 
     # OTP
     OTP_EXPIRE_MINUTES: int = 10
     OTP_LENGTH: int = 6
+    # Codes a phone may request in a burst, refilled evenly over OTP_RATE_WINDOW seconds
+    OTP_RATE_BURST: int = int(os.getenv("OTP_RATE_BURST", "5"))
+    OTP_RATE_WINDOW: int = int(os.getenv("OTP_RATE_WINDOW", "600"))
+    OTP_MAX_ATTEMPTS: int = 5  # wrong guesses before a code is locked
+    OTP_PURGE_INTERVAL: int = 3600  # seconds between expired-code cleanups
 
     # Termii SMS
     TERMII_API_KEY: str = os.getenv("TERMII_API_KEY", "")
@@ -39,6 +52,9 @@ class Settings(BaseModel):
     PAYSTACK_LIVE_SECRET_KEY: str = os.getenv("PAYSTACK_LIVE_SECRET_KEY", "")
     PAYSTACK_LIVE_PUBLIC_KEY: str = os.getenv("PAYSTACK_LIVE_PUBLIC_KEY", "")
     PAYSTACK_BASE_URL: str = "https://api.paystack.co"
+    # "async": store + acknowledge webhooks, process them in the job runner;
+    # "inline": process before responding (events are still stored and deduplicated)
+    PAYSTACK_WEBHOOK_MODE: str = os.getenv("PAYSTACK_WEBHOOK_MODE", "async")
 
     @property
     def PAYSTACK_SECRET_KEY(self) -> str:
@@ -56,6 +72,8 @@ class Settings(BaseModel):
     CLOUDINARY_CLOUD_NAME: str = os.getenv("CLOUDINARY_CLOUD_NAME", "")
     CLOUDINARY_API_KEY: str = os.getenv("CLOUDINARY_API_KEY", "")
     CLOUDINARY_API_SECRET: str = os.getenv("CLOUDINARY_API_SECRET", "")
+    # Threads running Cloudinary uploads (also the max uploads in flight per worker)
+    UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", "4"))
 
     # Commissions (10% for both products and services)
     GIFT_COMMISSION_PERCENT: float = float(os.getenv("GIFT_COMMISSION_PERCENT", "10.0"))
@@ -66,6 +84,42 @@ class Settings(BaseModel):
     DELIVERY_PER_KM: int = 0
     EXPRESS_MULTIPLIER: float = 1.0
 
+    # Delivery quotes — cache lifetime and how long checkout waits for Kwik (seconds),
+    # and the distance-based estimate used when Kwik is slow or unavailable (₦)
+    DELIVERY_QUOTE_TTL: int = int(os.getenv("DELIVERY_QUOTE_TTL", "600"))
+    DELIVERY_QUOTE_TIMEOUT: float = float(os.getenv("DELIVERY_QUOTE_TIMEOUT", "3.0"))
+    DELIVERY_ESTIMATE_BASE: int = 800
+    DELIVERY_ESTIMATE_PER_KM: int = 120
+    DELIVERY_ESTIMATE_MIN: int = 1500
+
+    # Cache — in-process by default; set REDIS_URL to share across workers
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    CATALOG_CACHE_TTL: int = int(os.getenv("CATALOG_CACHE_TTL", "300"))  # seconds
+    CACHE_MAX_ENTRIES: int = 1024
+
+    # Admin dashboard — seconds a materialized stats snapshot is reused (0 = always live)
+    DASHBOARD_STATS_MAX_AGE: int = int(os.getenv("DASHBOARD_STATS_MAX_AGE", "0"))
+
+    # Analytics — local timezone for date buckets, and how many days back revenue
+    # is treated as final and served from the rollup table
+    ANALYTICS_TIMEZONE: str = os.getenv("ANALYTICS_TIMEZONE", "Africa/Lagos")
+    REVENUE_ROLLUP_SETTLE_DAYS: int = int(os.getenv("REVENUE_ROLLUP_SETTLE_DAYS", "3"))
+
+    # Expo push — seconds to wait for a batch to fill, seconds before fetching
+    # receipts (Expo recommends ~15 min), and max queued messages per worker
+    PUSH_BATCH_WINDOW: float = float(os.getenv("PUSH_BATCH_WINDOW", "0.5"))
+    PUSH_RECEIPT_DELAY: int = int(os.getenv("PUSH_RECEIPT_DELAY", "900"))
+    PUSH_QUEUE_MAX: int = 10000
+
+    # Background jobs (outbox) — concurrent jobs per poll, idle poll interval,
+    # lease before an abandoned job is retried, retry backoff base (seconds)
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "2.0"))
+    JOB_LEASE_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE: float = 10.0
+    JOB_RETENTION_DAYS: int = 7
+
     # Provider Payouts
     PAYOUT_HOLD_HOURS: int = 24
 
@@ -73,6 +127,18 @@ class Settings(BaseModel):
     KWIK_EMAIL: str = os.getenv("KWIK_EMAIL", "")
     KWIK_PASSWORD: str = os.getenv("KWIK_PASSWORD", "")
     KWIK_ENV: str = os.getenv("KWIK_ENV", "test")  # "test" or "live"
+    # Vendor token lifetime (seconds) and the age at which it is renewed in the background
+    KWIK_TOKEN_TTL: int = int(os.getenv("KWIK_TOKEN_TTL", "21600"))
+    KWIK_TOKEN_REFRESH_AFTER: int = int(os.getenv("KWIK_TOKEN_REFRESH_AFTER", "18000"))
+    # Background status sync — how often to look for due deliveries (seconds),
+    # how many to poll per pass, and how many Kwik calls to have in flight
+    DELIVERY_SYNC_TICK: int = int(os.getenv("DELIVERY_SYNC_TICK", "15"))
+    DELIVERY_SYNC_BATCH: int = 200
+    DELIVERY_SYNC_CONCURRENCY: int = 5
+    # Multi-stop dispatch — how long a vendor's deliveries wait to share a rider
+    # (seconds, 0 dispatches each order on its own) and the most drops per task
+    DELIVERY_BATCH_WINDOW: int = int(os.getenv("DELIVERY_BATCH_WINDOW", "0"))
+    DELIVERY_BATCH_MAX_STOPS: int = int(os.getenv("DELIVERY_BATCH_MAX_STOPS", "8"))
 
     @property
     def KWIK_BASE_URL(self) -> str:
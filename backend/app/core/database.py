@@ -19,6 +19,15 @@ class Base(DeclarativeBase):
     pass
 
 
+def dialect_insert(dialect: str):
+    """``insert()`` with ON CONFLICT support for the given dialect."""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
 async def get_db():
     async with async_session() as session:
         try:
@@ -40,8 +49,16 @@ async def init_db():
         ("users", "lng", float_type),
         ("users", "updated_at", "TIMESTAMP"),
         ("providers", "status_reason", "TEXT"),
+        ("providers", "geohash", f"{varchar}(12)"),
+        ("deliveries", "kwik_status", f"{varchar}(20)"),
+        ("deliveries", "kwik_payload", "TEXT"),
+        ("deliveries", "status_checked_at", "TIMESTAMP"),
+        ("deliveries", "next_check_at", "TIMESTAMP"),
+        ("deliveries", "batch_id", f"{varchar}(36)"),
+        ("deliveries", "stop_sequence", "INTEGER"),
         ("reviews", "order_id", f"{varchar}(255)"),
         ("reviews", "booking_id", f"{varchar}(255)"),
+        ("otps", "attempts", "INTEGER DEFAULT 0"),
     ]
 
     # Each migration in its OWN transaction — PostgreSQL aborts
@@ -57,6 +74,55 @@ async def init_db():
         except Exception:
             pass  # Column already exists
 
+    # Widened columns (SQLite does not enforce VARCHAR lengths)
+    if is_pg:
+        for table, column, col_type in [("otps", "code", "VARCHAR(64)")]:
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(sqlalchemy.text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {col_type}"))
+            except Exception:
+                pass
+
     # Create any new tables (bank_accounts, deliveries, payouts, etc.)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+    # create_all skips indexes on tables that already exist — add any new ones
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                async with engine.begin() as conn:
+                    await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+            except Exception:
+                pass  # Index creation failure must not block startup
+
+    # Geohash for providers created before the column existed
+    from app.models.provider import Provider
+    from app.utils.geo import geohash_encode
+    async with async_session() as session:
+        rows = (await session.execute(
+            sqlalchemy.select(Provider.id, Provider.lat, Provider.lng).where(
+                Provider.geohash.is_(None), Provider.lat.is_not(None), Provider.lng.is_not(None)
+            )
+        )).all()
+        for pid, lat, lng in rows:
+            await session.execute(
+                sqlalchemy.update(Provider).where(Provider.id == pid).values(geohash=geohash_encode(lat, lng))
+            )
+        await session.commit()
+
+    # Rating aggregates for reviews written before they existed
+    from app.models.review import RatingAggregate, Review
+    from app.services.ratings import reconcile_ratings
+    async with async_session() as session:
+        has_aggregates = (await session.execute(sqlalchemy.select(RatingAggregate.target_id).limit(1))).first()
+        has_reviews = (await session.execute(sqlalchemy.select(Review.id).limit(1))).first()
+        if has_reviews and not has_aggregates:
+            await reconcile_ratings(session)
+            await session.commit()
+
+    # Search index for databases whose products table predates it
+    # (create_all only fires the after_create hook for new tables)
+    from app.core.search import install_product_search
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: install_product_search(connection=sync_conn))
@@ -0,0 +1,153 @@
+"""
+Shared outbound HTTP clients.
+
+One long-lived httpx.AsyncClient per integration (Paystack, Kwik, Termii,
+Expo), so connections are pooled and kept alive across requests instead
+of paying a TCP + TLS handshake on every call. Started and closed by the
+app lifespan; get_client() also creates clients lazily for scripts and
+tests that run without it.
+
+HTTP/2 is negotiated where the host supports it and the h2 package is
+installed (httpx[http2]).
+
+Usage:
+    resp = await get_client("paystack").post("/transaction/initialize", json=...)
+"""
+
+import importlib.util
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class IntegrationSpec:
+    base_url: str = ""
+    timeout: httpx.Timeout = field(default_factory=lambda: httpx.Timeout(15.0, connect=5.0))
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+    headers: dict = field(default_factory=dict)
+
+
+INTEGRATIONS = {
+    "paystack": IntegrationSpec(
+        base_url=settings.PAYSTACK_BASE_URL,
+        timeout=httpx.Timeout(20.0, connect=5.0),
+    ),
+    "kwik": IntegrationSpec(
+        base_url=settings.KWIK_BASE_URL,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        max_connections=10,
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Cache-Control": "no-cache",
+        },
+    ),
+    "termii": IntegrationSpec(timeout=httpx.Timeout(10.0, connect=5.0), max_connections=10),
+    # Push fan-out: more concurrent connections to a single host
+    "expo": IntegrationSpec(timeout=httpx.Timeout(15.0, connect=5.0), max_connections=50, max_keepalive=20),
+}
+
+
+class _Metrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0  # 5xx responses
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_ms": round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
+class HTTPClientRegistry:
+    def __init__(self, specs: dict):
+        self.specs = specs
+        self._clients: dict = {}
+        self._metrics: dict = {name: _Metrics() for name in specs}
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        spec = self.specs[name]
+        metrics = self._metrics[name]
+
+        async def on_request(request: httpx.Request):
+            request.extensions["qg_started"] = time.perf_counter()
+
+        async def on_response(response: httpx.Response):
+            started = response.request.extensions.get("qg_started")
+            elapsed_ms = (time.perf_counter() - started) * 1000 if started else 0.0
+            metrics.requests += 1
+            metrics.total_ms += elapsed_ms
+            metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+            if response.status_code >= 500:
+                metrics.errors += 1
+
+        return httpx.AsyncClient(
+            base_url=spec.base_url,
+            headers=spec.headers,
+            timeout=spec.timeout,
+            limits=httpx.Limits(
+                max_connections=spec.max_connections,
+                max_keepalive_connections=spec.max_keepalive,
+                keepalive_expiry=spec.keepalive_expiry,
+            ),
+            http2=spec.http2 and HTTP2_AVAILABLE,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    async def start(self):
+        for name in self.specs:
+            self.get(name)
+        logger.info(f"HTTP clients ready: {', '.join(self.specs)} (http2={'on' if HTTP2_AVAILABLE else 'off'})")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> dict:
+        """Per-integration request metrics and connection pool usage."""
+        out = {}
+        for name in self.specs:
+            entry = self._metrics[name].as_dict()
+            client: Optional[httpx.AsyncClient] = self._clients.get(name)
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            entry["pool"] = {
+                "open": len(connections),
+                "idle": sum(1 for c in connections if c.is_idle()),
+                "max": self.specs[name].max_connections,
+            }
+            out[name] = entry
+        return out
+
+
+http_clients = HTTPClientRegistry(INTEGRATIONS)
+
+
+def get_client(name: str) -> httpx.AsyncClient:
+    """Shared client for an integration. Do not close it."""
+    return http_clients.get(name)
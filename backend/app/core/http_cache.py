@@ -0,0 +1,145 @@
+"""
+Conditional GET support for public read endpoints.
+
+ConditionalGetMiddleware buffers the JSON body of matching GET routes,
+tags it with a weak ETag (content hash) and, where the payload is a single
+row, a Last-Modified taken from its ``updated_at``. Requests carrying a
+matching If-None-Match / If-Modified-Since get an empty 304 instead.
+
+Each route has its own Cache-Control policy so a CDN in front of the API
+can serve repeat reads without touching the app.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from app.core.cache import etag_for, etag_matches
+
+
+@dataclass
+class CachePolicy:
+    pattern: str
+    cache_control: str
+    # Top-level JSON field used for Last-Modified (None = ETag only, e.g.
+    # when the payload also embeds child rows that can change independently)
+    last_modified_field: Optional[str] = None
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+
+PUBLIC_SHORT = "public, max-age=60, s-maxage=300, stale-while-revalidate=600"
+
+ROUTE_POLICIES = [
+    CachePolicy(r"^/api/v1/products/(?!categories$|occasions$|my-products$)[^/]+$", PUBLIC_SHORT, "updated_at"),
+    CachePolicy(r"^/api/v1/providers/(?!me$|nearby$)[^/]+$", PUBLIC_SHORT),
+    CachePolicy(r"^/api/v1/providers/(?!me$)[^/]+/services$", PUBLIC_SHORT),
+    CachePolicy(r"^/api/v1/reviews/[^/]+/[^/]+$", "public, max-age=30, s-maxage=120"),
+]
+
+
+def _http_date(dt: datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def _last_modified(body: bytes, field: str) -> Optional[datetime]:
+    try:
+        value = json.loads(body).get(field)
+        dt = datetime.fromisoformat(value)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.replace(microsecond=0)
+
+
+def _not_modified_since(header: Optional[str], last_modified: Optional[datetime]) -> bool:
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+class ConditionalGetMiddleware:
+    """ASGI middleware applying ``ROUTE_POLICIES`` to successful GETs."""
+
+    def __init__(self, app, policies=None):
+        self.app = app
+        self.policies = policies if policies is not None else ROUTE_POLICIES
+
+    def _policy_for(self, path: str) -> Optional[CachePolicy]:
+        for policy in self.policies:
+            if policy.regex.match(path):
+                return policy
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return await self.app(scope, receive, send)
+        policy = self._policy_for(scope["path"])
+        if policy is None:
+            return await self.app(scope, receive, send)
+
+        request_headers = {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+        start = None
+        chunks = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            await self._finish(policy, request_headers, start, b"".join(chunks), send)
+
+        await self.app(scope, receive, capture)
+
+    async def _finish(self, policy, request_headers, start, body, send):
+        if start["status"] != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        headers = [(k, v) for k, v in start["headers"] if k.lower() != b"cache-control"]
+        etag = next((v.decode() for k, v in headers if k.lower() == b"etag"), None)
+        if etag is None:
+            etag = etag_for(body)
+            headers.append((b"etag", etag.encode()))
+        headers.append((b"cache-control", policy.cache_control.encode()))
+
+        last_modified = None
+        if policy.last_modified_field:
+            last_modified = _last_modified(body, policy.last_modified_field)
+            if last_modified is not None:
+                headers.append((b"last-modified", _http_date(last_modified).encode()))
+
+        # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 §13.2.2)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            not_modified = etag_matches(if_none_match, etag)
+        else:
+            not_modified = _not_modified_since(request_headers.get("if-modified-since"), last_modified)
+
+        if not_modified:
+            headers = [(k, v) for k, v in headers if k.lower() not in (b"content-length", b"content-type")]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({**start, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,238 @@
+"""
+Background jobs via a transactional outbox.
+
+Request handlers call enqueue_job() inside their own transaction, so a
+job exists exactly when the change that caused it commits. A runner
+started from the app lifespan claims due jobs with a lease, runs the
+registered handler in a fresh session, and marks it done — or schedules a
+retry with exponential backoff until max_attempts. Jobs leased by a
+worker that died are picked up again once the lease expires.
+
+    @job("order.cancelled")
+    async def _notify_vendors_of_cancellation(payload: dict, db: AsyncSession): ...
+
+    await enqueue_job(db, "order.cancelled", {"order_id": order.id},
+                      key=f"order-cancelled:{order.id}")
+
+A non-null ``key`` makes the enqueue idempotent: a second job with the
+same key is silently dropped. Handlers should still tolerate running
+twice (at-least-once delivery).
+"""
+
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import delete, event, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.job import OutboxJob
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict, AsyncSession], Awaitable[None]]
+
+HANDLERS: dict = {}
+
+
+def job(kind: str):
+    """Register an async ``handler(payload, db)`` for a job kind."""
+    def register(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    payload: dict = None,
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: int = None,
+):
+    """Add a job to the caller's transaction. The caller commits."""
+    insert = dialect_insert(db.bind.dialect.name)
+    stmt = insert(OutboxJob).values(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        idempotency_key=key,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    if key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["idempotency_key"])
+    await db.execute(stmt)
+    # Start it as soon as the transaction lands rather than on the next poll.
+    # The session gets one pair of listeners however many jobs it enqueues
+    session = db.sync_session
+    session.info["jobs_enqueued"] = True
+    if not session.info.get("jobs_listening"):
+        session.info["jobs_listening"] = True
+        event.listen(session, "after_commit", _wake_after_commit)
+        event.listen(session, "after_rollback", _forget_enqueued)
+
+
+def _wake_after_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        runner.wake()
+
+
+def _forget_enqueued(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before retry number ``attempts`` (exponential, jittered, capped at 1h)."""
+    base = settings.JOB_RETRY_BASE * 2 ** (attempts - 1)
+    return min(3600.0, base) * (0.5 + random.random())
+
+
+class JobRunner:
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._tasks: list = []
+        self._periodic: list = []  # (name, seconds, fn(db))
+
+    @property
+    def session_factory(self):
+        if self._session_factory is None:
+            from app.core.database import async_session
+            return async_session
+        return self._session_factory
+
+    def wake(self):
+        self._wakeup.set()
+
+    def every(self, name: str, seconds: float, fn: Callable[[AsyncSession], Awaitable]):
+        """Run ``fn(db)`` every ``seconds`` while the runner is started. fn need not commit."""
+        self._periodic.append((name, seconds, fn))
+
+    # ── Lifecycle ─────────────────────────────────────────────
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._poll_loop(), name="jobs-poll"))
+        for name, seconds, fn in self._periodic:
+            self._tasks.append(asyncio.create_task(self._periodic_loop(name, seconds, fn), name=f"jobs-{name}"))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # ── Running ───────────────────────────────────────────────
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                ran = await self.run_pending(settings.JOB_WORKERS)
+            except Exception as e:
+                logger.error(f"Job poll failed: {e}")
+                ran = 0
+            if ran:
+                continue  # more may be due
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _periodic_loop(self, name: str, seconds: float, fn):
+        while True:
+            try:
+                async with self.session_factory() as db:
+                    await fn(db)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Periodic job {name} failed: {e}")
+            await asyncio.sleep(seconds)
+
+    async def _claim(self, limit: int) -> list:
+        """Lease up to ``limit`` due jobs. Safe with several workers/processes:
+        each claim is a conditional UPDATE that only one of them wins."""
+        now = datetime.utcnow()
+        due = or_(
+            (OutboxJob.status == "pending") & (OutboxJob.run_after <= now),
+            (OutboxJob.status == "running") & (OutboxJob.locked_until < now),  # abandoned lease
+        )
+        claimed = []
+        async with self.session_factory() as db:
+            ids = (await db.execute(
+                select(OutboxJob.id).where(due).order_by(OutboxJob.run_after).limit(limit)
+            )).scalars().all()
+            for job_id in ids:
+                result = await db.execute(
+                    update(OutboxJob)
+                    .where(OutboxJob.id == job_id, due)
+                    .values(
+                        status="running",
+                        attempts=OutboxJob.attempts + 1,
+                        locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                    )
+                )
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            await db.commit()
+        return claimed
+
+    async def run_pending(self, limit: int = 100) -> int:
+        """Claim and run due jobs once. Returns how many ran."""
+        claimed = await self._claim(limit)
+        if claimed:
+            await asyncio.gather(*(self._run(job_id) for job_id in claimed))
+        return len(claimed)
+
+    async def _run(self, job_id: str):
+        async with self.session_factory() as db:
+            record = await db.get(OutboxJob, job_id)
+            handler = HANDLERS.get(record.kind)
+            error = None
+            if handler is None:
+                error = f"No handler for job kind '{record.kind}'"
+            else:
+                try:
+                    await handler(json.loads(record.payload), db)
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    error = f"{type(e).__name__}: {e}"
+
+            record = await db.get(OutboxJob, job_id)
+            now = datetime.utcnow()
+            record.locked_until = None
+            if error is None:
+                record.status = "done"
+                record.finished_at = now
+                record.last_error = None
+            else:
+                record.last_error = error[:1000]
+                if handler is None or record.attempts >= record.max_attempts:
+                    record.status = "failed"
+                    record.finished_at = now
+                    logger.error(f"Job {record.kind} {job_id} failed permanently: {error}")
+                else:
+                    record.status = "pending"
+                    record.run_after = now + timedelta(seconds=retry_delay(record.attempts))
+                    logger.warning(f"Job {record.kind} {job_id} attempt {record.attempts} failed: {error}")
+            await db.commit()
+
+
+runner = JobRunner()
+
+
+async def purge_finished_jobs(db: AsyncSession):
+    """Delete completed jobs past JOB_RETENTION_DAYS (failed ones are kept for inspection)."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    await db.execute(delete(OutboxJob).where(OutboxJob.status == "done", OutboxJob.finished_at < cutoff))
+
+
+runner.every("purge_outbox", 3600, purge_finished_jobs)
@@ -1,14 +1,25 @@
 """
 Unified notification helper — sends push + in-app for any event.
 Usage: await notify_user(user_id, title, body, notif_type, data, db)
+       await notify_many(user_ids, title, body, notif_type, data, db)
+       await notify_each([{"user_id", "title", "body", ...}, ...], db)
+
+In-app records are written in the caller's transaction; pushes go out
+from a background job once that transaction commits.
 """
 
-from sqlalchemy import select
+from typing import Iterable
+
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.user import User
 from app.models.notification import Notification
-from app.core.push import send_push
+from app.core.jobs import enqueue_job, job
+from app.core.push import send_push, send_push_many
+
+TOKEN_LOOKUP_CHUNK = 500  # user ids per IN (...) when resolving push tokens
+PUSH_JOB_CHUNK = 500  # recipients per push job, so a broadcast is many small retryable jobs
 
 
 async def notify_user(
@@ -19,24 +30,84 @@ async def notify_user(
     data: dict = None,
     db: AsyncSession = None,
 ):
-    """Send push notification + create in-app notification record."""
-    if not db:
+    """Create in-app notification record + queue a push notification."""
+    await notify_many([user_id], title, body, notif_type, data, db)
+
+
+async def notify_many(
+    user_ids: Iterable[str],
+    title: str,
+    body: str,
+    notif_type: str = "system",
+    data: dict = None,
+    db: AsyncSession = None,
+) -> int:
+    """Same notification for many users: one bulk insert of in-app records and
+    a push job per PUSH_JOB_CHUNK recipients. Returns the number of recipients."""
+    ids = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not db or not ids:
+        return 0
+
+    await db.execute(insert(Notification), [
+        {"user_id": uid, "title": title, "description": body, "type": notif_type}
+        for uid in ids
+    ])
+    for i in range(0, len(ids), PUSH_JOB_CHUNK):
+        await enqueue_job(db, "push", {
+            "user_ids": ids[i:i + PUSH_JOB_CHUNK], "title": title, "body": body, "data": data or {},
+        })
+    return len(ids)
+
+
+async def notify_each(notifications: list, db: AsyncSession = None, key: str = None) -> int:
+    """A different notification per user, still one bulk insert and one push job.
+
+    Each item: ``{"user_id", "title", "body", "type"?, "data"?, "push_title"?, "push_body"?}``
+    (push_* default to the in-app title/body). ``key`` makes the push idempotent.
+    """
+    notifications = [n for n in notifications if n.get("user_id")]
+    if not db or not notifications:
+        return 0
+
+    await db.execute(insert(Notification), [
+        {"user_id": n["user_id"], "title": n["title"], "description": n["body"], "type": n.get("type", "system")}
+        for n in notifications
+    ])
+    messages = [
+        {
+            "user_id": n["user_id"],
+            "title": n.get("push_title") or n["title"],
+            "body": n.get("push_body") or n["body"],
+            "data": n.get("data") or {},
+        }
+        for n in notifications
+    ]
+    await enqueue_job(db, "push", {"messages": messages}, key=key)
+    return len(notifications)
+
+
+async def _push_tokens(db: AsyncSession, user_ids: list) -> dict:
+    """``{user_id: push_token}`` for users that have one, in chunked IN queries."""
+    tokens = {}
+    for i in range(0, len(user_ids), TOKEN_LOOKUP_CHUNK):
+        rows = (await db.execute(
+            select(User.id, User.push_token).where(
+                User.id.in_(user_ids[i:i + TOKEN_LOOKUP_CHUNK]), User.push_token.is_not(None)
+            )
+        )).all()
+        tokens.update(rows)
+    return tokens
+
+
+@job("push")
+async def _push_job(payload: dict, db: AsyncSession):
+    if "messages" in payload:
+        messages = payload["messages"]
+        tokens = await _push_tokens(db, list(dict.fromkeys(m["user_id"] for m in messages)))
+        for m in messages:
+            await send_push(tokens.get(m["user_id"]), m["title"], m["body"], m["data"], wait=True)
         return
 
-    # Create in-app notification record
-    notif = Notification(
-        user_id=user_id,
-        title=title,
-        description=body,
-        type=notif_type,
-    )
-    db.add(notif)
-
-    # Send push notification
-    user_result = await db.execute(select(User).where(User.id == user_id))
-    user = user_result.scalars().first()
-    if user and user.push_token:
-        try:
-            await send_push(user.push_token, title, body, data or {})
-        except Exception:
-            pass  # Push failure should not block the operation
+    ids = payload.get("user_ids") or [payload["user_id"]]
+    tokens = await _push_tokens(db, ids)
+    await send_push_many(tokens.values(), payload["title"], payload["body"], payload["data"], wait=True)
@@ -0,0 +1,116 @@
+"""
+One-time passcodes for phone login and registration.
+
+- Rate limit: a token bucket per phone (OTP_RATE_BURST codes, refilled
+  over OTP_RATE_WINDOW seconds) kept in memory, or in Redis when the app
+  cache is Redis-backed so all workers share it. No COUNT query per send.
+- Codes are stored as an HMAC of phone + code, never in plain text, and
+  expire after OTP_EXPIRE_MINUTES. A code is locked after OTP_MAX_ATTEMPTS
+  wrong guesses.
+- Verification reads only the newest live code for the phone, served by
+  the (phone, created_at) index.
+- purge_expired_otps() runs periodically so the table stays small.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import cache
+from app.core.config import settings
+from app.core.security import generate_otp
+from app.models.user import OTP
+
+logger = logging.getLogger(__name__)
+
+BUCKET_PREFIX = "otp-bucket:"
+MAX_LOCAL_BUCKETS = 100_000
+
+
+def hash_code(phone: str, code: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+class RateLimiter:
+    """Token bucket per key: ``burst`` tokens, refilled evenly over ``window`` seconds."""
+
+    def __init__(self, burst: int = None, window: float = None):
+        self.burst = burst or settings.OTP_RATE_BURST
+        self.window = window or settings.OTP_RATE_WINDOW
+        self._buckets: OrderedDict = OrderedDict()  # key -> (tokens, updated_at)
+
+    def _take(self, state, now: float):
+        tokens, updated = state or (self.burst, now)
+        tokens = min(self.burst, tokens + (now - updated) * self.burst / self.window)
+        if tokens < 1:
+            return False, (tokens, now)
+        return True, (tokens - 1, now)
+
+    async def allow(self, key: str) -> bool:
+        now = time.time()
+        if isinstance(cache.cache, cache.RedisCache):
+            # Shared across workers; read-modify-write, so bursts across
+            # workers can slip one or two extra codes through
+            try:
+                raw = await cache.cache.get(BUCKET_PREFIX + key)
+                allowed, state = self._take(json.loads(raw) if raw else None, now)
+                await cache.cache.set(BUCKET_PREFIX + key, json.dumps(state).encode(), int(self.window))
+                return allowed
+            except Exception as e:
+                logger.error(f"Shared OTP rate limit unavailable, using local buckets: {e}")
+
+        allowed, state = self._take(self._buckets.pop(key, None), now)
+        self._buckets[key] = state
+        if len(self._buckets) > MAX_LOCAL_BUCKETS:
+            self._buckets.popitem(last=False)  # oldest buckets are full again anyway
+        return allowed
+
+    def reset(self):
+        self._buckets.clear()
+
+
+limiter = RateLimiter()
+
+
+async def issue_otp(phone: str, db: AsyncSession) -> str:
+    """Create a code for ``phone`` and return it (plain, for the SMS). The caller commits."""
+    code = generate_otp()
+    db.add(OTP(
+        phone=phone,
+        code=hash_code(phone, code),
+        expires_at=datetime.utcnow() + timedelta(minutes=settings.OTP_EXPIRE_MINUTES),
+    ))
+    return code
+
+
+async def consume_otp(phone: str, code: str, db: AsyncSession) -> bool:
+    """Check ``code`` against the phone's newest live OTP and mark it used
+    (the caller commits). Wrong guesses are counted and committed here."""
+    otp = (await db.execute(
+        select(OTP)
+        .where(OTP.phone == phone, OTP.is_used == False, OTP.expires_at >= datetime.utcnow())
+        .order_by(OTP.created_at.desc())
+        .limit(1)
+    )).scalars().first()
+    if not otp:
+        return False
+    if not hmac.compare_digest(otp.code, hash_code(phone, code)):
+        otp.attempts = (otp.attempts or 0) + 1
+        if otp.attempts >= settings.OTP_MAX_ATTEMPTS:
+            otp.is_used = True  # locked; the user must request a new code
+        await db.commit()
+        return False
+    otp.is_used = True
+    return True
+
+
+async def purge_expired_otps(db: AsyncSession):
+    """Delete codes that have expired. Used codes go once they would have expired too."""
+    await db.execute(delete(OTP).where(OTP.expires_at < datetime.utcnow()))
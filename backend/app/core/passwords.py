@@ -0,0 +1,86 @@
+"""
+Password hashing off the event loop.
+
+bcrypt costs 100-300 ms of CPU per hash or check. The bcrypt library
+releases the GIL, so running it in a thread pool sized to the machine's
+cores lets logins proceed in parallel while the event loop keeps serving
+other requests. Callers beyond the pool size wait on a semaphore rather
+than piling up in the executor queue.
+
+verify() also reports when a stored hash was made with old cost settings
+(BCRYPT_ROUNDS changed) and returns a fresh hash to save, so hashes are
+upgraded transparently on login.
+
+Usage:
+    ok, new_hash = await passwords.verify(req.password, user.password_hash)
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.core.security import pwd_context
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = None):
+        self.workers = workers or settings.PASSWORD_WORKERS or os.cpu_count() or 2
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.hashes = 0
+        self.verifies = 0
+        self.rehashes = 0
+        self.waiting = 0
+        self.busy_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            self._slots = asyncio.Semaphore(self.workers)
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        self.hashes += 1
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Check a password. Returns (ok, new_hash); new_hash is set when the
+        stored hash uses outdated cost settings and should be replaced."""
+        self.verifies += 1
+        ok, new_hash = await self._run(pwd_context.verify_and_update, password, hashed)
+        if new_hash:
+            self.rehashes += 1
+        return ok, new_hash
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        operations = self.hashes + self.verifies
+        return {
+            "workers": self.workers,
+            "hashes": self.hashes,
+            "verifies": self.verifies,
+            "rehashes": self.rehashes,
+            "waiting": self.waiting,
+            "avg_ms": round(self.busy_seconds * 1000 / operations, 1) if operations else None,
+            "rounds": settings.BCRYPT_ROUNDS,
+        }
+
+
+passwords = PasswordHasher()
@@ -1,14 +1,253 @@
+"""
+Expo push delivery.
+
+send_push() / send_push_many() only enqueue; a background dispatcher
+(started from the app lifespan) drains the queue, coalesces messages into
+Expo's 100-message batch requests, retries 429/5xx/network failures with
+exponential backoff, and later fetches push receipts. Tokens Expo reports
+as DeviceNotRegistered are cleared from users.push_token.
+
+Request handlers never wait on Expo. Without a running dispatcher
+(scripts, tests) messages stay queued until flush() is awaited.
+
+The queue is bounded. Best-effort callers drop messages when it is full;
+the outbox "push" job passes wait=True instead, which waits for room and
+raises if none frees up, so the job runner retries rather than marking a
+partly-dropped broadcast as sent.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Iterable, Optional
+
 import httpx
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.http import get_client
+
+logger = logging.getLogger(__name__)
 
 EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_RECEIPTS_URL = "https://exp.host/--/api/v2/push/getReceipts"
 
+BATCH_SIZE = 100  # Expo's per-request message limit
+RECEIPT_BATCH_SIZE = 1000  # Expo's per-request receipt id limit
+MAX_ATTEMPTS = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+ENQUEUE_TIMEOUT = 30  # seconds a waiting enqueue blocks on a full queue
 
-async def send_push(token: str, title: str, body: str, data: dict = None):
-    """Send push notification via Expo Push API."""
-    if not token or not token.startswith("ExponentPushToken"):
-        return
+
+def is_expo_token(token: Optional[str]) -> bool:
+    return bool(token) and token.startswith(("ExponentPushToken", "ExpoPushToken"))
+
+
+def build_message(token: str, title: str, body: str, data: dict = None) -> dict:
     message = {"to": token, "title": title, "body": body, "sound": "default"}
     if data:
         message["data"] = data
-    async with httpx.AsyncClient() as client:
-        await client.post(EXPO_PUSH_URL, json=message)
+    return message
+
+
+class PushDispatcher:
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        session_factory=None,
+        batch_window: float = None,
+        receipt_delay: float = None,
+        max_queue: int = None,
+    ):
+        self._client = client
+        self._session_factory = session_factory
+        self.batch_window = settings.PUSH_BATCH_WINDOW if batch_window is None else batch_window
+        self.receipt_delay = settings.PUSH_RECEIPT_DELAY if receipt_delay is None else receipt_delay
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue or settings.PUSH_QUEUE_MAX)
+        # receipt id -> (token, ticket time)
+        self.pending_receipts: dict = {}
+        self.dropped = 0
+        self._tasks: list = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_client("expo")
+
+    def enqueue(self, message: dict) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("Push queue full — dropping message")
+            return False
+
+    async def put(self, message: dict):
+        """Queue with backpressure: wait while the dispatcher drains a full
+        queue. Raises asyncio.QueueFull if nothing is draining it, or
+        TimeoutError if it stays full for ENQUEUE_TIMEOUT."""
+        if self.queue.full() and not self._tasks:
+            raise asyncio.QueueFull("Push queue full and no dispatcher running")
+        await asyncio.wait_for(self.queue.put(message), ENQUEUE_TIMEOUT)
+
+    # ── Lifecycle ─────────────────────────────────────────────
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._send_loop(), name="push-send"),
+            asyncio.create_task(self._receipt_loop(), name="push-receipts"),
+        ]
+
+    async def stop(self):
+        """Stop the workers and send whatever is still queued."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    async def flush(self):
+        """Send everything queued right now, in batches."""
+        while not self.queue.empty():
+            await self._send_batch(self._take(BATCH_SIZE))
+
+    # ── Sending ───────────────────────────────────────────────
+
+    def _take(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _send_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Give a burst (e.g. a broadcast) a moment to fill the batch
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._send_batch(batch)
+            except Exception as e:
+                logger.error(f"Push batch of {len(batch)} failed: {e}")
+
+    async def _post(self, url: str, payload) -> Optional[dict]:
+        """POST with retries. Returns the JSON body, or None if Expo never accepted it."""
+        for attempt in range(MAX_ATTEMPTS):
+            try:
+                resp = await self.client.post(url, json=payload, headers={"Accept-Encoding": "gzip"})
+                if resp.status_code not in RETRY_STATUSES:
+                    if resp.status_code != 200:
+                        logger.error(f"Expo rejected request ({resp.status_code}): {resp.text[:200]}")
+                        return None
+                    return resp.json()
+            except httpx.TransportError as e:
+                logger.warning(f"Expo request failed: {e}")
+            if attempt < MAX_ATTEMPTS - 1:
+                await asyncio.sleep(min(30.0, 2 ** attempt) * (0.5 + random.random()))
+        return None
+
+    async def _send_batch(self, messages: list):
+        if not messages:
+            return
+        body = await self._post(EXPO_PUSH_URL, messages)
+        if body is None:
+            return
+        dead, now = set(), time.monotonic()
+        for message, ticket in zip(messages, body.get("data") or []):
+            if ticket.get("status") == "ok" and ticket.get("id"):
+                self.pending_receipts[ticket["id"]] = (message["to"], now)
+            elif (ticket.get("details") or {}).get("error") == "DeviceNotRegistered":
+                dead.add(message["to"])
+        await self.prune_tokens(dead)
+
+    # ── Receipts ──────────────────────────────────────────────
+
+    async def _receipt_loop(self):
+        while True:
+            await asyncio.sleep(max(self.receipt_delay / 4, 1.0))
+            try:
+                await self.check_receipts()
+            except Exception as e:
+                logger.error(f"Push receipt check failed: {e}")
+
+    async def check_receipts(self, older_than: float = None):
+        """Fetch receipts for tickets older than ``older_than`` seconds
+        (default PUSH_RECEIPT_DELAY) and prune dead tokens."""
+        cutoff = time.monotonic() - (self.receipt_delay if older_than is None else older_than)
+        due = [rid for rid, (_, sent) in self.pending_receipts.items() if sent <= cutoff]
+        dead = set()
+        for i in range(0, len(due), RECEIPT_BATCH_SIZE):
+            ids = due[i:i + RECEIPT_BATCH_SIZE]
+            body = await self._post(EXPO_RECEIPTS_URL, {"ids": ids})
+            if body is None:
+                continue  # keep them for the next pass
+            receipts = body.get("data") or {}
+            for rid in ids:
+                token, _ = self.pending_receipts.pop(rid)
+                receipt = receipts.get(rid) or {}
+                if (receipt.get("details") or {}).get("error") == "DeviceNotRegistered":
+                    dead.add(token)
+        await self.prune_tokens(dead)
+
+    async def prune_tokens(self, tokens: Iterable[str]):
+        tokens = list(tokens)
+        if not tokens:
+            return
+        from app.models.user import User
+        factory = self._session_factory
+        if factory is None:
+            from app.core.database import async_session as factory
+        async with factory() as db:
+            await db.execute(update(User).where(User.push_token.in_(tokens)).values(push_token=None))
+            await db.commit()
+        logger.info(f"Pruned {len(tokens)} unregistered push token(s)")
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "awaiting_receipts": len(self.pending_receipts),
+            "dropped": self.dropped,
+            "running": bool(self._tasks),
+        }
+
+
+dispatcher = PushDispatcher()
+
+
+async def send_push(token: str, title: str, body: str, data: dict = None, wait: bool = False):
+    """Queue a push notification via the Expo Push API. With ``wait``, a full
+    queue applies backpressure (or raises) instead of dropping the message."""
+    if not is_expo_token(token):
+        return
+    message = build_message(token, title, body, data)
+    if wait:
+        await dispatcher.put(message)
+    else:
+        dispatcher.enqueue(message)
+
+
+async def send_push_many(
+    tokens: Iterable[str], title: str, body: str, data: dict = None, wait: bool = False,
+) -> int:
+    """Queue the same notification for many devices. Returns how many were queued."""
+    queued = 0
+    for token in tokens:
+        if not is_expo_token(token):
+            continue
+        message = build_message(token, title, body, data)
+        if wait:
+            await dispatcher.put(message)
+            queued += 1
+        elif dispatcher.enqueue(message):
+            queued += 1
+    return queued
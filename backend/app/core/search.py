@@ -0,0 +1,144 @@
+"""
+Full-text product search.
+
+PostgreSQL: GIN index over a to_tsvector() expression of the searchable
+columns, queried with the identical expression so the planner uses it.
+SQLite: FTS5 table (products_fts) kept in sync by triggers on products.
+Any other backend (or SQLite without FTS5) falls back to ILIKE.
+"""
+
+import re
+import sqlite3
+
+from sqlalchemy import Float, String, func, literal_column, or_, text
+
+SEARCH_COLUMNS = ("name", "vendor_name", "description", "tags")
+
+# Column weights for bm25() — product_id is UNINDEXED so it gets 0
+FTS_WEIGHTS = "0.0, 10.0, 5.0, 1.0, 2.0"
+
+PG_INDEX_NAME = "ix_products_search"
+
+
+def _sqlite_has_fts5() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            options = [row[0] for row in conn.execute("PRAGMA compile_options")]
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return "ENABLE_FTS5" in options
+
+
+SQLITE_FTS5 = _sqlite_has_fts5()
+
+
+def _pg_document(prefix: str = "") -> str:
+    """tsvector expression — must match the index definition exactly."""
+    parts = " || ' ' || ".join(f"coalesce({prefix}{col}, '')" for col in SEARCH_COLUMNS)
+    return f"to_tsvector('simple'::regconfig, {parts})"
+
+
+def _tokens(search: str) -> list:
+    return re.findall(r"[^\W_]+", search.lower())
+
+
+# ── Index management ─────────────────────────────────────
+
+def install_product_search(target=None, connection=None, **kw):
+    """Create the search index/table for products. Safe to run repeatedly.
+
+    Used both as an ``after_create`` listener on the products table and
+    from ``init_db`` for databases created before search existed.
+    """
+    dialect = connection.dialect.name
+
+    if dialect == "postgresql":
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {PG_INDEX_NAME} ON products USING GIN ({_pg_document()})"
+        )
+        return
+
+    if dialect != "sqlite" or not SQLITE_FTS5:
+        return
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+    ).first()
+    if exists:
+        return
+
+    cols = ", ".join(SEARCH_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE products_fts USING fts5("
+        f"product_id UNINDEXED, {cols}, "
+        f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+        f"INSERT INTO products_fts (product_id, {cols}) VALUES (new.id, {new_cols}); END"
+    )
+    connection.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+        "DELETE FROM products_fts WHERE product_id = old.id; END"
+    )
+    connection.exec_driver_sql(
+        f"CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF id, {cols} ON products BEGIN "
+        f"DELETE FROM products_fts WHERE product_id = old.id; "
+        f"INSERT INTO products_fts (product_id, {cols}) VALUES (new.id, {new_cols}); END"
+    )
+    # Backfill rows that existed before the index
+    connection.exec_driver_sql(
+        f"INSERT INTO products_fts (product_id, {cols}) SELECT id, {cols} FROM products"
+    )
+
+
+def drop_product_search(target=None, connection=None, **kw):
+    """``before_drop`` listener — the FTS table outlives products otherwise."""
+    if connection.dialect.name == "sqlite" and SQLITE_FTS5:
+        connection.exec_driver_sql("DROP TABLE IF EXISTS products_fts")
+
+
+# ── Querying ─────────────────────────────────────────────
+
+def apply_product_search(query, search: str, dialect: str):
+    """Filter a ``select(Product)`` by ``search``.
+
+    Returns ``(query, rank)`` where ``rank`` is an ORDER BY clause putting
+    the best matches first, or ``None`` when ranking isn't available.
+    """
+    from app.models.product import Product
+
+    tokens = _tokens(search)
+
+    if tokens and dialect == "postgresql":
+        document = literal_column(_pg_document("products."))
+        tsquery = func.to_tsquery(literal_column("'simple'::regconfig"), " & ".join(f"{t}:*" for t in tokens))
+        query = query.where(document.op("@@")(tsquery))
+        return query, func.ts_rank(document, tsquery).desc()
+
+    if tokens and dialect == "sqlite" and SQLITE_FTS5:
+        match = " ".join(f'"{t}"*' for t in tokens)
+        matches = (
+            text(
+                f"SELECT product_id, bm25(products_fts, {FTS_WEIGHTS}) AS rank "
+                "FROM products_fts WHERE products_fts MATCH :match"
+            )
+            .bindparams(match=match)
+            .columns(product_id=String, rank=Float)
+            .subquery("product_search")
+        )
+        query = query.join(matches, Product.id == matches.c.product_id)
+        return query, matches.c.rank.asc()
+
+    pattern = f"%{search}%"
+    query = query.where(or_(
+        Product.name.ilike(pattern),
+        Product.vendor_name.ilike(pattern),
+        Product.description.ilike(pattern),
+        Product.tags.ilike(pattern),
+    ))
+    return query, None
@@ -1,20 +1,27 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
+import logging
 import random
 import string
+import time
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from app.core import cache
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 security = HTTPBearer()
 
 
 def hash_password(password: str) -> str:
+    """Blocking — request handlers should use app.core.passwords instead."""
     return pwd_context.hash(password)
 
 
@@ -29,27 +36,103 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
+# Verified tokens -> payload, so a client's repeat requests skip the signature check
+_verified_tokens: OrderedDict = OrderedDict()
+
+
 def decode_token(token: str) -> dict:
+    payload = _verified_tokens.get(token)
+    if payload is not None:
+        if payload.get("exp", 0) > time.time():
+            _verified_tokens.move_to_end(token)
+            return dict(payload)
+        del _verified_tokens[token]
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
         )
+    if "exp" in payload:
+        _verified_tokens[token] = payload
+        if len(_verified_tokens) > settings.TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return dict(payload)
 
 
 def generate_otp() -> str:
     return "".join(random.choices(string.digits, k=settings.OTP_LENGTH))
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+PROVIDER_BY_USER = "provider-by-user"
+
+
+class CurrentUser(dict):
+    """The caller's identity: ``{"user_id", "role"}`` plus lazy lookups of
+    their User and Provider rows, loaded at most once per request."""
+
+    _user = None
+    _provider = None
+
+    async def user(self, db):
+        """The caller's User row, or None."""
+        if self._user is None:
+            from app.models.user import User
+            self._user = await db.get(User, self["user_id"])
+        return self._user
+
+    async def provider(self, db):
+        """The caller's Provider profile, or None."""
+        if self._provider is None:
+            from sqlalchemy import select
+            from app.models.provider import Provider
+            provider_id = await self._cached_provider_id()
+            if provider_id:
+                self._provider = await db.get(Provider, provider_id)
+            else:
+                self._provider = (await db.execute(
+                    select(Provider).where(Provider.user_id == self["user_id"])
+                )).scalars().first()
+                if self._provider is not None:
+                    await self._cache_provider_id(self._provider.id)
+        return self._provider
+
+    async def provider_id(self, db) -> Optional[str]:
+        """Just the Provider id — usually served from the cross-request cache without a query."""
+        return await self._cached_provider_id() or getattr(await self.provider(db), "id", None)
+
+    async def _cached_provider_id(self) -> Optional[str]:
+        try:
+            value = await cache.cache.get(f"{PROVIDER_BY_USER}:{self['user_id']}:id")
+        except Exception as e:
+            logger.error(f"Provider lookup cache read failed: {e}")
+            return None
+        return value.decode() if value else None
+
+    async def _cache_provider_id(self, provider_id: str):
+        try:
+            await cache.cache.set(
+                f"{PROVIDER_BY_USER}:{self['user_id']}:id", provider_id.encode(), settings.PROVIDER_LOOKUP_TTL,
+            )
+        except Exception as e:
+            logger.error(f"Provider lookup cache write failed: {e}")
+
+
+async def forget_provider(user_id: str):
+    """Drop the cached provider lookup for a user after their profile changes."""
+    try:
+        await cache.cache.delete(f"{PROVIDER_BY_USER}:{user_id}:id")
+    except Exception as e:
+        logger.error(f"Provider lookup cache delete failed: {e}")
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> CurrentUser:
     payload = decode_token(credentials.credentials)
     user_id = payload.get("sub")
     if user_id is None:
         raise HTTPException(status_code=401, detail="Invalid token")
-    return {"user_id": user_id, "role": payload.get("role", "user")}
+    return CurrentUser(user_id=user_id, role=payload.get("role", "user"))
 
 
 async def require_admin(current_user: dict = Depends(get_current_user)):
@@ -1,5 +1,5 @@
-import httpx
 from app.core.config import settings
+from app.core.http import get_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,8 +22,7 @@ async def send_sms(to: str, body: str) -> bool:
             "channel": "generic",
             "api_key": settings.TERMII_API_KEY,
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(TERMII_BASE_URL, json=payload, timeout=10)
+        response = await get_client("termii").post(TERMII_BASE_URL, json=payload)
         data = response.json()
 
         if response.status_code == 200 and data.get("message") == "Successfully Sent":
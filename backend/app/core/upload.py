@@ -1,9 +1,112 @@
+"""
+Image uploads to Cloudinary.
+
+Size is enforced before the multipart body is parsed: UploadLimitMiddleware
+answers 413 from Content-Length, or stops reading a body without one once
+it passes the limit, so oversized uploads are never fully received or
+spooled to disk. validate_image() then checks the parsed file in chunks:
+the first bytes must match the declared image type, and the size is
+re-checked without reading it into memory. The Cloudinary SDK is
+synchronous, so the call runs in a small dedicated thread pool (UPLOAD_WORKERS) and streams from the request's
+spooled temp file rather than an in-memory copy. A slow upload occupies one
+pool thread, not the event loop.
+
+Display sizes are Cloudinary derived images: WebP at fixed widths plus a
+tiny blurred placeholder, requested eagerly at upload so they are rendered
+before the first catalog view. image_variants() maps any stored Cloudinary
+URL to them, so responses expose the sizes without extra columns.
+"""
+
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import cloudinary
 import cloudinary.uploader
 from fastapi import UploadFile
 
 from app.core.config import settings
 
+ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp"}
+MAX_SIZE_BYTES = 5 * 1024 * 1024  # 5 MB
+MAX_BODY_BYTES = MAX_SIZE_BYTES + 64 * 1024  # file plus multipart headers and boundaries
+UPLOAD_PATH_PREFIX = "/api/v1/upload/"
+CHUNK_SIZE = 64 * 1024
+
+# Derived image transformations, smallest first
+VARIANTS = {
+    "thumb": "c_fill,g_auto,w_200,h_200,f_webp,q_auto",
+    "medium": "c_limit,w_600,f_webp,q_auto",
+    "large": "c_limit,w_1200,f_webp,q_auto",
+    "placeholder": "c_limit,w_32,e_blur:1000,f_webp,q_1",  # ~1 KB, shown while loading
+}
+CLOUDINARY_UPLOAD_PATH = "/image/upload/"
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class UploadRejected(ValueError):
+    """The file failed validation (type or size)."""
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    """Reject upload requests whose body exceeds ``max_bytes`` before the
+    route parses (and spools) the multipart form."""
+
+    def __init__(self, app, max_bytes: int = MAX_BODY_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(UPLOAD_PATH_PREFIX):
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+        too_large = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            # The form parser turns the abort into its own 400; answer 413 instead
+            if not too_large:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except _BodyTooLarge:
+            pass
+        if too_large:
+            await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({
+            "detail": f"File too large. Maximum size is {MAX_SIZE_BYTES // (1024 * 1024)} MB.",
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
 
 def _configure_cloudinary():
     """Configure Cloudinary SDK with settings from environment."""
@@ -15,13 +118,74 @@ def _configure_cloudinary():
     )
 
 
+def _sniff(head: bytes) -> Optional[str]:
+    """Image type from the file's magic bytes."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+async def validate_image(file: UploadFile, max_bytes: int = MAX_SIZE_BYTES) -> int:
+    """Check type and size of the parsed file in one chunked pass, then
+    rewind. Returns the size. Raises UploadRejected."""
+    if file.content_type not in ALLOWED_TYPES:
+        raise UploadRejected(f"Invalid file type '{file.content_type}'. Allowed: jpg, png, webp.")
+
+    size = 0
+    chunk = await file.read(CHUNK_SIZE)
+    if _sniff(chunk) != file.content_type:
+        raise UploadRejected("File content does not match its image type.")
+    while chunk:
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadRejected(f"File too large. Maximum size is {max_bytes // (1024 * 1024)} MB.")
+        chunk = await file.read(CHUNK_SIZE)
+    await file.seek(0)
+    return size
+
+
+def _executor_pool() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix="upload")
+    return _executor
+
+
+def shutdown_uploads():
+    """Stop the upload threads (waits for uploads in progress)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def image_variants(url: Optional[str]) -> Optional[dict]:
+    """Thumb/medium/large WebP and placeholder URLs for a Cloudinary image,
+    or None for empty and non-Cloudinary URLs."""
+    if not url or "res.cloudinary.com" not in url or CLOUDINARY_UPLOAD_PATH not in url:
+        return None
+    base, path = url.split(CLOUDINARY_UPLOAD_PATH, 1)
+    return {name: f"{base}{CLOUDINARY_UPLOAD_PATH}{t}/{path}" for name, t in VARIANTS.items()}
+
+
 async def upload_image(file: UploadFile, folder: str = "quickgift") -> str:
     """Upload an image to Cloudinary and return the secure URL."""
     _configure_cloudinary()
-    contents = await file.read()
-    result = cloudinary.uploader.upload(
-        contents,
-        folder=folder,
-        resource_type="image",
+    await file.seek(0)
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        _executor_pool(),
+        lambda: cloudinary.uploader.upload(
+            file.file,
+            folder=folder,
+            resource_type="image",
+            # Render the display sizes now, in the background on Cloudinary's side
+            eager=[{"raw_transformation": t} for t in VARIANTS.values()],
+            eager_async=True,
+        ),
     )
     return result["secure_url"]
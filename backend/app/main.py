@@ -5,13 +5,38 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.database import init_db
+from app.core.http import http_clients
+from app.core.jobs import runner as job_runner
+from app.core.otp import purge_expired_otps
+from app.core.passwords import passwords
+from app.core.push import dispatcher as push_dispatcher
+from app.core.upload import UploadLimitMiddleware, shutdown_uploads
+from app.core.http_cache import ConditionalGetMiddleware
 from app.api.v1.router import api_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await http_clients.start()
+    await push_dispatcher.start()
+    job_runner.every("purge_otps", settings.OTP_PURGE_INTERVAL, purge_expired_otps)
+    if settings.DASHBOARD_STATS_MAX_AGE > 0:
+        from app.services.stats import refresh_dashboard_snapshot
+        job_runner.every("dashboard_snapshot", settings.DASHBOARD_STATS_MAX_AGE, refresh_dashboard_snapshot)
+    if settings.KWIK_EMAIL:
+        from app.services.delivery_sync import sync_due_deliveries
+        job_runner.every("delivery_sync", settings.DELIVERY_SYNC_TICK, sync_due_deliveries)
+        if settings.DELIVERY_BATCH_WINDOW > 0:
+            from app.services.delivery_batching import dispatch_batches
+            job_runner.every("delivery_batches", settings.DELIVERY_SYNC_TICK, dispatch_batches)
+    await job_runner.start()
     yield
+    await job_runner.stop()
+    await push_dispatcher.stop()
+    shutdown_uploads()
+    passwords.shutdown()
+    await http_clients.close()
 
 
 app = FastAPI(
@@ -22,12 +47,19 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# ETag / Last-Modified / Cache-Control for public read endpoints
+app.add_middleware(ConditionalGetMiddleware)
+
+# Oversized uploads are refused before the multipart body is read
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 app.include_router(api_router)
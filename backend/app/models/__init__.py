@@ -3,8 +3,8 @@ from app.models.product import Product, Category, Occasion
 from app.models.provider import Provider, Service, Portfolio
 from app.models.order import Order, OrderItem
 from app.models.booking import Booking
-from app.models.payment import Payment
-from app.models.review import Review
+from app.models.payment import Payment, WebhookEvent
+from app.models.review import Review, RatingAggregate
 from app.models.chat import Conversation, Message
 from app.models.notification import Notification
 from app.models.transaction import Transaction
@@ -12,3 +12,5 @@ from app.models.payout import Payout
 from app.models.delivery import Delivery
 from app.models.dispute import Dispute
 from app.models.bank_account import BankAccount
+from app.models.stats import StatsSnapshot, RevenueRollup
+from app.models.job import OutboxJob
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import String, Float, Integer, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -10,6 +10,9 @@ from app.core.database import Base
 
 class Delivery(Base):
     __tablename__ = "deliveries"
+    __table_args__ = (
+        Index("ix_deliveries_status_next_check_at", "status", "next_check_at"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     order_id: Mapped[str] = mapped_column(String, ForeignKey("orders.id"), index=True)
@@ -18,8 +21,17 @@ class Delivery(Base):
     # Kwik reference
     kwik_order_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True, index=True)
     kwik_job_id: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
-
-    # Status: pending, dispatched, picked_up, in_transit, delivered, failed, cancelled
+    # Last polled Kwik status (see services.delivery_sync)
+    kwik_status: Mapped[Optional[str]] = mapped_column(String(20), nullable=True)
+    kwik_payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    status_checked_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    next_check_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    # Multi-stop Kwik task this delivery rode on, and its place in the route
+    batch_id: Mapped[Optional[str]] = mapped_column(String(36), nullable=True, index=True)
+    stop_sequence: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    # Status: pending, batching (claimed for a multi-stop task), dispatched, picked_up,
+    # in_transit, delivered, failed, cancelled
     status: Mapped[str] = mapped_column(String(20), default="pending")
 
     # Pickup (vendor)
@@ -2,10 +2,11 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Float, Integer, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import String, Float, Integer, Boolean, DateTime, Text, ForeignKey, Index, event
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
+from app.core.search import install_product_search, drop_product_search
 
 
 class Category(Base):
@@ -33,6 +34,11 @@ class Occasion(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination for the default (popular) and newest listings
+        Index("ix_products_status_order_count", "status", "order_count", "id"),
+        Index("ix_products_status_created_at", "status", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name: Mapped[str] = mapped_column(String(200))
@@ -53,3 +59,8 @@ class Product(Base):
     city: Mapped[Optional[str]] = mapped_column(String(50), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Full-text search index lives alongside the table (see app/core/search.py)
+event.listen(Product.__table__, "after_create", install_product_search)
+event.listen(Product.__table__, "before_drop", drop_product_search)
@@ -2,14 +2,19 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Float, Integer, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import String, Float, Integer, Boolean, DateTime, Text, ForeignKey, Index, event
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
+from app.utils.geo import geohash_encode
 
 
 class Provider(Base):
     __tablename__ = "providers"
+    __table_args__ = (
+        # Proximity search: prefix ranges on geohash within verified providers
+        Index("ix_providers_status_geohash", "status", "geohash"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id: Mapped[str] = mapped_column(String, ForeignKey("users.id"), index=True)
@@ -20,6 +25,7 @@ class Provider(Base):
     city: Mapped[str] = mapped_column(String(50))
     lat: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     lng: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    geohash: Mapped[Optional[str]] = mapped_column(String(12), nullable=True)  # derived from lat/lng
     rating: Mapped[float] = mapped_column(Float, default=0.0)
     review_count: Mapped[int] = mapped_column(Integer, default=0)
     booking_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -36,6 +42,18 @@ class Provider(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+
+def _sync_geohash(mapper, connection, target):
+    if target.lat is not None and target.lng is not None:
+        target.geohash = geohash_encode(target.lat, target.lng)
+    else:
+        target.geohash = None
+
+
+event.listen(Provider, "before_insert", _sync_geohash)
+event.listen(Provider, "before_update", _sync_geohash)
+
+
 class Service(Base):
     __tablename__ = "services"
 
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Float, DateTime, Text, UniqueConstraint
+from sqlalchemy import String, Float, Integer, DateTime, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -24,3 +24,20 @@ class Review(Base):
     rating: Mapped[float] = mapped_column(Float)
     comment: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class RatingAggregate(Base):
+    """Running rating totals per review target, maintained on review writes."""
+    __tablename__ = "rating_aggregates"
+
+    target_type: Mapped[str] = mapped_column(String(20), primary_key=True)
+    target_id: Mapped[str] = mapped_column(String, primary_key=True)
+    rating_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    rating_count: Mapped[int] = mapped_column(Integer, default=0)
+    # Histogram: ratings bucketed to the nearest whole star
+    star_1: Mapped[int] = mapped_column(Integer, default=0)
+    star_2: Mapped[int] = mapped_column(Integer, default=0)
+    star_3: Mapped[int] = mapped_column(Integer, default=0)
+    star_4: Mapped[int] = mapped_column(Integer, default=0)
+    star_5: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from sqlalchemy import String, Float, Integer, DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class StatsSnapshot(Base):
+    """Materialized admin stats, keyed by report name (payload is JSON)."""
+    __tablename__ = "stats_snapshots"
+
+    key: Mapped[str] = mapped_column(String(50), primary_key=True)
+    payload: Mapped[str] = mapped_column(Text)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class RevenueRollup(Base):
+    """Paid revenue per local calendar day, for days old enough to be final."""
+    __tablename__ = "revenue_rollups"
+
+    day: Mapped[str] = mapped_column(String(10), primary_key=True)  # YYYY-MM-DD, local time
+    utc_offset_minutes: Mapped[int] = mapped_column(Integer, primary_key=True)
+    gifts: Mapped[float] = mapped_column(Float, default=0.0)
+    beauty: Mapped[float] = mapped_column(Float, default=0.0)
+    refreshed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
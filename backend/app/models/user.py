@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, Boolean, DateTime, Float
+from sqlalchemy import String, Boolean, DateTime, Float, Integer, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -30,11 +30,16 @@ class User(Base):
 
 
 class OTP(Base):
+    """One-time passcode; ``code`` holds an HMAC of the code (see app.core.otp)."""
     __tablename__ = "otps"
+    __table_args__ = (
+        Index("ix_otps_phone_created_at", "phone", "created_at"),
+    )
 
     id: Mapped[str] = mapped_column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     phone: Mapped[str] = mapped_column(String(20), index=True)
-    code: Mapped[str] = mapped_column(String(10))
+    code: Mapped[str] = mapped_column(String(64))
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
     is_used: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     expires_at: Mapped[datetime] = mapped_column(DateTime)
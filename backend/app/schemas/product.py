@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional, List
 from datetime import datetime
 
+from app.core.upload import image_variants as cloudinary_variants
+
 
 class CategoryCreate(BaseModel):
     name: str
@@ -74,6 +76,12 @@ class ProductResponse(BaseModel):
     is_featured: bool
     city: Optional[str]
     created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    @computed_field
+    @property
+    def image_variants(self) -> Optional[dict]:
+        return cloudinary_variants(self.image_url)
 
     class Config:
         from_attributes = True
@@ -81,6 +89,7 @@ class ProductResponse(BaseModel):
 
 class ProductListResponse(BaseModel):
     items: List[ProductResponse]
-    total: int
+    total: Optional[int] = None
     page: int
     per_page: int
+    next_cursor: Optional[str] = None
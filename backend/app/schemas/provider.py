@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import Optional, List
 from datetime import datetime
 
+from app.core.upload import image_variants as cloudinary_variants
+
 
 class ProviderCreate(BaseModel):
     business_name: str
@@ -47,6 +49,11 @@ class ProviderResponse(BaseModel):
     distance_km: Optional[float] = None
     created_at: datetime
 
+    @computed_field
+    @property
+    def avatar_variants(self) -> Optional[dict]:
+        return cloudinary_variants(self.avatar_url)
+
     class Config:
         from_attributes = True
 
@@ -0,0 +1,187 @@
+"""
+Revenue time series for admin analytics.
+
+Paid gift (orders) and beauty (bookings) revenue is bucketed by local
+calendar day/week/month in SQL: date_trunc() on PostgreSQL, strftime()
+on SQLite. Both sources go through one UNION ALL query.
+
+Days older than REVENUE_ROLLUP_SETTLE_DAYS are treated as final. They are
+written once to revenue_rollups and read from there afterwards, so long
+ranges only scan the live tables for the last few days. Pass
+refresh=True to rebuild a range's rollups, e.g. after a late refund.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from fastapi import HTTPException
+from sqlalchemy import DateTime, cast, delete, func, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.booking import Booking
+from app.models.order import Order
+from app.models.stats import RevenueRollup
+
+INTERVALS = ("day", "week", "month")
+MAX_BUCKETS = {"day": 731, "week": 520, "month": 240}
+
+
+def utc_offset_minutes(tz: str, at: date) -> int:
+    """Offset of ``tz`` from UTC at local midnight on ``at``."""
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown timezone: {tz}")
+    return int(datetime.combine(at, datetime.min.time(), zone).utcoffset().total_seconds() // 60)
+
+
+def period_start(day: date, interval: str) -> date:
+    if interval == "week":
+        return day - timedelta(days=day.weekday())  # Monday, like date_trunc('week')
+    if interval == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _periods(start: date, end: date, interval: str) -> list:
+    periods, current = [], period_start(start, interval)
+    while current <= end:
+        periods.append(current)
+        if interval == "day":
+            current += timedelta(days=1)
+        elif interval == "week":
+            current += timedelta(weeks=1)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return periods
+
+
+def bucket_expr(column, interval: str, offset_minutes: int, dialect: str):
+    """SQL expression mapping a timestamp (or 'YYYY-MM-DD' text) to its
+    local period start as 'YYYY-MM-DD'."""
+    if dialect == "postgresql":
+        local = cast(column, DateTime) + timedelta(minutes=offset_minutes)
+        return func.to_char(func.date_trunc(interval, local), "YYYY-MM-DD")
+
+    shift = f"{offset_minutes:+d} minutes"
+    if interval == "week":
+        return func.strftime("%Y-%m-%d", column, shift, "weekday 0", "-6 days")
+    if interval == "month":
+        return func.strftime("%Y-%m-01", column, shift)
+    return func.strftime("%Y-%m-%d", column, shift)
+
+
+async def _live_totals(
+    db: AsyncSession, start: date, end: date, interval: str, offset: int,
+) -> dict:
+    """``{period: [gifts, beauty]}`` from orders/bookings for local days start..end."""
+    dialect = db.bind.dialect.name
+    utc_start = datetime.combine(start, datetime.min.time()) - timedelta(minutes=offset)
+    utc_end = datetime.combine(end + timedelta(days=1), datetime.min.time()) - timedelta(minutes=offset)
+
+    paid = union_all(
+        select(
+            bucket_expr(Order.created_at, interval, offset, dialect).label("period"),
+            literal(0).label("kind"),
+            Order.total.label("amount"),
+        ).where(Order.payment_status == "paid", Order.created_at >= utc_start, Order.created_at < utc_end),
+        select(
+            bucket_expr(Booking.created_at, interval, offset, dialect).label("period"),
+            literal(1).label("kind"),
+            Booking.price.label("amount"),
+        ).where(Booking.payment_status == "paid", Booking.created_at >= utc_start, Booking.created_at < utc_end),
+    ).subquery("paid")
+
+    rows = (await db.execute(
+        select(paid.c.period, paid.c.kind, func.sum(paid.c.amount)).group_by(paid.c.period, paid.c.kind)
+    )).all()
+    totals: dict = {}
+    for period, kind, amount in rows:
+        totals.setdefault(period, [0.0, 0.0])[kind] += amount or 0.0
+    return totals
+
+
+async def _rollup_totals(
+    db: AsyncSession, start: date, end: date, interval: str, offset: int, refresh: bool,
+) -> dict:
+    """``{period: [gifts, beauty]}`` for settled days, materializing missing ones."""
+    in_range = (
+        RevenueRollup.utc_offset_minutes == offset,
+        RevenueRollup.day >= start.isoformat(),
+        RevenueRollup.day <= end.isoformat(),
+    )
+    if refresh:
+        await db.execute(delete(RevenueRollup).where(*in_range))
+        stored = set()
+    else:
+        stored = set((await db.execute(select(RevenueRollup.day).where(*in_range))).scalars().all())
+
+    expected = {d.isoformat() for d in _periods(start, end, "day")}
+    missing = sorted(expected - stored)
+    if missing:
+        daily = await _live_totals(db, date.fromisoformat(missing[0]), date.fromisoformat(missing[-1]), "day", offset)
+        rollups = []
+        for day in missing:
+            gifts, beauty = daily.get(day, (0.0, 0.0))
+            rollups.append({"day": day, "utc_offset_minutes": offset, "gifts": gifts, "beauty": beauty})
+        # A concurrent request may have materialized the same days
+        insert = dialect_insert(db.bind.dialect.name)
+        await db.execute(insert(RevenueRollup).values(rollups).on_conflict_do_nothing())
+
+    period = bucket_expr(RevenueRollup.day, interval, 0, db.bind.dialect.name)
+    rows = (await db.execute(
+        select(period, func.sum(RevenueRollup.gifts), func.sum(RevenueRollup.beauty))
+        .where(*in_range)
+        .group_by(period)
+    )).all()
+    return {p: [gifts or 0.0, beauty or 0.0] for p, gifts, beauty in rows}
+
+
+async def revenue_series(
+    db: AsyncSession,
+    interval: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    tz: Optional[str] = None,
+    refresh: bool = False,
+) -> list:
+    """Zero-filled ``[{"period", "gifts", "beauty"}]`` for local dates start..end."""
+    if interval not in INTERVALS:
+        raise HTTPException(status_code=400, detail=f"interval must be one of {', '.join(INTERVALS)}")
+    tz = tz or settings.ANALYTICS_TIMEZONE
+
+    today = (datetime.utcnow() + timedelta(minutes=utc_offset_minutes(tz, datetime.utcnow().date()))).date()
+    end = end or today
+    start = start or end - timedelta(days=6)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be on or before end")
+    periods = _periods(start, end, interval)
+    if len(periods) > MAX_BUCKETS[interval]:
+        raise HTTPException(status_code=400, detail=f"Range too long for {interval} buckets")
+
+    # Fixed offset for the whole range — exact for WAT (no DST)
+    offset = utc_offset_minutes(tz, start)
+
+    settled_end = min(end, today - timedelta(days=settings.REVENUE_ROLLUP_SETTLE_DAYS))
+    totals: dict = {}
+    parts = []
+    if start <= settled_end:
+        parts.append(await _rollup_totals(db, start, settled_end, interval, offset, refresh))
+    live_start = max(start, settled_end + timedelta(days=1))
+    if live_start <= end:
+        parts.append(await _live_totals(db, live_start, end, interval, offset))
+    # A week/month can straddle the settled boundary — add both halves
+    for part in parts:
+        for period, (gifts, beauty) in part.items():
+            bucket = totals.setdefault(period, [0.0, 0.0])
+            bucket[0] += gifts
+            bucket[1] += beauty
+
+    series = []
+    for p in periods:
+        gifts, beauty = totals.get(p.isoformat(), (0.0, 0.0))
+        series.append({"period": p.isoformat(), "gifts": gifts, "beauty": beauty})
+    return series
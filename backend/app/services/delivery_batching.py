@@ -0,0 +1,227 @@
+"""
+Multi-stop Kwik dispatch.
+
+With DELIVERY_BATCH_WINDOW set, /delivery/create queues non-express
+deliveries instead of dispatching each one. A periodic pass groups the
+queued deliveries of paid orders by pickup (vendor, location cell and
+vehicle). Once a group's oldest delivery has waited the window, or the
+group has DELIVERY_BATCH_MAX_STOPS drops, it goes to Kwik as one task per
+DELIVERY_BATCH_MAX_STOPS drops, visited in nearest-neighbour order from
+the pickup. The Kwik fee for a task is split evenly across its drops.
+
+Deliveries left pending by a failed immediate dispatch are picked up by
+the same pass; express ones are retried as single-drop tasks, never batched.
+
+Every worker runs the pass, so a route's deliveries are claimed before
+Kwik is called: a conditional UPDATE moves each from pending to batching,
+and only the stops this worker won are sent. A failed dispatch puts them
+back to pending; a claim left by a worker that died expires after
+CLAIM_SECONDS.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.delivery import Delivery
+from app.models.order import Order
+from app.services import delivery_sync, kwik as kwik_service
+from app.utils.geo import geohash_encode, haversine_km
+
+logger = logging.getLogger(__name__)
+
+PICKUP_CELL_PRECISION = 7
+SCAN_LIMIT = 1000
+CLAIM_SECONDS = 300
+
+
+def pickup_key(delivery: Delivery) -> tuple:
+    return (
+        delivery.pickup_phone,
+        geohash_encode(delivery.pickup_lat, delivery.pickup_lng, PICKUP_CELL_PRECISION),
+        delivery.vehicle_type,
+    )
+
+
+def route_stops(origin_lat: float, origin_lng: float, stops: list) -> list:
+    """Order deliveries nearest-neighbour first: from the pickup, always
+    drive to the closest drop not yet visited."""
+    remaining = list(stops)
+    route = []
+    lat, lng = origin_lat, origin_lng
+    while remaining:
+        nearest = min(remaining, key=lambda d: haversine_km(lat, lng, d.delivery_lat, d.delivery_lng))
+        remaining.remove(nearest)
+        route.append(nearest)
+        lat, lng = nearest.delivery_lat, nearest.delivery_lng
+    return route
+
+
+def _stop(address: str, name: str, phone: str, lat: float, lng: float) -> dict:
+    return {"address": address, "name": name, "phone": phone, "latitude": lat, "longitude": lng}
+
+
+async def _dispatch(route: list, orders: dict) -> dict:
+    first = route[0]
+    vehicle_id = 0 if first.vehicle_type == "motorcycle" else 1
+    pickup = _stop(first.pickup_address, first.pickup_name, first.pickup_phone, first.pickup_lat, first.pickup_lng)
+    drops = [
+        _stop(d.delivery_address, d.delivery_name, d.delivery_phone, d.delivery_lat, d.delivery_lng)
+        for d in route
+    ]
+    quote = await kwik_service.get_multi_quote(pickup, drops, vehicle_id)
+    task = await kwik_service.create_multi_delivery(
+        pickup, drops,
+        amount=quote["amount"],
+        vehicle_id=vehicle_id,
+        parcel_amount=sum(orders[d.order_id].total for d in route),
+    )
+    return {**task, "amount": quote["amount"]}
+
+
+def _claimable(now: datetime):
+    return Delivery.kwik_order_id.is_(None) & or_(
+        (Delivery.status == "pending") & or_(Delivery.next_check_at.is_(None), Delivery.next_check_at <= now),
+        (Delivery.status == "batching") & (Delivery.next_check_at <= now),  # abandoned claim
+    )
+
+
+async def _claim(db: AsyncSession, routes: list, now: datetime) -> list:
+    """Mark the routes' deliveries as batching for this worker and commit.
+    Returns the routes cut down to the stops this worker won."""
+    won = set()
+    for route in routes:
+        for delivery in route:
+            result = await db.execute(
+                update(Delivery)
+                .where(Delivery.id == delivery.id, _claimable(now))
+                .values(status="batching", next_check_at=now + timedelta(seconds=CLAIM_SECONDS))
+            )
+            if result.rowcount == 1:
+                won.add(delivery.id)
+    await db.commit()
+
+    # The buyer may have cancelled between the scan and the claim
+    cancelled = set((await db.execute(
+        select(Delivery.id)
+        .join(Order, Order.id == Delivery.order_id)
+        .where(Delivery.id.in_(won), Order.status == "cancelled")
+    )).scalars().all())
+    if cancelled:
+        await db.execute(
+            update(Delivery)
+            .where(Delivery.id.in_(cancelled), Delivery.status == "batching")
+            .values(status="cancelled", next_check_at=None)
+        )
+        await db.commit()
+        won -= cancelled
+
+    routes = [[d for d in route if d.id in won] for route in routes]
+    return [route for route in routes if route]
+
+
+async def dispatch_batches(db: AsyncSession, now: Optional[datetime] = None) -> int:
+    """Send every pickup group that is due to Kwik. The caller commits.
+    Returns how many deliveries were dispatched."""
+    if not settings.KWIK_EMAIL:
+        return 0
+    now = now or datetime.utcnow()
+    rows = (await db.execute(
+        select(Delivery, Order)
+        .join(Order, Order.id == Delivery.order_id)
+        .where(
+            _claimable(now),
+            Delivery.pickup_lat.is_not(None),
+            Delivery.delivery_lat.is_not(None),
+            Order.payment_status == "paid",
+            Order.status != "cancelled",
+        )
+        .order_by(Delivery.created_at)
+        .limit(SCAN_LIMIT)
+    )).all()
+
+    groups: dict = {}
+    orders = {}
+    routes = []
+    for delivery, order in rows:
+        orders[order.id] = order
+        if order.is_express:
+            # Left pending by a failed immediate dispatch: retry on its own
+            routes.append([delivery])
+        else:
+            groups.setdefault(pickup_key(delivery), []).append(delivery)
+
+    max_stops = max(1, settings.DELIVERY_BATCH_MAX_STOPS)
+    window = timedelta(seconds=settings.DELIVERY_BATCH_WINDOW)
+    for group in groups.values():
+        if len(group) < max_stops and now - group[0].created_at < window:
+            continue  # keep waiting for more orders from this vendor
+        route = route_stops(group[0].pickup_lat, group[0].pickup_lng, group)
+        routes += [route[i:i + max_stops] for i in range(0, len(route), max_stops)]
+    if routes:
+        routes = await _claim(db, routes, now)
+    if not routes:
+        return 0
+
+    semaphore = asyncio.Semaphore(settings.DELIVERY_SYNC_CONCURRENCY)
+
+    async def send(route: list):
+        async with semaphore:
+            try:
+                return await _dispatch(route, orders)
+            except Exception as e:
+                return e
+
+    dispatched = 0
+    results = await asyncio.gather(*(send(r) for r in routes))
+    for route, result in zip(routes, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Kwik batch dispatch of {len(route)} deliveries failed: {result}")
+            await db.execute(
+                update(Delivery)
+                .where(Delivery.id.in_([d.id for d in route]), Delivery.status == "batching")
+                .values(status="pending", next_check_at=now + window)
+            )
+            continue
+
+        fee = round(float(result["amount"] or 0) / len(route), 2)
+        if len(route) == 1:
+            # A task of its own: the task's job id cancels just this delivery
+            batch_id, job_ids = None, [result.get("job_id")]
+        else:
+            batch_id = str(uuid.uuid4())
+            job_ids = [str(j) for j in result.get("delivery_job_ids") or [] if j is not None]
+            if len(job_ids) != len(route):
+                job_ids = [None] * len(route)  # only the whole task has an id; see cancel_delivery
+        for seq, delivery in enumerate(route, start=1):
+            # Conditional, so nothing written while the stop was claimed is overwritten
+            written = await db.execute(
+                update(Delivery)
+                .where(Delivery.id == delivery.id, Delivery.status == "batching")
+                .values(
+                    kwik_order_id=result["unique_order_id"],
+                    kwik_job_id=job_ids[seq - 1],
+                    batch_id=batch_id,
+                    stop_sequence=seq if batch_id else None,
+                    delivery_fee=fee,
+                    status="dispatched",
+                    dispatched_at=now,
+                    next_check_at=delivery_sync.next_check("dispatched"),
+                )
+            )
+            if written.rowcount != 1:
+                logger.warning(f"Delivery {delivery.id} changed while Kwik task {result['unique_order_id']} was created")
+                continue
+            await db.execute(
+                update(Order)
+                .where(Order.id == delivery.order_id, Order.status != "cancelled")
+                .values(status="in_transit", delivery_fee=fee)
+            )
+            dispatched += 1
+    return dispatched
@@ -0,0 +1,126 @@
+"""
+Cached Kwik delivery quotes.
+
+Quotes are cached per vehicle type and pickup/drop-off geohash cell
+(precision 7, ~150 m), so every checkout for the same vendor-to-
+neighbourhood route after the first is served from cache for
+DELIVERY_QUOTE_TTL seconds. Identical quotes already in flight are
+shared rather than sent to Kwik again.
+
+quote_with_fallback() caps the wait at DELIVERY_QUOTE_TIMEOUT and falls
+back to a distance-based estimate; the Kwik call keeps running and fills
+the cache for the next checkout.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from app.core import cache
+from app.core.config import settings
+from app.services import kwik as kwik_service
+from app.utils.geo import geohash_encode, haversine_km
+
+logger = logging.getLogger(__name__)
+
+QUOTE_CELL_PRECISION = 7
+QUOTE_CACHE_PREFIX = "delivery:quote:"
+ROAD_FACTOR = 1.3  # straight-line to typical Lagos road distance
+VEHICLE_MULTIPLIER = {0: 1.0, 1: 1.8}  # motorcycle, small car
+
+_inflight: dict = {}
+
+
+def quote_key(pickup_lat: float, pickup_lng: float, delivery_lat: float, delivery_lng: float, vehicle_id: int) -> str:
+    return (
+        f"{QUOTE_CACHE_PREFIX}{vehicle_id}:"
+        f"{geohash_encode(pickup_lat, pickup_lng, QUOTE_CELL_PRECISION)}:"
+        f"{geohash_encode(delivery_lat, delivery_lng, QUOTE_CELL_PRECISION)}"
+    )
+
+
+def estimate_fee(pickup_lat: float, pickup_lng: float, delivery_lat: float, delivery_lng: float, vehicle_id: int = 0) -> float:
+    """Distance-based fallback price, rounded up to the next ₦50."""
+    km = haversine_km(pickup_lat, pickup_lng, delivery_lat, delivery_lng) * ROAD_FACTOR
+    fee = (settings.DELIVERY_ESTIMATE_BASE + settings.DELIVERY_ESTIMATE_PER_KM * km) * VEHICLE_MULTIPLIER.get(vehicle_id, 1.0)
+    fee = -(-fee // 50) * 50
+    return max(float(settings.DELIVERY_ESTIMATE_MIN), fee)
+
+
+async def _cached(key: str) -> Optional[dict]:
+    try:
+        body = await cache.cache.get(key)
+    except Exception as e:
+        logger.error(f"Quote cache read failed for {key}: {e}")
+        return None
+    return json.loads(body) if body else None
+
+
+async def _fetch_and_cache(key: str, **kwargs) -> dict:
+    quote = await kwik_service.get_quote(**kwargs)
+    result = {"amount": quote["amount"], "currency": "NGN", "vehicle_id": kwargs["vehicle_id"]}
+    try:
+        await cache.cache.set(key, json.dumps(result).encode(), settings.DELIVERY_QUOTE_TTL)
+    except Exception as e:
+        logger.error(f"Quote cache write failed for {key}: {e}")
+    return result
+
+
+async def kwik_quote(
+    pickup_address: str,
+    pickup_lat: float,
+    pickup_lng: float,
+    delivery_address: str,
+    delivery_lat: float,
+    delivery_lng: float,
+    vehicle_id: int = 0,
+    timeout: Optional[float] = None,
+) -> dict:
+    """Kwik's price for the route, from cache or a shared in-flight request.
+    Raises on Kwik errors, or asyncio.TimeoutError after ``timeout`` seconds."""
+    key = quote_key(pickup_lat, pickup_lng, delivery_lat, delivery_lng, vehicle_id)
+    cached = await _cached(key)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_cache(
+            key,
+            pickup_address=pickup_address, pickup_lat=pickup_lat, pickup_lng=pickup_lng,
+            delivery_address=delivery_address, delivery_lat=delivery_lat, delivery_lng=delivery_lng,
+            vehicle_id=vehicle_id,
+        ))
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    # shield: a caller giving up must not cancel the request others are waiting on
+    result = await asyncio.wait_for(asyncio.shield(task), timeout)
+    return {**result, "cached": False}
+
+
+async def quote_with_fallback(
+    pickup_address: str,
+    pickup_lat: float,
+    pickup_lng: float,
+    delivery_address: str,
+    delivery_lat: float,
+    delivery_lng: float,
+    vehicle_id: int = 0,
+) -> dict:
+    """Checkout quote: Kwik (cached) within DELIVERY_QUOTE_TIMEOUT, else an estimate."""
+    try:
+        quote = await kwik_quote(
+            pickup_address, pickup_lat, pickup_lng,
+            delivery_address, delivery_lat, delivery_lng,
+            vehicle_id, timeout=settings.DELIVERY_QUOTE_TIMEOUT,
+        )
+        return {"amount": quote["amount"], "currency": "NGN", "source": "kwik", "cached": quote["cached"]}
+    except Exception as e:
+        message = "Kwik quote timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+        return {
+            "amount": estimate_fee(pickup_lat, pickup_lng, delivery_lat, delivery_lng, vehicle_id),
+            "currency": "NGN",
+            "source": "estimate",
+            "message": message,
+        }
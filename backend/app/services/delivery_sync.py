@@ -0,0 +1,143 @@
+"""
+Background Kwik status sync.
+
+Active deliveries with a kwik_order_id are polled on a schedule instead of
+on every buyer refresh. Each row carries its own next_check_at, so the
+cadence adapts to the delivery's stage (a rider on the road is checked
+more often than a task still waiting for assignment) and failures back
+off. Polls run with bounded concurrency. The last known Kwik status and
+raw payload are kept on the row (kwik_status, kwik_payload,
+status_checked_at), and /delivery/track serves them without calling Kwik.
+
+Stops of a multi-stop task share one kwik_order_id, so each task is
+polled once per tick and every stop takes its own drop's status where
+Kwik reports it (the task's status otherwise).
+
+Every worker runs the sync, so due tasks are leased first: a conditional
+UPDATE pushes next_check_at past the poll, and only the worker whose
+UPDATE matched polls that task.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.delivery import Delivery
+from app.models.order import Order
+from app.services import kwik as kwik_service
+
+logger = logging.getLogger(__name__)
+
+# Kwik job status -> Delivery.status
+KWIK_TO_DELIVERY_STATUS = {
+    "upcoming": "dispatched",
+    "started": "in_transit",
+    "accepted": "in_transit",
+    "arrived": "in_transit",
+    "ended": "delivered",
+    "failed": "failed",
+    "cancelled": "cancelled",
+}
+
+ACTIVE_STATUSES = ("dispatched", "picked_up", "in_transit")
+
+# Seconds between polls, by our delivery status
+POLL_INTERVALS = {
+    "dispatched": 120,  # waiting for a rider
+    "picked_up": 30,
+    "in_transit": 30,
+}
+MAX_BACKOFF = 900
+LEASE_SECONDS = 60  # a worker that dies mid-poll frees its rows after this
+
+
+def next_check(status: str) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=POLL_INTERVALS.get(status, 120))
+
+
+def kwik_payload(delivery: Delivery) -> Optional[dict]:
+    return json.loads(delivery.kwik_payload) if delivery.kwik_payload else None
+
+
+async def apply_kwik_status(delivery: Delivery, kwik_status: dict, db: AsyncSession):
+    """Record a Kwik tracking result on the delivery (and order, once delivered)."""
+    now = datetime.utcnow()
+    status = (kwik_status.get("drops") or {}).get(str(delivery.kwik_job_id)) or kwik_status["status"]
+    delivery.kwik_status = status
+    delivery.status_checked_at = now
+
+    new_status = KWIK_TO_DELIVERY_STATUS.get(status)
+    if new_status and new_status != delivery.status:
+        delivery.status = new_status
+        if new_status == "delivered":
+            delivery.delivered_at = now
+            await db.execute(update(Order).where(Order.id == delivery.order_id).values(status="delivered"))
+    delivery.next_check_at = next_check(delivery.status) if delivery.status in ACTIVE_STATUSES else None
+    delivery.kwik_payload = json.dumps(kwik_status.get("raw") or {}, default=str)
+
+
+async def _lease_due(db: AsyncSession, now: datetime, limit: int) -> list:
+    """Claim up to ``limit`` due Kwik tasks for this worker and commit the
+    lease, so other workers skip them. Returns the active deliveries on the
+    claimed tasks."""
+    active = Delivery.status.in_(ACTIVE_STATUSES) & Delivery.kwik_order_id.is_not(None)
+    due = active & or_(Delivery.next_check_at.is_(None), Delivery.next_check_at <= now)
+    kwik_ids = (await db.execute(
+        select(Delivery.kwik_order_id).where(due).order_by(Delivery.next_check_at.nulls_first()).limit(limit)
+    )).scalars().all()
+    claimed = []
+    for kwik_id in dict.fromkeys(kwik_ids):  # a task's stops come back once each
+        result = await db.execute(
+            update(Delivery)
+            .where(Delivery.kwik_order_id == kwik_id, due)
+            .values(next_check_at=now + timedelta(seconds=LEASE_SECONDS))
+        )
+        if result.rowcount:
+            claimed.append(kwik_id)
+    await db.commit()
+    if not claimed:
+        return []
+    return (await db.execute(
+        select(Delivery).where(active, Delivery.kwik_order_id.in_(claimed))
+    )).scalars().all()
+
+
+async def sync_due_deliveries(db: AsyncSession, limit: int = None) -> int:
+    """Poll Kwik for every active delivery whose next check is due and that
+    this worker leased. The caller commits. Returns how many were polled."""
+    if not settings.KWIK_EMAIL:
+        return 0
+    now = datetime.utcnow()
+    deliveries = await _lease_due(db, now, limit or settings.DELIVERY_SYNC_BATCH)
+    if not deliveries:
+        return 0
+
+    tasks = list(dict.fromkeys(d.kwik_order_id for d in deliveries))
+    semaphore = asyncio.Semaphore(settings.DELIVERY_SYNC_CONCURRENCY)
+
+    async def poll(kwik_order_id: str):
+        async with semaphore:
+            try:
+                return await kwik_service.track_delivery(kwik_order_id)
+            except Exception as e:
+                return e
+
+    results = dict(zip(tasks, await asyncio.gather(*(poll(k) for k in tasks))))
+    for delivery in deliveries:
+        result = results[delivery.kwik_order_id]
+        if isinstance(result, Exception):
+            logger.warning(f"Kwik status poll for {delivery.kwik_order_id} failed: {result}")
+            # Back off: wait as long as it has been since the last good poll,
+            # which doubles the gap on every consecutive failure
+            base = POLL_INTERVALS.get(delivery.status, 120)
+            since_ok = (now - (delivery.status_checked_at or now)).total_seconds()
+            delivery.next_check_at = now + timedelta(seconds=min(MAX_BACKOFF, max(base, since_ok)))
+            continue
+        await apply_kwik_status(delivery, result, db)
+    return len(deliveries)
@@ -5,74 +5,157 @@ Handles: login, get quote, create delivery, track, cancel.
 Uses Kwik's vendor API — QuickGift acts as the vendor/merchant.
 """
 
-import httpx
-from typing import Optional
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
 from datetime import datetime
 
+import httpx
+
+from app.core import cache
 from app.core.config import settings
+from app.core.http import get_client
 
-# Cache the access token in memory (refreshed on 401)
-_kwik_token: Optional[str] = None
-_kwik_vendor_id: Optional[int] = None
-_kwik_user_id: Optional[int] = None
-_kwik_form_id: Optional[int] = None
+logger = logging.getLogger(__name__)
 
+KWIK_TOKEN_EXPIRED = 101
+TOKEN_CACHE_KEY = "kwik:session"
 
-async def _get_client() -> httpx.AsyncClient:
-    return httpx.AsyncClient(
-        base_url=settings.KWIK_BASE_URL,
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Cache-Control": "no-cache",
-        },
-        timeout=30.0,
-    )
+
+def _get_client() -> httpx.AsyncClient:
+    """Shared, pooled Kwik client (base URL and JSON headers preset)."""
+    return get_client("kwik")
+
+
+@dataclass
+class KwikSession:
+    access_token: str
+    vendor_id: Optional[int]
+    user_id: Optional[int]
+    form_id: Optional[int]
+    obtained_at: float  # unix time
 
 
 async def login() -> dict:
     """
     Authenticate with Kwik as a vendor. Returns access_token and vendor details.
-    Caches the token in memory for reuse.
+    Prefer tokens.get(), which reuses the token and serializes logins.
     """
-    global _kwik_token, _kwik_vendor_id, _kwik_user_id, _kwik_form_id
-
     if not settings.KWIK_EMAIL or not settings.KWIK_PASSWORD:
         raise Exception("Kwik credentials not configured (KWIK_EMAIL, KWIK_PASSWORD)")
 
-    async with await _get_client() as client:
-        resp = await client.post("/vendor_login", json={
-            "domain_name": settings.KWIK_DOMAIN,
-            "email": settings.KWIK_EMAIL,
-            "password": settings.KWIK_PASSWORD,
-            "api_login": 1,
-        })
+    client = _get_client()
+    resp = await client.post("/vendor_login", json={
+        "domain_name": settings.KWIK_DOMAIN,
+        "email": settings.KWIK_EMAIL,
+        "password": settings.KWIK_PASSWORD,
+        "api_login": 1,
+    })
+
+    data = resp.json()
+    if data.get("status") != 200:
+        raise Exception(f"Kwik login failed: {data.get('message', 'Unknown error')}")
+
+    vendor = data["data"].get("vendor_details", {})
+    form = data["data"].get("formSettings", {})
+    return {
+        "access_token": data["data"]["access_token"],
+        "vendor_id": vendor.get("vendor_id"),
+        "user_id": form.get("user_id"),
+        "form_id": form.get("form_id", 2),
+    }
+
+
+class TokenManager:
+    """Kwik vendor session shared by all requests in the process.
+
+    - Single-flight: concurrent callers needing a new token wait on one login.
+    - Proactive: past KWIK_TOKEN_REFRESH_AFTER the token is renewed in the
+      background while callers keep using it; past KWIK_TOKEN_TTL they wait.
+    - Shared: sessions go through the shared cache, so with REDIS_URL set
+      workers adopt each other's token instead of each logging in.
+    """
 
+    def __init__(self):
+        self.session: Optional[KwikSession] = None
+        self._lock = asyncio.Lock()
+        self._background: Optional[asyncio.Task] = None
+        self.logins = 0
+
+    def _age(self, session: Optional[KwikSession]) -> float:
+        return time.time() - session.obtained_at if session else float("inf")
+
+    async def get(self) -> KwikSession:
+        age = self._age(self.session)
+        if age < settings.KWIK_TOKEN_REFRESH_AFTER:
+            return self.session
+        if age < settings.KWIK_TOKEN_TTL:
+            if self._background is None or self._background.done():
+                self._background = asyncio.create_task(self.refresh(stale=self.session.access_token))
+            return self.session
+        return await self.refresh(stale=self.session.access_token if self.session else None)
+
+    async def refresh(self, stale: Optional[str] = None) -> KwikSession:
+        """Replace the token ``stale`` — unless someone already did."""
+        async with self._lock:
+            if self.session and self.session.access_token != stale:
+                return self.session  # refreshed while we waited
+
+            shared = await self._load_shared()
+            if shared and shared.access_token != stale and self._age(shared) < settings.KWIK_TOKEN_REFRESH_AFTER:
+                self.session = shared
+                return shared
+
+            details = await login()
+            self.logins += 1
+            self.session = KwikSession(**details, obtained_at=time.time())
+            await self._store_shared(self.session)
+            return self.session
+
+    async def _load_shared(self) -> Optional[KwikSession]:
+        try:
+            body = await cache.cache.get(TOKEN_CACHE_KEY)
+            return KwikSession(**json.loads(body)) if body else None
+        except Exception as e:
+            logger.error(f"Reading shared Kwik token failed: {e}")
+            return None
+
+    async def _store_shared(self, session: KwikSession):
+        try:
+            await cache.cache.set(TOKEN_CACHE_KEY, json.dumps(asdict(session)).encode(), int(settings.KWIK_TOKEN_TTL))
+        except Exception as e:
+            logger.error(f"Storing shared Kwik token failed: {e}")
+
+    def reset(self):
+        self.session = None
+
+
+tokens = TokenManager()
+
+
+async def _call(method: str, path: str, build: Callable[[KwikSession], dict]) -> dict:
+    """Call Kwik with the current session; on "token expired" (101) refresh
+    once — single-flight — and retry."""
+    for attempt in range(2):
+        session = await tokens.get()
+        payload = build(session)
+        client = _get_client()
+        if method == "GET":
+            resp = await client.get(path, params=payload)
+        else:
+            resp = await client.post(path, json=payload)
         data = resp.json()
-        if data.get("status") != 200:
-            raise Exception(f"Kwik login failed: {data.get('message', 'Unknown error')}")
-
-        _kwik_token = data["data"]["access_token"]
-        vendor = data["data"].get("vendor_details", {})
-        _kwik_vendor_id = vendor.get("vendor_id")
+        if data.get("status") != KWIK_TOKEN_EXPIRED or attempt:
+            return data
+        await tokens.refresh(stale=session.access_token)
+    return data
 
-        form = data["data"].get("formSettings", {})
-        _kwik_form_id = form.get("form_id", 2)
-        _kwik_user_id = form.get("user_id")
 
-        return {
-            "access_token": _kwik_token,
-            "vendor_id": _kwik_vendor_id,
-            "user_id": _kwik_user_id,
-            "form_id": _kwik_form_id,
-        }
-
-
-async def _ensure_token():
-    """Ensure we have a valid Kwik token, login if needed."""
-    global _kwik_token
-    if not _kwik_token:
-        await login()
+def _drops(deliveries: list, at: str) -> list:
+    return [{**d, "time": at, "has_return_task": False} for d in deliveries]
 
 
 async def get_quote(
@@ -88,85 +171,68 @@ async def get_quote(
     Get a delivery price quote from Kwik.
     Returns the estimated cost.
     """
-    await _ensure_token()
+    return await get_multi_quote(
+        {"address": pickup_address, "latitude": pickup_lat, "longitude": pickup_lng},
+        [{"address": delivery_address, "latitude": delivery_lat, "longitude": delivery_lng}],
+        vehicle_id,
+    )
 
-    pickup_time = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
 
-    async with await _get_client() as client:
-        resp = await client.post("/send_payment_for_task", json={
-            "access_token": _kwik_token,
-            "domain_name": settings.KWIK_DOMAIN,
-            "vendor_id": _kwik_vendor_id,
-            "user_id": _kwik_user_id,
-            "form_id": _kwik_form_id,
-            "is_multiple_tasks": 1,
-            "layout_type": 0,
-            "has_pickup": 1,
-            "has_delivery": 1,
-            "auto_assignment": 1,
-            "vehicle_id": vehicle_id,
-            "timezone": 60,  # WAT (Nigeria)
-            "payment_method": 32,  # Card/Paystack
-            "pickups": [{
-                "address": pickup_address,
-                "latitude": pickup_lat,
-                "longitude": pickup_lng,
-                "time": pickup_time,
-            }],
-            "deliveries": [{
-                "address": delivery_address,
-                "latitude": delivery_lat,
-                "longitude": delivery_lng,
-                "time": pickup_time,
-                "has_return_task": False,
-            }],
-        })
+async def get_multi_quote(pickup: dict, deliveries: list, vehicle_id: int = 0) -> dict:
+    """
+    Quote one pickup with several drop-offs, visited in the given order.
+    ``pickup`` and each delivery carry address/latitude/longitude.
+    """
+    pickup_time = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
 
-        data = resp.json()
-        if data.get("status") == 101:
-            # Token expired, re-login and retry
-            await login()
-            return await get_quote(
-                pickup_address, pickup_lat, pickup_lng,
-                delivery_address, delivery_lat, delivery_lng,
-                vehicle_id,
-            )
-
-        if data.get("status") != 200:
-            raise Exception(f"Kwik quote failed: {data.get('message', 'Unknown error')}")
-
-        return {
-            "amount": data.get("data", {}).get("amount") or data.get("data", {}).get("per_task_cost"),
-            "currency": "NGN",
-            "vehicle_id": vehicle_id,
-            "raw": data.get("data"),
-        }
+    data = await _call("POST", "/send_payment_for_task", lambda s: {
+        "access_token": s.access_token,
+        "domain_name": settings.KWIK_DOMAIN,
+        "vendor_id": s.vendor_id,
+        "user_id": s.user_id,
+        "form_id": s.form_id,
+        "is_multiple_tasks": 1,
+        "layout_type": 0,
+        "has_pickup": 1,
+        "has_delivery": 1,
+        "auto_assignment": 1,
+        "vehicle_id": vehicle_id,
+        "timezone": 60,  # WAT (Nigeria)
+        "payment_method": 32,  # Card/Paystack
+        "pickups": [{**pickup, "time": pickup_time}],
+        "deliveries": _drops(deliveries, pickup_time),
+    })
+
+    if data.get("status") != 200:
+        raise Exception(f"Kwik quote failed: {data.get('message', 'Unknown error')}")
+
+    return {
+        "amount": data.get("data", {}).get("amount") or data.get("data", {}).get("per_task_cost"),
+        "currency": "NGN",
+        "vehicle_id": vehicle_id,
+        "raw": data.get("data"),
+    }
 
 
 async def get_bill_breakdown(amount: float, vehicle_id: int = 0) -> dict:
     """Get detailed bill breakdown for a delivery amount."""
-    await _ensure_token()
-
-    async with await _get_client() as client:
-        resp = await client.post("/get_bill_breakdown", json={
-            "access_token": _kwik_token,
-            "domain_name": settings.KWIK_DOMAIN,
-            "user_id": _kwik_user_id,
-            "amount": str(amount),
-            "total_no_of_tasks": 1,
-            "form_id": _kwik_form_id or 2,
-            "insurance_amount": 0,
-            "credits": 0,
-            "vehicle_id": vehicle_id,
-            "is_cod_job": 0,
-            "is_loader_required": 0,
-            "loaders_amount": 0,
-            "loaders_count": 0,
-            "delivery_charge_by_buyer": 2,
-        })
-
-        data = resp.json()
-        return data.get("data", {})
+    data = await _call("POST", "/get_bill_breakdown", lambda s: {
+        "access_token": s.access_token,
+        "domain_name": settings.KWIK_DOMAIN,
+        "user_id": s.user_id,
+        "amount": str(amount),
+        "total_no_of_tasks": 1,
+        "form_id": s.form_id or 2,
+        "insurance_amount": 0,
+        "credits": 0,
+        "vehicle_id": vehicle_id,
+        "is_cod_job": 0,
+        "is_loader_required": 0,
+        "loaders_amount": 0,
+        "loaders_count": 0,
+        "delivery_charge_by_buyer": 2,
+    })
+    return data.get("data", {})
 
 
 async def create_delivery(
@@ -191,133 +257,136 @@ async def create_delivery(
     Create a delivery task on Kwik.
     Returns unique_order_id for tracking.
     """
-    await _ensure_token()
+    return await create_multi_delivery(
+        pickup={
+            "address": pickup_address,
+            "name": pickup_name,
+            "phone": pickup_phone,
+            "email": pickup_email,
+            "latitude": pickup_lat,
+            "longitude": pickup_lng,
+        },
+        deliveries=[{
+            "address": delivery_address,
+            "name": delivery_name,
+            "phone": delivery_phone,
+            "email": delivery_email,
+            "latitude": delivery_lat,
+            "longitude": delivery_lng,
+        }],
+        amount=amount,
+        vehicle_id=vehicle_id,
+        parcel_amount=parcel_amount,
+        delivery_instruction=delivery_instruction,
+    )
+
 
+async def create_multi_delivery(
+    pickup: dict,
+    deliveries: list,
+    amount: float = 0,
+    vehicle_id: int = 0,
+    parcel_amount: float = 0,
+    delivery_instruction: str = "",
+) -> dict:
+    """
+    Create one Kwik task: a single pickup and its drop-offs, visited in list
+    order. Stops carry address/name/phone/email/latitude/longitude.
+    Returns unique_order_id and job_id for the task plus ``delivery_job_ids``
+    (one per drop-off, in order) when Kwik reports them.
+    """
     pickup_time = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
 
-    async with await _get_client() as client:
-        resp = await client.post("/create_task_via_vendor", json={
-            "access_token": _kwik_token,
-            "domain_name": settings.KWIK_DOMAIN,
-            "vendor_id": _kwik_vendor_id,
-            "user_id": _kwik_user_id,
-            "form_id": _kwik_form_id or 2,
-            "custom_field_template": "pricing-template",
-            "pickup_custom_field_template": "pricing-template",
-            "timezone": 60,
-            "is_multiple_tasks": 1,
-            "layout_type": 0,
-            "has_pickup": 1,
-            "has_delivery": 1,
-            "auto_assignment": 1,
-            "vehicle_id": vehicle_id,
-            "payment_method": 524288,
-            "amount": amount,
-            "delivery_charge": amount,
-            "parcel_amount": parcel_amount,
-            "delivery_instruction": delivery_instruction or "QuickGift delivery - handle with care",
-            "pickups": [{
-                "address": pickup_address,
-                "name": pickup_name,
-                "phone": pickup_phone,
-                "email": pickup_email or f"{pickup_phone}@quickgift.ng",
-                "latitude": pickup_lat,
-                "longitude": pickup_lng,
-                "time": pickup_time,
-            }],
-            "deliveries": [{
-                "address": delivery_address,
-                "name": delivery_name,
-                "phone": delivery_phone,
-                "email": delivery_email or f"{delivery_phone}@quickgift.ng",
-                "latitude": delivery_lat,
-                "longitude": delivery_lng,
-                "time": pickup_time,
-                "has_return_task": False,
-            }],
-        })
-
-        data = resp.json()
-        if data.get("status") == 101:
-            await login()
-            return await create_delivery(
-                pickup_address, pickup_lat, pickup_lng,
-                pickup_name, pickup_phone, pickup_email,
-                delivery_address, delivery_lat, delivery_lng,
-                delivery_name, delivery_phone, delivery_email,
-                delivery_instruction, amount, vehicle_id, parcel_amount,
-            )
-
-        if data.get("status") != 200:
-            raise Exception(f"Kwik create delivery failed: {data.get('message', 'Unknown error')}")
-
-        return {
-            "unique_order_id": data["data"].get("unique_order_id"),
-            "job_id": data["data"].get("job_id"),
-            "raw": data.get("data"),
-        }
+    def with_email(stop: dict) -> dict:
+        return {**stop, "email": stop.get("email") or f"{stop['phone']}@quickgift.ng"}
+
+    data = await _call("POST", "/create_task_via_vendor", lambda s: {
+        "access_token": s.access_token,
+        "domain_name": settings.KWIK_DOMAIN,
+        "vendor_id": s.vendor_id,
+        "user_id": s.user_id,
+        "form_id": s.form_id or 2,
+        "custom_field_template": "pricing-template",
+        "pickup_custom_field_template": "pricing-template",
+        "timezone": 60,
+        "is_multiple_tasks": 1,
+        "layout_type": 0,
+        "has_pickup": 1,
+        "has_delivery": 1,
+        "auto_assignment": 1,
+        "vehicle_id": vehicle_id,
+        "payment_method": 524288,
+        "amount": amount,
+        "delivery_charge": amount,
+        "parcel_amount": parcel_amount,
+        "delivery_instruction": delivery_instruction or "QuickGift delivery - handle with care",
+        "pickups": [{**with_email(pickup), "time": pickup_time}],
+        "deliveries": _drops([with_email(d) for d in deliveries], pickup_time),
+    })
+
+    if data.get("status") != 200:
+        raise Exception(f"Kwik create delivery failed: {data.get('message', 'Unknown error')}")
+
+    task = data["data"]
+    return {
+        "unique_order_id": task.get("unique_order_id"),
+        "job_id": task.get("job_id"),
+        "delivery_job_ids": [d.get("job_id") for d in task.get("deliveries") or []],
+        "raw": task,
+    }
+
+
+JOB_STATUSES = {
+    0: "upcoming",
+    1: "started",
+    2: "ended",
+    3: "failed",
+    4: "arrived",
+    6: "unassigned",
+    7: "accepted",
+    8: "declined",
+    9: "cancelled",
+    10: "deleted",
+}
 
 
 async def track_delivery(unique_order_id: str) -> dict:
     """
     Get the current status of a delivery.
-    Returns status code + details.
+    Returns status code + details. For a multi-stop task, ``drops`` maps
+    each drop-off's job_id to its own status when Kwik reports them.
     """
-    await _ensure_token()
-
-    async with await _get_client() as client:
-        resp = await client.get("/getJobStatus", params={
-            "unique_order_id": unique_order_id,
-        })
-
-        data = resp.json()
-        if data.get("status") == 101:
-            await login()
-            return await track_delivery(unique_order_id)
-
-        status_map = {
-            0: "upcoming",
-            1: "started",
-            2: "ended",
-            3: "failed",
-            4: "arrived",
-            6: "unassigned",
-            7: "accepted",
-            8: "declined",
-            9: "cancelled",
-            10: "deleted",
-        }
-
-        job_data = data.get("data", {})
-        job_status = job_data.get("job_status", -1)
-
-        return {
-            "status": status_map.get(job_status, "unknown"),
-            "status_code": job_status,
-            "unique_order_id": unique_order_id,
-            "raw": job_data,
-        }
+    data = await _call("GET", "/getJobStatus", lambda s: {
+        "unique_order_id": unique_order_id,
+    })
+
+    job_data = data.get("data", {})
+    job_status = job_data.get("job_status", -1)
+
+    return {
+        "status": JOB_STATUSES.get(job_status, "unknown"),
+        "status_code": job_status,
+        "unique_order_id": unique_order_id,
+        "drops": {
+            str(d["job_id"]): JOB_STATUSES.get(d.get("job_status", -1), "unknown")
+            for d in job_data.get("deliveries") or []
+            if d.get("job_id") is not None
+        },
+        "raw": job_data,
+    }
 
 
 async def cancel_delivery(job_id: str) -> dict:
     """Cancel a delivery task."""
-    await _ensure_token()
-
-    async with await _get_client() as client:
-        resp = await client.post("/cancel_vendor_task", json={
-            "access_token": _kwik_token,
-            "vendor_id": _kwik_vendor_id,
-            "job_id": job_id,
-            "job_status": 9,
-            "domain_name": settings.KWIK_DOMAIN,
-        })
-
-        data = resp.json()
-        if data.get("status") == 101:
-            await login()
-            return await cancel_delivery(job_id)
-
-        if data.get("status") != 200:
-            raise Exception(f"Kwik cancel failed: {data.get('message', 'Unknown error')}")
-
-        return {"status": "cancelled", "job_id": job_id}
+    data = await _call("POST", "/cancel_vendor_task", lambda s: {
+        "access_token": s.access_token,
+        "vendor_id": s.vendor_id,
+        "job_id": job_id,
+        "job_status": 9,
+        "domain_name": settings.KWIK_DOMAIN,
+    })
+
+    if data.get("status") != 200:
+        raise Exception(f"Kwik cancel failed: {data.get('message', 'Unknown error')}")
+
+    return {"status": "cancelled", "job_id": job_id}
@@ -0,0 +1,91 @@
+"""
+In-memory snapshot of verified provider coordinates.
+
+Holds ids/lats/lngs as parallel arrays so "what's near this point" is a
+single haversine_many() call instead of a query plus a Python loop. The
+snapshot is marked stale whenever a Provider row is inserted, deleted, or
+has its coordinates or status changed in this process, and reloaded on
+next use; SNAPSHOT_TTL bounds staleness for writes made by other workers.
+"""
+
+import asyncio
+import time
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.provider import Provider
+from app.utils import geo
+
+SNAPSHOT_TTL = 60  # seconds
+# Provider columns the snapshot depends on; other updates (ratings, bio) keep it
+SNAPSHOT_COLUMNS = ("lat", "lng", "status")
+
+
+class ProviderLocations:
+    def __init__(self, ttl: int = SNAPSHOT_TTL):
+        self.ttl = ttl
+        self.ids: list = []
+        self.lats = []
+        self.lngs = []
+        self._loaded_at = 0.0
+        self._stale = True
+        self._generation = 0  # bumped by every invalidation
+        self._lock = asyncio.Lock()
+
+    def invalidate(self, *args):
+        self._stale = True
+        self._generation += 1
+
+    def _provider_updated(self, mapper, connection, target):
+        state = inspect(target)
+        if any(state.attrs[c].history.has_changes() for c in SNAPSHOT_COLUMNS):
+            self.invalidate()
+
+    async def refresh(self, db: AsyncSession):
+        generation = self._generation
+        rows = (await db.execute(
+            select(Provider.id, Provider.lat, Provider.lng).where(
+                Provider.status == "verified", Provider.lat.is_not(None), Provider.lng.is_not(None)
+            )
+        )).all()
+        self.ids = [r[0] for r in rows]
+        if geo.np is not None:
+            self.lats = geo.np.fromiter((r[1] for r in rows), dtype=geo.np.float64, count=len(rows))
+            self.lngs = geo.np.fromiter((r[2] for r in rows), dtype=geo.np.float64, count=len(rows))
+        else:
+            self.lats = [r[1] for r in rows]
+            self.lngs = [r[2] for r in rows]
+        self._loaded_at = time.monotonic()
+        # An invalidation that landed mid-load may not be in these rows
+        self._stale = self._generation != generation
+
+    async def ensure_fresh(self, db: AsyncSession):
+        if not self._stale and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        async with self._lock:
+            if self._stale or time.monotonic() - self._loaded_at >= self.ttl:
+                await self.refresh(db)
+
+    async def nearest(self, db: AsyncSession, lat: float, lng: float, radius_km: float, limit: int = 20) -> list:
+        """``[(provider_id, distance_km), ...]`` within ``radius_km``, closest first."""
+        await self.ensure_fresh(db)
+        if not self.ids:
+            return []
+        distances = geo.haversine_many(lat, lng, self.lats, self.lngs)
+
+        if geo.np is not None:
+            inside = geo.np.flatnonzero(distances <= radius_km)
+            order = inside[geo.np.argsort(distances[inside], kind="stable")][:limit]
+            return [(self.ids[i], float(distances[i])) for i in order]
+
+        inside = [i for i, d in enumerate(distances) if d <= radius_km]
+        inside.sort(key=lambda i: distances[i])
+        return [(self.ids[i], distances[i]) for i in inside[:limit]]
+
+
+provider_locations = ProviderLocations()
+
+for _evt in ("after_insert", "after_delete"):
+    event.listen(Provider, _evt, provider_locations.invalidate)
+event.listen(Provider, "after_update", provider_locations._provider_updated)
@@ -0,0 +1,161 @@
+"""
+Incrementally maintained rating aggregates.
+
+Every review write adjusts the target's row in rating_aggregates with a
+single UPSERT/UPDATE (sum, count, star histogram) in the caller's
+transaction, then copies the new average onto the product/provider. No
+AVG/COUNT scans over the reviews table on the write path.
+
+reconcile_ratings() rebuilds aggregates from the reviews table — run it
+after manual data fixes, or let init_db backfill an empty table.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import dialect_insert
+from app.models.product import Product
+from app.models.provider import Provider
+from app.models.review import RatingAggregate, Review
+
+STARS = (1, 2, 3, 4, 5)
+TARGET_MODELS = {"product": Product, "provider": Provider}
+
+
+def star_bucket(rating: float) -> int:
+    """Nearest whole star (x.5 rounds up), clamped to 1-5."""
+    return min(5, max(1, int(rating + 0.5)))
+
+
+def _star_bucket_sql(rating_col):
+    return case(
+        (rating_col < 1.5, 1),
+        (rating_col < 2.5, 2),
+        (rating_col < 3.5, 3),
+        (rating_col < 4.5, 4),
+        else_=5,
+    )
+
+
+def summary(agg: Optional[RatingAggregate]) -> dict:
+    """Public shape of an aggregate (used by the review listing)."""
+    if agg is None or not agg.rating_count:
+        return {"average": 0.0, "count": 0, "histogram": {str(s): 0 for s in STARS}}
+    return {
+        "average": round(agg.rating_sum / agg.rating_count, 1),
+        "count": agg.rating_count,
+        "histogram": {str(s): getattr(agg, f"star_{s}") for s in STARS},
+    }
+
+
+async def _get_target(db: AsyncSession, target_type: str, target_id: str):
+    model = TARGET_MODELS.get(target_type)
+    if model is None:
+        return None
+    return (await db.execute(select(model).where(model.id == target_id))).scalars().first()
+
+
+async def _sync_target(db: AsyncSession, target_type: str, target_id: str, rating_sum: float, count: int):
+    """Copy the aggregate's average/count onto the reviewed row. Returns it."""
+    target = await _get_target(db, target_type, target_id)
+    if target:
+        target.rating = round(rating_sum / count, 1) if count else 0
+        target.review_count = count
+    return target
+
+
+async def add_rating(db: AsyncSession, target_type: str, target_id: str, rating: float):
+    """Fold a new review into the aggregate. Returns the updated target row (or None)."""
+    star = f"star_{star_bucket(rating)}"
+    insert = dialect_insert(db.bind.dialect.name)
+    stmt = insert(RatingAggregate).values(
+        target_type=target_type,
+        target_id=target_id,
+        rating_sum=rating,
+        rating_count=1,
+        **{f"star_{s}": int(f"star_{s}" == star) for s in STARS},
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["target_type", "target_id"],
+        set_={
+            "rating_sum": RatingAggregate.rating_sum + rating,
+            "rating_count": RatingAggregate.rating_count + 1,
+            star: getattr(RatingAggregate, star) + 1,
+            "updated_at": datetime.utcnow(),
+        },
+    ).returning(RatingAggregate.rating_sum, RatingAggregate.rating_count)
+    rating_sum, count = (await db.execute(stmt)).one()
+    return await _sync_target(db, target_type, target_id, rating_sum, count)
+
+
+async def remove_rating(db: AsyncSession, target_type: str, target_id: str, rating: float):
+    """Take a deleted review out of the aggregate. Returns the updated target row (or None)."""
+    star = f"star_{star_bucket(rating)}"
+    row = (await db.execute(
+        update(RatingAggregate)
+        .where(RatingAggregate.target_type == target_type, RatingAggregate.target_id == target_id)
+        .values(
+            rating_sum=RatingAggregate.rating_sum - rating,
+            rating_count=RatingAggregate.rating_count - 1,
+            **{star: getattr(RatingAggregate, star) - 1},
+            updated_at=datetime.utcnow(),
+        )
+        .returning(RatingAggregate.rating_sum, RatingAggregate.rating_count)
+    )).first()
+    if row is None:
+        # No aggregate yet (reviews predating it) — rebuild this target
+        await reconcile_ratings(db, target_type, target_id)
+        return await _get_target(db, target_type, target_id)
+    rating_sum, count = row
+    return await _sync_target(db, target_type, target_id, rating_sum if count else 0.0, count)
+
+
+async def reconcile_ratings(
+    db: AsyncSession,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+) -> int:
+    """Rebuild aggregates (all, or one target) from the reviews table.
+
+    Also resyncs the targets' rating/review_count. A full rebuild leaves
+    targets that have no reviews untouched. Returns the number of
+    aggregates written. The caller commits.
+    """
+    bucket = _star_bucket_sql(Review.rating)
+    query = select(
+        Review.target_type,
+        Review.target_id,
+        func.sum(Review.rating),
+        func.count(),
+        *[func.sum(case((bucket == s, 1), else_=0)) for s in STARS],
+    ).group_by(Review.target_type, Review.target_id)
+    clear = delete(RatingAggregate)
+    if target_type is not None:
+        query = query.where(Review.target_type == target_type)
+        clear = clear.where(RatingAggregate.target_type == target_type)
+    if target_id is not None:
+        query = query.where(Review.target_id == target_id)
+        clear = clear.where(RatingAggregate.target_id == target_id)
+
+    rows = (await db.execute(query)).all()
+    await db.execute(clear)
+
+    for t_type, t_id, rating_sum, count, *stars in rows:
+        db.add(RatingAggregate(
+            target_type=t_type,
+            target_id=t_id,
+            rating_sum=rating_sum,
+            rating_count=count,
+            **{f"star_{s}": n for s, n in zip(STARS, stars)},
+        ))
+        await _sync_target(db, t_type, t_id, rating_sum, count)
+
+    if not rows and target_type is not None and target_id is not None:
+        # Last review for this target is gone
+        await _sync_target(db, target_type, target_id, 0.0, 0)
+
+    await db.flush()
+    return len(rows)
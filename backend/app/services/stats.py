@@ -0,0 +1,118 @@
+"""
+Admin dashboard statistics.
+
+compute_dashboard_stats() gathers every headline number in one round trip:
+each table is scanned once with FILTER-ed aggregates, and the per-table
+rows are joined ON TRUE into a single result row.
+
+With DASHBOARD_STATS_MAX_AGE > 0 the result is materialized in
+stats_snapshots and served from there until it is that many seconds old,
+so frequent dashboard polling across workers shares one computation.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.booking import Booking
+from app.models.order import Order
+from app.models.product import Product
+from app.models.provider import Provider
+from app.models.stats import StatsSnapshot
+from app.models.user import User
+
+DASHBOARD_KEY = "dashboard"
+
+
+def _sum(column, *conditions):
+    return func.coalesce(func.sum(column).filter(*conditions), 0)
+
+
+async def compute_dashboard_stats(db: AsyncSession) -> dict:
+    orders = select(
+        _sum(Order.total, Order.payment_status == "paid").label("revenue"),
+        _sum(Order.commission, Order.payment_status == "paid").label("commission"),
+        func.count(Order.id).label("total"),
+        func.count(Order.id).filter(Order.status == "pending").label("pending"),
+    ).subquery("o")
+    bookings = select(
+        _sum(Booking.price, Booking.payment_status == "paid").label("revenue"),
+        _sum(Booking.commission, Booking.payment_status == "paid").label("commission"),
+        func.count(Booking.id).label("total"),
+        func.count(Booking.id).filter(Booking.status == "pending").label("pending"),
+    ).subquery("b")
+    providers = select(
+        func.count(Provider.id).label("total"),
+        func.count(Provider.id).filter(Provider.status == "pending").label("pending"),
+    ).subquery("pr")
+    users = select(func.count(User.id).label("total")).subquery("u")
+    products = select(func.count(Product.id).label("total")).subquery("p")
+
+    # Each side is a single aggregate row, so ON TRUE joins them into one
+    single_row = orders.join(bookings, true()).join(providers, true()).join(users, true()).join(products, true())
+    row = (await db.execute(
+        select(orders, bookings, providers, users, products).select_from(single_row)
+    )).one()
+    (order_revenue, order_commission, total_orders, pending_orders,
+     booking_revenue, booking_commission, total_bookings, pending_bookings,
+     total_providers, pending_providers, total_users, total_products) = row
+
+    return {
+        "revenue": {
+            "total": order_revenue + booking_revenue,
+            "gifts": order_revenue,
+            "beauty": booking_revenue,
+        },
+        "commission": {
+            "total": order_commission + booking_commission,
+            "gifts": order_commission,
+            "beauty": booking_commission,
+        },
+        "counts": {
+            "orders": total_orders,
+            "bookings": total_bookings,
+            "users": total_users,
+            "providers": total_providers,
+            "products": total_products,
+        },
+        "pending": {
+            "orders": pending_orders,
+            "providers": pending_providers,
+            "bookings": pending_bookings,
+        },
+    }
+
+
+async def refresh_dashboard_snapshot(db: AsyncSession) -> dict:
+    """Recompute the dashboard stats and store them. The caller commits."""
+    stats = await compute_dashboard_stats(db)
+    now = datetime.utcnow()
+    # Upsert: several workers may write the first snapshot at once
+    insert = dialect_insert(db.bind.dialect.name)
+    values = {"payload": json.dumps(stats), "refreshed_at": now}
+    await db.execute(
+        insert(StatsSnapshot)
+        .values(key=DASHBOARD_KEY, **values)
+        .on_conflict_do_update(index_elements=["key"], set_=values)
+    )
+    return {**stats, "as_of": now.isoformat()}
+
+
+async def get_dashboard_stats(db: AsyncSession, refresh: bool = False) -> dict:
+    """Dashboard stats, from the snapshot when enabled and fresh enough."""
+    max_age = settings.DASHBOARD_STATS_MAX_AGE
+    if max_age <= 0:
+        return {**await compute_dashboard_stats(db), "as_of": datetime.utcnow().isoformat()}
+
+    if not refresh:
+        snapshot = await db.get(StatsSnapshot, DASHBOARD_KEY)
+        if snapshot and snapshot.refreshed_at > datetime.utcnow() - timedelta(seconds=max_age):
+            return {**json.loads(snapshot.payload), "as_of": snapshot.refreshed_at.isoformat()}
+
+    stats = await refresh_dashboard_snapshot(db)
+    await db.commit()
+    return stats
@@ -1,11 +1,25 @@
 """Geospatial utilities for distance calculations."""
 
 import math
+import sqlite3
+
+from sqlalchemy import and_, func, or_
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is in requirements.txt
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+
+# Precision stored on rows (~5 m cells); queries use shorter prefixes
+GEOHASH_PRECISION = 9
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
 
 
 def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """Return distance in km between two lat/lng points using Haversine formula."""
-    R = 6371.0  # Earth radius in km
+    R = EARTH_RADIUS_KM
     dlat = math.radians(lat2 - lat1)
     dlng = math.radians(lng2 - lng1)
     a = (
@@ -14,4 +28,158 @@ def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         * math.cos(math.radians(lat2))
         * math.sin(dlng / 2) ** 2
     )
+    a = min(a, 1.0)  # rounding can push a past 1 near antipodal points
     return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_many(lat: float, lng: float, lats, lngs):
+    """Distances in km from one point to many, in a single vectorized pass.
+
+    ``lats``/``lngs`` are equal-length sequences (or numpy arrays). Returns a
+    numpy array, or a list when numpy isn't installed.
+    """
+    if np is not None:
+        lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+        lng2 = np.radians(np.asarray(lngs, dtype=np.float64))
+        lat1, lng1 = math.radians(lat), math.radians(lng)
+        a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    # Same formula with the per-origin terms hoisted out of the loop
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    cos_lat1 = math.cos(lat1)
+    sin, cos, radians = math.sin, math.cos, math.radians
+    out = []
+    for la, ln in zip(lats, lngs):
+        la = radians(la)
+        a = sin((la - lat1) / 2) ** 2 + cos_lat1 * cos(la) * sin((radians(ln) - lng1) / 2) ** 2
+        out.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+    return out
+
+
+# ── Geohash ──────────────────────────────────────────────
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Standard base32 geohash. Nearby points share long prefixes."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def _cell_size(precision: int):
+    """(height, width) of a geohash cell in degrees."""
+    total = 5 * precision
+    lng_bits = (total + 1) // 2
+    lat_bits = total // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(lat: float, lng: float, radius_km: float):
+    """(min_lat, max_lat, min_lng, max_lng) enclosing a circle of ``radius_km``."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    dlng = 180.0 if cos_lat < 1e-6 else min(180.0, math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)))
+    return max(-90.0, lat - dlat), min(90.0, lat + dlat), lng - dlng, lng + dlng
+
+
+def geohash_cover(lat: float, lng: float, radius_km: float) -> list:
+    """Geohash prefixes whose cells together cover the circle's bounding box.
+
+    Uses the finest precision whose cells are at least as large as the box,
+    so the box touches at most four cells. Returns [] when the box is too
+    large for prefixes to narrow anything down (caller skips the filter).
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    if min_lng < -180.0 or max_lng > 180.0:
+        return []  # Crosses the antimeridian
+
+    precision = 0
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(p)
+        if height >= max_lat - min_lat and width >= max_lng - min_lng:
+            precision = p
+            break
+    if not precision:
+        return []
+
+    corners = [(min_lat, min_lng), (min_lat, max_lng), (max_lat, min_lng), (max_lat, max_lng)]
+    return sorted({geohash_encode(la, ln, precision) for la, ln in corners})
+
+
+def _prefix_successor(prefix: str):
+    """Smallest string greater than every string starting with ``prefix``."""
+    chars = list(prefix)
+    while chars:
+        i = _BASE32.index(chars[-1])
+        if i < len(_BASE32) - 1:
+            chars[-1] = _BASE32[i + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def geohash_prefix_filter(column, prefixes: list):
+    """``column`` starts with any of ``prefixes``, as index-friendly ranges."""
+    ranges = []
+    for prefix in prefixes:
+        upper = _prefix_successor(prefix)
+        ranges.append(and_(column >= prefix, column < upper) if upper else column >= prefix)
+    return or_(*ranges)
+
+
+# ── SQL distance ─────────────────────────────────────────
+
+def _sqlite_has_math() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("SELECT sin(1), asin(0.5), sqrt(4), radians(1)")
+        finally:
+            conn.close()
+    except Exception:
+        return False
+    return True
+
+
+SQLITE_MATH = _sqlite_has_math()
+
+
+def distance_sql(lat_col, lng_col, lat: float, lng: float, dialect: str):
+    """SQL expression ranking rows by distance from (lat, lng).
+
+    Returns ``(expr, squared)``. Where the database has trig functions
+    (PostgreSQL, SQLite built with math functions) ``expr`` is the haversine
+    distance in km. Otherwise it is the squared equirectangular distance in
+    km² (no portable sqrt), which orders the same way at city scale; compare
+    it against ``radius_km ** 2``.
+    """
+    if dialect == "postgresql" or (dialect == "sqlite" and SQLITE_MATH):
+        dlat = func.radians(lat_col - lat) / 2
+        dlng = func.radians(lng_col - lng) / 2
+        a = (
+            func.sin(dlat) * func.sin(dlat)
+            + math.cos(math.radians(lat)) * func.cos(func.radians(lat_col)) * func.sin(dlng) * func.sin(dlng)
+        )
+        # Clamp like haversine_km and haversine_many: rounding can push a
+        # past 1 (asin domain error)
+        clamp = func.least if dialect == "postgresql" else func.min  # SQLite's scalar min
+        return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(clamp(a, 1.0))), False
+
+    km_per_deg = math.pi * EARTH_RADIUS_KM / 180.0
+    dy = (lat_col - lat) * km_per_deg
+    dx = (lng_col - lng) * (km_per_deg * math.cos(math.radians(lat)))
+    return dy * dy + dx * dx, True
@@ -0,0 +1,191 @@
+"""Keyset (cursor) pagination helpers.
+
+A cursor is an opaque base64 token holding the sort key of the last row a
+client has seen, e.g. ``(created_at, id)``. The next page is fetched with a
+row-value comparison (``WHERE (created_at, id) < (:ts, :id)``), which walks
+the matching composite index instead of counting past an OFFSET and stays
+stable when new rows arrive at the head of the list.
+
+``fetch_page`` also handles the listing total. By default it is taken from
+``COUNT(*) OVER()`` in the page query itself, so a page costs one round trip
+instead of a COUNT subquery plus the page query. Clients can ask for an
+estimate (planner statistics / cached counter, unfiltered listings only) or
+skip the total entirely with ``include_total=false``.
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from fastapi import HTTPException, Query
+from sqlalchemy import func, literal, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Seconds an exact table count is reused for "estimate" on backends without
+# planner statistics (SQLite)
+COUNT_CACHE_TTL = 60
+
+_count_cache: dict = {}
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(value, column):
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+class Keyset:
+    """A sort order that can be paged with cursors.
+
+    ``columns`` are the ORDER BY expressions, ending in a unique column
+    (usually the primary key) so every row has a distinct position.
+    ``key`` extracts the same values from a loaded row; by default it reads
+    the attribute named after each column.
+    """
+
+    def __init__(self, name: str, *columns, descending: bool = True, key: Optional[Callable] = None):
+        self.name = name
+        self.columns = columns
+        self.descending = descending
+        self.key = key or (lambda row: [getattr(row, c.key) for c in columns])
+
+    def encode(self, row) -> str:
+        payload = {"s": self.name, "k": [_encode_value(v) for v in self.key(row)]}
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> list:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+            if payload["s"] != self.name or len(payload["k"]) != len(self.columns):
+                raise ValueError("cursor does not match sort order")
+            return [_decode_value(v, c) for v, c in zip(payload["k"], self.columns)]
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def order_by(self, query):
+        if self.descending:
+            return query.order_by(*[c.desc() for c in self.columns])
+        return query.order_by(*[c.asc() for c in self.columns])
+
+    def paginate(self, query, cursor: Optional[str], per_page: int, page: int = 1):
+        """Order and limit ``query``; seek past ``cursor`` if given, else use ``page``.
+
+        Fetches one extra row so ``page_items`` can tell whether a next page exists.
+        """
+        query = self.order_by(query)
+        if cursor:
+            values = tuple_(*[literal(v, c.type) for v, c in zip(self.decode(cursor), self.columns)])
+            position = tuple_(*self.columns)
+            query = query.where(position < values if self.descending else position > values)
+        else:
+            query = query.offset((page - 1) * per_page)
+        return query.limit(per_page + 1)
+
+    def page_items(self, rows, per_page: int):
+        """Split fetched rows into ``(items, next_cursor)``."""
+        rows = list(rows)
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            return rows, self.encode(rows[-1])
+        return rows, None
+
+
+# ── Totals ───────────────────────────────────────────────
+
+def count_strategy(
+    include_total: bool = True,
+    count: str = Query("exact", pattern="^(exact|estimate)$"),
+) -> Optional[str]:
+    """Query params selecting how a listing computes ``total`` (None = skip)."""
+    return count if include_total else None
+
+
+async def exact_count(db: AsyncSession, query) -> int:
+    return (await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))).scalar() or 0
+
+
+async def estimate_count(db: AsyncSession, table) -> int:
+    """Approximate row count of a whole table.
+
+    PostgreSQL reads ``pg_class.reltuples`` (kept fresh by autovacuum);
+    elsewhere an exact count is cached for ``COUNT_CACHE_TTL`` seconds.
+    """
+    if db.bind.dialect.name == "postgresql":
+        estimate = (await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:name AS regclass)"),
+            {"name": table.name},
+        )).scalar()
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    cached = _count_cache.get(table.name)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    total = (await db.execute(select(func.count()).select_from(table))).scalar() or 0
+    _count_cache[table.name] = (time.monotonic() + COUNT_CACHE_TTL, total)
+    return total
+
+
+async def fetch_page(
+    db: AsyncSession,
+    query,
+    keyset: Optional[Keyset],
+    *,
+    page: int = 1,
+    per_page: int = 20,
+    cursor: Optional[str] = None,
+    count: Optional[str] = "exact",
+    estimate_table=None,
+):
+    """Run a paginated listing and return ``(items, total, next_cursor)``.
+
+    ``query`` is the filtered, unordered select. With ``keyset=None`` the
+    query must already be ordered and pages by offset only. ``count`` is a
+    ``count_strategy`` value; ``estimate_table`` should only be passed when
+    no filters are applied, otherwise "estimate" is answered exactly.
+    """
+    if keyset is not None:
+        paged = keyset.paginate(query, cursor, per_page, page)
+    else:
+        paged = query.offset((page - 1) * per_page).limit(per_page)
+
+    total = None
+    if count == "estimate" and estimate_table is not None:
+        total = await estimate_count(db, estimate_table)
+    elif count and cursor:
+        # COUNT(*) OVER() after a seek only sees the rows past the cursor
+        total = await exact_count(db, query)
+
+    if count and total is None:
+        rows = (await db.execute(paged.add_columns(func.count().over()))).all()
+        items = [row[0] for row in rows]
+        if rows:
+            total = rows[0][1]
+        elif page == 1:
+            total = 0
+        else:
+            # Paged past the end — the window had nothing to count
+            total = await exact_count(db, query)
+    else:
+        items = (await db.execute(paged)).scalars().all()
+
+    next_cursor = None
+    if keyset is not None:
+        items, next_cursor = keyset.page_items(items, per_page)
+    return items, total, next_cursor
@@ -0,0 +1,46 @@
+"""
+Benchmark: scalar haversine_km loop vs batch haversine_many.
+
+Run from backend/:
+    python -m benchmarks.bench_geo [n_points]
+"""
+
+import random
+import sys
+import timeit
+
+from app.utils import geo
+
+ORIGIN = (6.4541, 3.3947)  # Lagos Island
+
+
+def main(n: int = 10_000, repeat: int = 5):
+    rng = random.Random(42)
+    # Points spread over greater Lagos
+    lats = [rng.uniform(6.35, 6.75) for _ in range(n)]
+    lngs = [rng.uniform(2.95, 3.75) for _ in range(n)]
+
+    def scalar():
+        return [geo.haversine_km(*ORIGIN, la, ln) for la, ln in zip(lats, lngs)]
+
+    def batch():
+        return geo.haversine_many(*ORIGIN, lats, lngs)
+
+    results = {"scalar loop": scalar, "haversine_many": batch}
+    if geo.np is not None:
+        lat_arr, lng_arr = geo.np.asarray(lats), geo.np.asarray(lngs)
+        results["haversine_many (arrays)"] = lambda: geo.haversine_many(*ORIGIN, lat_arr, lng_arr)
+
+    # Sanity check: same answers
+    assert max(abs(a - b) for a, b in zip(scalar(), batch())) < 1e-9
+
+    print(f"{n} points, best of {repeat} (numpy {'on' if geo.np is not None else 'off'})")
+    baseline = None
+    for name, fn in results.items():
+        best = min(timeit.repeat(fn, number=1, repeat=repeat))
+        baseline = baseline or best
+        print(f"  {name:<26} {best * 1000:8.2f} ms  {baseline / best:6.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
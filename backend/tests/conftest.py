@@ -9,6 +9,7 @@ from httpx import AsyncClient, ASGITransport
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 
 from app.main import app
+from app.core import cache, otp
 from app.core.database import Base, get_db
 
 
@@ -41,6 +42,8 @@ async def setup_db():
     """Create tables before each test, drop after."""
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await cache.cache.clear()
+    otp.limiter.reset()
     yield
     async with test_engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -3,7 +3,10 @@ End-to-end admin journey tests:
 Login → dashboard → approve provider → suspend → view transactions → manage payouts
 """
 
+import json
+
 import pytest
+from sqlalchemy import select
 from tests.conftest import (
     create_test_user, create_test_admin, create_test_provider,
     create_test_product, get_auth_token, auth_headers,
@@ -44,6 +47,38 @@ class TestAdminDashboard:
         assert "counts" in data
         assert "pending" in data
 
+    async def test_dashboard_stats_values_and_snapshot(self, client, db):
+        from app.core.config import settings
+        from app.models.order import Order
+        admin = await create_test_admin(db)
+        await create_test_provider(db)
+        token = await get_auth_token(client, admin.phone)
+        db.add(Order(order_number="QG-PAID0001", user_id=admin.id, order_type="gift",
+                     subtotal=10000, commission=1000, total=10000, status="delivered", payment_status="paid"))
+        db.add(Order(order_number="QG-PEND0001", user_id=admin.id, order_type="gift",
+                     subtotal=5000, total=5000))
+        await db.commit()
+
+        data = (await client.get("/api/v1/admin/dashboard", headers=auth_headers(token))).json()
+        assert data["revenue"] == {"total": 10000, "gifts": 10000, "beauty": 0}
+        assert data["commission"]["gifts"] == 1000
+        assert data["counts"]["orders"] == 2
+        assert data["counts"]["users"] == 2
+        assert data["pending"] == {"orders": 1, "providers": 0, "bookings": 0}
+
+        settings.DASHBOARD_STATS_MAX_AGE = 300
+        try:
+            first = (await client.get("/api/v1/admin/dashboard", headers=auth_headers(token))).json()
+            db.add(Order(order_number="QG-PEND0002", user_id=admin.id, order_type="gift",
+                         subtotal=5000, total=5000))
+            await db.commit()
+            cached = (await client.get("/api/v1/admin/dashboard", headers=auth_headers(token))).json()
+            assert cached == first
+            fresh = (await client.get("/api/v1/admin/dashboard?refresh=true", headers=auth_headers(token))).json()
+            assert fresh["counts"]["orders"] == 3
+        finally:
+            settings.DASHBOARD_STATS_MAX_AGE = 0
+
     async def test_get_settings(self, client, db):
         admin = await create_test_admin(db)
         token = await get_auth_token(client, admin.phone)
@@ -52,6 +87,45 @@ class TestAdminDashboard:
         assert resp.status_code == 200
         assert "gift_commission" in resp.json()
 
+    async def test_revenue_series_buckets(self, client, db):
+        from datetime import datetime, timedelta
+        from app.models.order import Order
+        from app.models.stats import RevenueRollup
+        from sqlalchemy import select
+        admin = await create_test_admin(db)
+        token = await get_auth_token(client, admin.phone)
+
+        # 23:30 UTC is 00:30 the next day in Lagos (WAT, UTC+1)
+        late = (datetime.utcnow() - timedelta(days=20)).replace(hour=23, minute=30)
+        local_day = (late + timedelta(hours=1)).date()
+        recent = datetime.utcnow() - timedelta(minutes=5)
+        for i, (created, total) in enumerate([(late, 1000), (late, 500), (recent, 2000)]):
+            db.add(Order(order_number=f"QG-REV{i:05d}", user_id=admin.id, order_type="gift", subtotal=total,
+                         total=total, payment_status="paid", created_at=created))
+        await db.commit()
+
+        start = local_day - timedelta(days=1)
+        resp = await client.get(
+            f"/api/v1/admin/analytics/revenue/series?start={start}&end={local_day}",
+            headers=auth_headers(token),
+        )
+        buckets = resp.json()["buckets"]
+        assert [b["gifts"] for b in buckets] == [0, 1500]
+        assert buckets[1]["period"] == local_day.isoformat()
+
+        # Settled days were materialized; the monthly view reads them back
+        rollups = (await db.execute(select(RevenueRollup))).scalars().all()
+        assert {r.day for r in rollups} == {start.isoformat(), local_day.isoformat()}
+        resp = await client.get(
+            f"/api/v1/admin/analytics/revenue/series?interval=month&start={local_day - timedelta(days=40)}",
+            headers=auth_headers(token),
+        )
+        assert sum(b["gifts"] for b in resp.json()["buckets"]) == 3500
+
+        resp = await client.get("/api/v1/admin/analytics/revenue", headers=auth_headers(token))
+        assert len(resp.json()) == 7
+        assert resp.json()[-1]["gifts"] == 2000
+
 
 class TestAdminProviderManagement:
     """Approve, reject, suspend, reactivate providers."""
@@ -168,6 +242,111 @@ class TestAdminTransactions:
         if resp.json()["items"]:
             assert "password_hash" not in resp.json()["items"][0]
 
+    async def test_list_users_count_strategies(self, client, db):
+        from app.utils import pagination
+        pagination._count_cache.clear()
+        admin = await create_test_admin(db)
+        await create_test_user(db, phone="+2348055555551")
+        await create_test_user(db, phone="+2348055555552")
+        token = await get_auth_token(client, admin.phone)
+
+        # Exact total comes from the window count, even on a later page
+        resp = await client.get("/api/v1/admin/users?per_page=2&page=2", headers=auth_headers(token))
+        assert resp.json()["total"] == 3
+        assert len(resp.json()["items"]) == 1
+
+        resp = await client.get("/api/v1/admin/users?include_total=false", headers=auth_headers(token))
+        assert resp.json()["total"] is None
+        assert len(resp.json()["items"]) == 3
+
+        resp = await client.get("/api/v1/admin/users?count=estimate", headers=auth_headers(token))
+        assert resp.json()["total"] == 3
+
+    async def test_http_client_stats(self, client, db):
+        admin = await create_test_admin(db)
+        token = await get_auth_token(client, admin.phone)
+
+        resp = await client.get("/api/v1/admin/integrations/http", headers=auth_headers(token))
+        assert resp.status_code == 200
+        clients = resp.json()["clients"]
+        assert set(clients) == {"paystack", "kwik", "termii", "expo"}
+        assert clients["kwik"]["pool"]["max"] == 10
+
+    async def test_broadcast_push_batches_and_prunes_dead_tokens(self, client, db, monkeypatch):
+        import httpx
+        from app.core import jobs, push
+        from app.models.notification import Notification
+        from app.models.user import User
+        from tests.conftest import TestSession
+
+        admin = await create_test_admin(db)
+        dead = await create_test_user(db, phone="+2348055555501")
+        gone = await create_test_user(db, phone="+2348055555502")
+        dead.push_token = "ExponentPushToken[dead]"
+        gone.push_token = "ExponentPushToken[gone]"
+        await db.commit()
+        token = await get_auth_token(client, admin.phone)
+
+        batches = []
+
+        def expo(request: httpx.Request):
+            payload = json.loads(request.content)
+            if request.url.path.endswith("/getReceipts"):
+                return httpx.Response(200, json={"data": {
+                    rid: {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+                    if rid == "ticket-ExponentPushToken[gone]" else {"status": "ok"}
+                    for rid in payload["ids"]
+                }})
+            batches.append(len(payload))
+            return httpx.Response(200, json={"data": [
+                {"status": "error", "details": {"error": "DeviceNotRegistered"}}
+                if m["to"] == "ExponentPushToken[dead]" else {"status": "ok", "id": f"ticket-{m['to']}"}
+                for m in payload
+            ]})
+
+        monkeypatch.setattr(push.dispatcher, "_client", httpx.AsyncClient(transport=httpx.MockTransport(expo)))
+        monkeypatch.setattr(push.dispatcher, "_session_factory", TestSession)
+
+        from app.core import notify
+        monkeypatch.setattr(notify, "PUSH_JOB_CHUNK", 1)  # one push job per recipient
+        resp = await client.post("/api/v1/admin/notifications/broadcast", json={
+            "title": "Valentine's deals", "body": "20% off roses", "role": "user", "city": "lagos",
+        }, headers=auth_headers(token))
+        assert resp.json()["recipients"] == 2
+        async with TestSession() as check:
+            notes = (await check.execute(
+                select(Notification.user_id).where(Notification.title == "Valentine's deals")
+            )).scalars().all()
+        assert sorted(notes) == sorted([dead.id, gone.id])
+
+        # Tokens are resolved and queued by the outbox push job
+        monkeypatch.setattr(jobs.runner, "_session_factory", TestSession)
+        assert await jobs.runner.run_pending() == 2
+        await push.send_push_many([f"ExponentPushToken[{i}]" for i in range(148)], "Hi", "Promo")
+
+        resp = await client.get("/api/v1/admin/integrations/push", headers=auth_headers(token))
+        assert resp.json()["queued"] == 150
+
+        await push.dispatcher.flush()
+        assert batches == [100, 50]
+        await push.dispatcher.check_receipts(older_than=0)
+        assert push.dispatcher.pending_receipts == {}
+
+        async with TestSession() as check:
+            tokens = (await check.execute(
+                select(User.push_token).where(User.id.in_([dead.id, gone.id]))
+            )).scalars().all()
+        assert tokens == [None, None]
+
+        # Best-effort sends drop on a full queue; the job path refuses so it is retried
+        import asyncio
+        small = push.PushDispatcher(max_queue=1)
+        message = push.build_message("ExponentPushToken[x]", "Hi", "Promo")
+        await small.put(message)
+        assert small.enqueue(message) is False and small.dropped == 1
+        with pytest.raises(asyncio.QueueFull):
+            await small.put(message)
+
 
 class TestAdminSecurity:
     """Verify admin-only access controls."""
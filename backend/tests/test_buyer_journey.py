@@ -22,6 +22,38 @@ class TestBuyerRegistration:
         resp = await client.post("/api/v1/auth/send-otp", json={"phone": "123"})
         assert resp.status_code == 400
 
+    async def test_otp_hashed_rate_limited_and_purged(self, client, db):
+        from datetime import datetime, timedelta
+        from sqlalchemy import select
+        from app.core.otp import purge_expired_otps
+        from app.models.user import OTP
+        phone = "+2348012340000"
+        resp = await client.post("/api/v1/auth/send-otp", json={"phone": phone})
+        code = resp.json()["otp_dev"]
+        stored = (await db.execute(select(OTP).where(OTP.phone == phone))).scalars().first()
+        assert stored.code != code and len(stored.code) == 64
+
+        wrong = "111111" if code == "000000" else "000000"
+        resp = await client.post("/api/v1/auth/verify-otp", json={"phone": phone, "code": wrong})
+        assert resp.status_code == 400
+        resp = await client.post("/api/v1/auth/verify-otp", json={"phone": phone, "code": code})
+        assert resp.status_code == 200
+        resp = await client.post("/api/v1/auth/verify-otp", json={"phone": phone, "code": code})
+        assert resp.status_code == 400  # single use
+
+        # Burst of 5, then throttled without counting rows
+        for _ in range(4):
+            assert (await client.post("/api/v1/auth/send-otp", json={"phone": phone})).status_code == 200
+        assert (await client.post("/api/v1/auth/send-otp", json={"phone": phone})).status_code == 429
+
+        db.expire_all()
+        for otp in (await db.execute(select(OTP))).scalars().all():
+            otp.expires_at = datetime.utcnow() - timedelta(minutes=1)
+        await db.commit()
+        await purge_expired_otps(db)
+        await db.commit()
+        assert (await db.execute(select(OTP))).scalars().first() is None
+
     async def test_login_with_password(self, client, db):
         user = await create_test_user(db)
         resp = await client.post("/api/v1/auth/login", json={
@@ -51,6 +83,21 @@ class TestBuyerRegistration:
         })
         assert resp.status_code in (401, 403)
 
+    async def test_login_upgrades_outdated_password_hash(self, client, db):
+        from app.core.passwords import passwords
+        from app.core.security import pwd_context
+        user = await create_test_user(db)
+        user.password_hash = pwd_context.handler("bcrypt").using(rounds=4).hash("test123")
+        await db.commit()
+        verifies = passwords.verifies
+
+        resp = await client.post("/api/v1/auth/login", json={"phone": user.phone, "password": "test123"})
+        assert resp.status_code == 200
+        await db.refresh(user)
+        assert user.password_hash.startswith("$2b$12$")
+        assert pwd_context.verify("test123", user.password_hash)
+        assert passwords.verifies == verifies + 1 and passwords.rehashes >= 1
+
 
 class TestBuyerBrowsing:
     """Browse products, categories, providers."""
@@ -61,6 +108,34 @@ class TestBuyerBrowsing:
         assert resp.status_code == 200
         assert len(resp.json()) > 0
 
+    async def test_catalog_cache_etag_and_invalidation(self, client, db):
+        from tests.conftest import create_test_admin
+        product = await create_test_product(db)
+        product.is_featured = True
+        await db.commit()
+
+        resp = await client.get("/api/v1/products/categories")
+        etag = resp.headers["etag"]
+        resp = await client.get("/api/v1/products/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+
+        resp = await client.get("/api/v1/products?featured=true")
+        assert resp.json()["total"] == 1
+
+        admin = await create_test_admin(db)
+        token = await get_auth_token(client, admin.phone)
+        resp = await client.post("/api/v1/products/categories", json={"name": "Cakes"}, headers=auth_headers(token))
+        assert resp.status_code == 200
+        resp = await client.delete(f"/api/v1/products/{product.id}", headers=auth_headers(token))
+        assert resp.status_code == 200
+
+        resp = await client.get("/api/v1/products/categories", headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert len(resp.json()) == 2
+        resp = await client.get("/api/v1/products?featured=true")
+        assert resp.json()["total"] == 0
+
     async def test_list_products(self, client, db):
         await create_test_product(db)
         resp = await client.get("/api/v1/products")
@@ -75,17 +150,136 @@ class TestBuyerBrowsing:
         assert resp.status_code == 200
         assert resp.json()["total"] >= 1
 
+    async def test_search_products_prefix_and_description(self, client, db):
+        await create_test_product(db)
+        # "lov" is a prefix of "lovely", which only appears in the description
+        resp = await client.get("/api/v1/products?search=lov")
+        assert resp.status_code == 200
+        assert resp.json()["total"] == 1
+
+        resp = await client.get("/api/v1/products?search=nothing-like-this")
+        assert resp.json()["total"] == 0
+
+    async def test_search_index_follows_product_updates(self, client, db):
+        product = await create_test_product(db)
+        product.name = "Sunflower Hamper"
+        product.description = None
+        await db.commit()
+
+        resp = await client.get("/api/v1/products?search=sunflower")
+        assert resp.json()["total"] == 1
+        resp = await client.get("/api/v1/products?search=gift")
+        assert resp.json()["total"] == 0
+
+    async def test_product_cursor_pagination(self, client, db):
+        from app.models.product import Product
+        first = await create_test_product(db)
+        for i in range(4):
+            db.add(Product(
+                name=f"Gift {i}", price=1000 + i, category_id=first.category_id,
+                vendor_name="Test Vendor", status="active", order_count=i,
+            ))
+        db.add(Product(name="Retired", price=999, category_id=first.category_id,
+                       vendor_name="Test Vendor", status="inactive"))
+        await db.commit()
+
+        seen, cursor = [], None
+        while True:
+            url = "/api/v1/products?sort=price_asc&per_page=2" + (f"&cursor={cursor}" if cursor else "")
+            data = (await client.get(url)).json()
+            seen += [p["price"] for p in data["items"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        assert seen == sorted(seen)
+        assert len(seen) == 5
+        # The cheap total counts active products only
+        assert (await client.get("/api/v1/products?count=estimate")).json()["total"] == 5
+
+        resp = await client.get("/api/v1/products?cursor=not-a-cursor")
+        assert resp.status_code == 400
+
     async def test_get_product_detail(self, client, db):
         product = await create_test_product(db)
         resp = await client.get(f"/api/v1/products/{product.id}")
         assert resp.status_code == 200
         assert resp.json()["name"] == "Test Gift"
 
+    async def test_product_detail_conditional_get(self, client, db):
+        product = await create_test_product(db)
+        url = f"/api/v1/products/{product.id}"
+        resp = await client.get(url)
+        assert resp.headers["cache-control"].startswith("public")
+        etag, last_modified = resp.headers["etag"], resp.headers["last-modified"]
+
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        resp = await client.get(url, headers={"If-Modified-Since": last_modified})
+        assert resp.status_code == 304
+
+        product.price = 5500
+        await db.commit()
+        resp = await client.get(url, headers={"If-None-Match": etag})
+        assert resp.status_code == 200
+        assert resp.json()["price"] == 5500
+
+        resp = await client.get("/api/v1/products/missing")
+        assert resp.status_code == 404
+        assert "etag" not in resp.headers
+
     async def test_list_providers(self, client, db):
         await create_test_provider(db)
         resp = await client.get("/api/v1/providers")
         assert resp.status_code == 200
 
+    async def test_list_providers_by_distance(self, client, db):
+        from app.models.provider import Provider
+        _, no_coords = await create_test_provider(db)
+        user = await create_test_user(db, phone="+2348099999998", role="provider")
+        # Ikeja (~17 km), Yaba (~6 km), Ibadan (~110 km) from Lagos Island
+        for name, lat, lng in [("Ikeja", 6.6018, 3.3515), ("Yaba", 6.5095, 3.3711), ("Ibadan", 7.3775, 3.9470)]:
+            db.add(Provider(
+                user_id=user.id, business_name=name, service_type="Nails",
+                location=name, city="Lagos", status="verified", lat=lat, lng=lng,
+            ))
+        await db.commit()
+
+        resp = await client.get("/api/v1/providers?sort=distance&lat=6.4541&lng=3.3947&radius_km=20")
+        data = resp.json()
+        assert [p["business_name"] for p in data[:2]] == ["Yaba", "Ikeja"]
+        assert data[0]["distance_km"] < data[1]["distance_km"] < 20
+        # Providers without coordinates come last; Ibadan is out of range
+        assert data[2]["id"] == no_coords.id
+        assert len(data) == 3
+
+        resp = await client.get("/api/v1/providers?sort=distance&lat=6.4541&lng=3.3947&radius_km=20&per_page=1&page=2")
+        assert resp.json()[0]["business_name"] == "Ikeja"
+
+    async def test_nearby_providers_snapshot(self, client, db):
+        from app.models.provider import Provider
+        user = await create_test_user(db, phone="+2348099999998", role="provider")
+        yaba = Provider(
+            user_id=user.id, business_name="Yaba", service_type="Nails",
+            location="Yaba", city="Lagos", status="verified", lat=6.5095, lng=3.3711,
+        )
+        db.add(yaba)
+        await db.commit()
+
+        resp = await client.get("/api/v1/providers/nearby?lat=6.4541&lng=3.3947")
+        assert [p["business_name"] for p in resp.json()] == ["Yaba"]
+        assert 6 < resp.json()[0]["distance_km"] < 7
+
+        # Rating changes keep the snapshot; moving the provider refreshes it
+        from app.services.provider_locations import provider_locations
+        yaba.rating = 4.8
+        await db.commit()
+        assert not provider_locations._stale
+        yaba.lat, yaba.lng = 7.3775, 3.9470
+        await db.commit()
+        resp = await client.get("/api/v1/providers/nearby?lat=6.4541&lng=3.3947")
+        assert resp.json() == []
+
 
 class TestBuyerOrdering:
     """Place order → pay → track → cancel."""
@@ -242,6 +436,349 @@ class TestBuyerOrdering:
         )
         assert cancel_resp.status_code == 403
 
+    async def test_order_side_effects_run_from_outbox(self, client, db, monkeypatch):
+        from sqlalchemy import select
+        from app.core import jobs
+        from app.models.job import OutboxJob
+        from app.models.notification import Notification
+        from app.models.payout import Payout
+        from tests.conftest import TestSession
+
+        vendor_user, provider = await create_test_provider(db)
+        user = await create_test_user(db)
+        product = await create_test_product(db, provider_id=provider.id)
+        token = await get_auth_token(client, user.phone)
+
+        order = (await client.post("/api/v1/orders", json={
+            "items": [{"product_id": product.id, "quantity": 1}],
+            "delivery_address": "123 Test St",
+            "delivery_city": "Lagos",
+        }, headers=auth_headers(token))).json()
+        pay = (await client.post("/api/v1/payments/initialize", json={
+            "order_id": order["id"], "amount": order["total"], "method": "wallet",
+        }, headers=auth_headers(token))).json()
+        # A late verify/webhook pass over the paid order changes nothing
+        from app.api.v1.payments import _process_successful_payment
+        from app.models.payment import Payment
+        payment = (await db.execute(select(Payment).where(Payment.reference == pay["reference"]))).scalars().first()
+        await _process_successful_payment(payment, db)
+        await db.commit()
+        await client.post(f"/api/v1/orders/{order['id']}/cancel", headers=auth_headers(token))
+
+        # Same idempotency key as the payment's vendor push — dropped
+        await jobs.enqueue_job(db, "push", {"user_id": vendor_user.id}, key=f"order-paid:{order['id']}")
+        await db.commit()
+
+        kinds = (await db.execute(select(OutboxJob.kind))).scalars().all()
+        assert sorted(kinds) == ["order.cancelled", "push", "push"]
+        vendor_notes = (await db.execute(
+            select(Notification.title).where(Notification.user_id == vendor_user.id)
+        )).scalars().all()
+        assert vendor_notes == ["New Order!"]
+        payouts = (await db.execute(select(Payout.status).where(Payout.order_id == order["id"]))).scalars().all()
+        assert payouts == ["cancelled"]
+
+        monkeypatch.setattr(jobs.runner, "_session_factory", TestSession)
+        # One job at a time — the in-memory test database is a single shared connection
+        while await jobs.runner.run_pending(1):
+            pass
+
+        async with TestSession() as check:
+            statuses = (await check.execute(select(OutboxJob.status))).scalars().all()
+            notes = dict((await check.execute(
+                select(Notification.title, Notification.description).where(Notification.user_id == vendor_user.id)
+            )).all())
+        assert set(statuses) == {"done"}
+        assert sorted(notes) == ["New Order!", "Order Cancelled"]
+        assert notes["Order Cancelled"].endswith("for Test Gift has been cancelled by the buyer.")
+
+        # A rolled-back enqueue doesn't linger to wake some later commit
+        await jobs.enqueue_job(db, "push", {}, key=f"order-paid:{order['id']}")
+        await db.rollback()
+        assert "jobs_enqueued" not in db.sync_session.info
+        assert db.sync_session.info["jobs_listening"]
+
+    async def test_paystack_webhook_stored_once_and_processed_async(self, client, db, monkeypatch):
+        from sqlalchemy import select
+        from app.core import jobs
+        from app.models.order import Order
+        from app.models.payment import Payment, WebhookEvent
+        from app.models.payout import Payout
+        from tests.conftest import TestSession, create_test_admin
+
+        _, provider = await create_test_provider(db)
+        user = await create_test_user(db)
+        product = await create_test_product(db, provider_id=provider.id)
+        token = await get_auth_token(client, user.phone)
+        order = (await client.post("/api/v1/orders", json={
+            "items": [{"product_id": product.id, "quantity": 1}],
+            "delivery_address": "123 Test St",
+            "delivery_city": "Lagos",
+        }, headers=auth_headers(token))).json()
+        reference = (await client.post("/api/v1/payments/initialize", json={
+            "order_id": order["id"], "amount": order["total"],
+        }, headers=auth_headers(token))).json()["reference"]
+
+        event = {"event": "charge.success", "data": {"id": 9001, "reference": reference, "channel": "card"}}
+        resp = await client.post("/api/v1/payments/webhook/paystack", json=event)
+        assert resp.json() == {"status": "ok"}
+        resp = await client.post("/api/v1/payments/webhook/paystack", json=event)  # Paystack retry
+        assert resp.json()["duplicate"] is True
+
+        # Acknowledged before processing
+        payment = (await db.execute(select(Payment).where(Payment.reference == reference))).scalars().first()
+        assert payment.status == "pending"
+
+        monkeypatch.setattr(jobs.runner, "_session_factory", TestSession)
+        while await jobs.runner.run_pending(1):
+            pass
+
+        admin = await create_test_admin(db)
+        admin_token = await get_auth_token(client, admin.phone)
+        events = (await client.get("/api/v1/admin/webhooks", headers=auth_headers(admin_token))).json()
+        assert [(e["event"], e["status"]) for e in events] == [("charge.success", "processed")]
+
+        # Replaying a processed event is harmless
+        resp = await client.post(f"/api/v1/admin/webhooks/{events[0]['id']}/replay", headers=auth_headers(admin_token))
+        assert resp.json()["status"] == "queued"
+        while await jobs.runner.run_pending(1):
+            pass
+
+        async with TestSession() as check:
+            payment = (await check.execute(select(Payment).where(Payment.reference == reference))).scalars().first()
+            status = (await check.execute(select(Order.status).where(Order.id == order["id"]))).scalar()
+            payouts = (await check.execute(select(Payout).where(Payout.order_id == order["id"]))).scalars().all()
+            stored = (await check.execute(select(WebhookEvent.status))).scalars().all()
+        assert payment.status == "success" and payment.channel == "card"
+        assert status == "confirmed"
+        assert len(payouts) == 1
+        assert stored == ["processed"]
+
+    async def test_delivery_tracking_served_from_background_sync(self, client, db, monkeypatch):
+        from datetime import datetime
+        from app.core.config import settings
+        from app.models.delivery import Delivery
+        from app.services import delivery_sync
+
+        user = await create_test_user(db)
+        product = await create_test_product(db)
+        token = await get_auth_token(client, user.phone)
+        orders = []
+        for _ in range(2):
+            orders.append((await client.post("/api/v1/orders", json={
+                "items": [{"product_id": product.id, "quantity": 1}],
+                "delivery_address": "123 Test St",
+                "delivery_city": "Lagos",
+            }, headers=auth_headers(token))).json())
+        riding = Delivery(order_id=orders[0]["id"], user_id=user.id, status="dispatched", kwik_order_id="KW-1")
+        flaky = Delivery(order_id=orders[1]["id"], user_id=user.id, status="dispatched", kwik_order_id="KW-2")
+        db.add_all([riding, flaky])
+        await db.commit()
+
+        calls = []
+
+        async def track(unique_order_id):
+            calls.append(unique_order_id)
+            if unique_order_id == "KW-2":
+                raise Exception("Kwik timeout")
+            return {"status": "started", "status_code": 1, "raw": {"fleet_name": "Tunde"}}
+
+        monkeypatch.setattr(settings, "KWIK_EMAIL", "ops@quickgift.ng")
+        monkeypatch.setattr(delivery_sync.kwik_service, "track_delivery", track)
+
+        assert await delivery_sync.sync_due_deliveries(db) == 2
+        await db.commit()
+        assert riding.status == "in_transit" and riding.kwik_status == "started"
+        # Rider on the road is re-checked sooner than a failed poll is retried
+        now = datetime.utcnow()
+        assert (riding.next_check_at - now).total_seconds() <= 30
+        assert (flaky.next_check_at - now).total_seconds() >= 110
+        assert await delivery_sync.sync_due_deliveries(db) == 0
+
+        resp = await client.get(f"/api/v1/delivery/track/{orders[0]['id']}", headers=auth_headers(token))
+        assert resp.json()["status"] == "in_transit"
+        assert resp.json()["kwik_status"] == "started"
+        assert resp.json()["kwik_raw"] == {"fleet_name": "Tunde"}
+        assert sorted(calls) == ["KW-1", "KW-2"]  # tracking did not call Kwik
+
+        # Rows another worker has leased are skipped until the lease runs out
+        riding.next_check_at = flaky.next_check_at = None
+        await db.commit()
+        assert len(await delivery_sync._lease_due(db, datetime.utcnow(), 10)) == 2
+        assert await delivery_sync.sync_due_deliveries(db) == 0
+        assert len(calls) == 2
+
+    async def test_delivery_quotes_cached_coalesced_and_estimated(self, client, db, monkeypatch):
+        import asyncio
+        from app.core.config import settings
+        from app.services import delivery_quotes
+
+        user = await create_test_user(db)
+        token = await get_auth_token(client, user.phone)
+        calls = []
+
+        async def get_quote(**kwargs):
+            calls.append(kwargs["delivery_lat"])
+            await asyncio.sleep(0.5 if kwargs["delivery_lat"] > 7 else 0.05)
+            return {"amount": 2300, "currency": "NGN"}
+
+        monkeypatch.setattr(settings, "KWIK_EMAIL", "ops@quickgift.ng")
+        monkeypatch.setattr(settings, "DELIVERY_QUOTE_TIMEOUT", 0.2)
+        monkeypatch.setattr(delivery_quotes.kwik_service, "get_quote", get_quote)
+
+        def quote(delivery_lat, delivery_lng=3.4700):
+            return client.post("/api/v1/delivery/quote", json={
+                "pickup_address": "Florist, Yaba", "pickup_lat": 6.5095, "pickup_lng": 3.3711,
+                "delivery_address": "Lekki Phase 1", "delivery_lat": delivery_lat, "delivery_lng": delivery_lng,
+            }, headers=auth_headers(token))
+
+        # Two checkouts a few metres apart share one in-flight Kwik request
+        first, second = await asyncio.gather(quote(6.4474), quote(6.44741))
+        assert first.json()["amount"] == second.json()["amount"] == 2300
+        assert len(calls) == 1
+        resp = await quote(6.4474)
+        assert resp.json() == {"amount": 2300, "currency": "NGN", "source": "kwik", "cached": True}
+        assert len(calls) == 1
+
+        # Kwik too slow for checkout: distance estimate now, cache filled for next time
+        resp = await quote(7.3775, 3.9470)  # Ibadan, ~110 km
+        assert resp.json()["source"] == "estimate"
+        assert resp.json()["amount"] > 10000
+        await asyncio.gather(*delivery_quotes._inflight.values())
+        resp = await quote(7.3775, 3.9470)
+        assert resp.json()["source"] == "kwik" and resp.json()["cached"] is True
+
+    async def test_kwik_token_refresh_is_single_flight(self, monkeypatch):
+        import asyncio
+        import json
+        import httpx
+        from app.services import kwik
+
+        logins = []
+
+        async def login():
+            logins.append(1)
+            await asyncio.sleep(0.05)
+            return {"access_token": f"t{len(logins)}", "vendor_id": 7, "user_id": 9, "form_id": 2}
+
+        def respond(request):
+            token = json.loads(request.content)["access_token"]
+            if token == "t1":  # first token expires on Kwik's side
+                return httpx.Response(200, json={"status": 101, "message": "Session expired"})
+            return httpx.Response(200, json={"status": 200, "data": {"token": token}})
+
+        mock = httpx.AsyncClient(base_url="https://kwik.test", transport=httpx.MockTransport(respond))
+        monkeypatch.setattr(kwik, "login", login)
+        monkeypatch.setattr(kwik, "_get_client", lambda: mock)
+        monkeypatch.setattr(kwik, "tokens", kwik.TokenManager())
+
+        results = await asyncio.gather(*(kwik.get_bill_breakdown(2500) for _ in range(20)))
+        # One login to start, one more when Kwik rejects that token — not one per request
+        assert len(logins) == 2
+        assert all(r == {"token": "t2"} for r in results)
+        await mock.aclose()
+
+    async def test_vendor_deliveries_batched_into_multi_stop_task(self, client, db, monkeypatch):
+        from datetime import datetime, timedelta
+        from app.core.config import settings
+        from app.models.order import Order
+        from app.services import delivery_batching
+
+        user = await create_test_user(db)
+        product = await create_test_product(db)
+        token = await get_auth_token(client, user.phone)
+        tasks = []
+
+        async def get_multi_quote(pickup, deliveries, vehicle_id=0):
+            return {"amount": 4500, "currency": "NGN"}
+
+        later = datetime.utcnow() + timedelta(seconds=601)
+
+        async def create_multi_delivery(pickup, deliveries, **kwargs):
+            if not tasks:
+                # Another worker running the same pass meanwhile finds the stops claimed,
+                # and the buyer can't cancel a stop mid-dispatch
+                assert await delivery_batching.dispatch_batches(db, now=later) == 0
+                resp = await client.post(f"/api/v1/delivery/cancel/{order_ids[0]}", headers=auth_headers(token))
+                assert resp.status_code == 409
+            tasks.append([d["address"] for d in deliveries])
+            return {"unique_order_id": f"KW-{len(tasks)}", "job_id": "J", "delivery_job_ids": []}
+
+        monkeypatch.setattr(settings, "KWIK_EMAIL", "ops@quickgift.ng")
+        monkeypatch.setattr(settings, "DELIVERY_BATCH_WINDOW", 600)
+        monkeypatch.setattr(delivery_batching.kwik_service, "get_multi_quote", get_multi_quote)
+        monkeypatch.setattr(delivery_batching.kwik_service, "create_multi_delivery", create_multi_delivery)
+
+        # Florist in Yaba; drop-offs listed far-to-near
+        drops = [("Lekki", 6.4474, 3.4700), ("Ikoyi", 6.4541, 3.4347), ("Surulere", 6.5000, 3.3550)]
+        order_ids = []
+        for address, lat, lng in drops:
+            order = (await client.post("/api/v1/orders", json={
+                "items": [{"product_id": product.id, "quantity": 1}],
+                "delivery_address": address,
+                "delivery_city": "Lagos",
+            }, headers=auth_headers(token))).json()
+            (await db.get(Order, order["id"])).payment_status = "paid"
+            await db.commit()
+            resp = await client.post("/api/v1/delivery/create", json={
+                "order_id": order["id"],
+                "pickup_address": "Florist, Yaba", "pickup_lat": 6.5095, "pickup_lng": 3.3711,
+                "pickup_name": "Bloom", "pickup_phone": "+2348010000000",
+                "delivery_address": address, "delivery_lat": lat, "delivery_lng": lng,
+                "delivery_name": "Ada", "delivery_phone": "+2348020000000",
+            }, headers=auth_headers(token))
+            assert resp.json()["status"] == "pending"
+            order_ids.append(order["id"])
+
+        # Still inside the window: nothing sent yet
+        assert await delivery_batching.dispatch_batches(db) == 0
+        assert await delivery_batching.dispatch_batches(db, now=later) == 3
+        await db.commit()
+        assert tasks == [["Surulere", "Ikoyi", "Lekki"]]
+
+        resp = await client.get(f"/api/v1/delivery/track/{order_ids[0]}", headers=auth_headers(token))
+        assert resp.json()["status"] == "dispatched"
+        assert resp.json()["delivery_fee"] == 1500
+
+        # No per-drop job ids: cancelling one stop must not cancel the whole route
+        resp = await client.post(f"/api/v1/delivery/cancel/{order_ids[0]}", headers=auth_headers(token))
+        assert resp.status_code == 400
+
+        # One Kwik poll per task; a drop delivered early is marked on its own
+        from sqlalchemy import select
+        from app.models.delivery import Delivery
+        from app.services import delivery_sync
+        polls = []
+
+        async def track(unique_order_id):
+            polls.append(unique_order_id)
+            return {"status": "started", "drops": {"D1": "ended"}, "raw": {}}
+
+        monkeypatch.setattr(delivery_sync.kwik_service, "track_delivery", track)
+        stops = (await db.execute(select(Delivery).order_by(Delivery.stop_sequence))).scalars().all()
+        for stop in stops:
+            stop.kwik_job_id, stop.next_check_at = f"D{stop.stop_sequence}", None
+        await db.commit()
+        assert await delivery_sync.sync_due_deliveries(db) == 3
+        await db.commit()
+        assert polls == ["KW-1"]
+        assert [s.status for s in stops] == ["delivered", "in_transit", "in_transit"]
+
+        # An express order left pending by a failed dispatch is retried on its own
+        order = (await client.post("/api/v1/orders", json={
+            "items": [{"product_id": product.id, "quantity": 1}],
+            "delivery_address": "Yaba", "delivery_city": "Lagos", "is_express": True,
+        }, headers=auth_headers(token))).json()
+        (await db.get(Order, order["id"])).payment_status = "paid"
+        db.add(Delivery(
+            order_id=order["id"], user_id=user.id, status="pending",
+            pickup_address="Florist, Yaba", pickup_lat=6.5095, pickup_lng=3.3711, pickup_phone="+2348010000000",
+            delivery_address="Yaba", delivery_lat=6.5100, delivery_lng=3.3700,
+        ))
+        await db.commit()
+        assert await delivery_batching.dispatch_batches(db) == 1
+        assert tasks[-1] == ["Yaba"]
+
 
 class TestBuyerReviews:
     """Leave review after delivery."""
@@ -279,6 +816,37 @@ class TestBuyerReviews:
         assert resp.status_code == 400
         assert "already reviewed" in resp.json()["detail"].lower()
 
+    async def test_rating_aggregate_summary(self, client, db):
+        from tests.conftest import create_test_admin
+        product = await create_test_product(db)
+        for phone, rating in [("+2348011111111", 5), ("+2348022222222", 4), ("+2348033333333", 2)]:
+            user = await create_test_user(db, phone=phone)
+            token = await get_auth_token(client, phone)
+            resp = await client.post("/api/v1/reviews", json={
+                "target_type": "product", "target_id": product.id, "rating": rating,
+            }, headers=auth_headers(token))
+            assert resp.status_code == 200
+        review_id = resp.json()["id"]
+
+        resp = await client.get(f"/api/v1/reviews/product/{product.id}?include_summary=true")
+        data = resp.json()
+        assert len(data["reviews"]) == 3
+        assert data["summary"] == {
+            "average": 3.7, "count": 3, "histogram": {"1": 0, "2": 1, "3": 0, "4": 1, "5": 1},
+        }
+
+        admin = await create_test_admin(db)
+        admin_token = await get_auth_token(client, admin.phone)
+        resp = await client.delete(f"/api/v1/reviews/{review_id}", headers=auth_headers(admin_token))
+        assert resp.status_code == 200
+        detail = (await client.get(f"/api/v1/products/{product.id}")).json()
+        assert (detail["rating"], detail["review_count"]) == (4.5, 2)
+
+        resp = await client.post("/api/v1/admin/ratings/reconcile", headers=auth_headers(admin_token))
+        assert resp.json()["aggregates_rebuilt"] == 1
+        summary = (await client.get(f"/api/v1/reviews/product/{product.id}?include_summary=true")).json()["summary"]
+        assert summary["histogram"] == {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1}
+
     async def test_invalid_rating(self, client, db):
         user = await create_test_user(db)
         product = await create_test_product(db)
@@ -290,3 +858,37 @@ class TestBuyerReviews:
             "rating": 6,
         }, headers=auth_headers(token))
         assert resp.status_code == 400
+
+
+class TestBuyerInbox:
+    """Notifications, chats and wallet history page with cursors."""
+
+    async def test_notifications_cursor_header(self, client, db):
+        from app.models.notification import Notification
+        user = await create_test_user(db)
+        for i in range(3):
+            db.add(Notification(user_id=user.id, title=f"Note {i}", type="system"))
+        await db.commit()
+        token = await get_auth_token(client, user.phone)
+
+        resp = await client.get("/api/v1/notifications?per_page=2", headers=auth_headers(token))
+        assert resp.status_code == 200
+        assert len(resp.json()) == 2
+        cursor = resp.headers["X-Next-Cursor"]
+
+        resp = await client.get(f"/api/v1/notifications?per_page=2&cursor={cursor}", headers=auth_headers(token))
+        assert len(resp.json()) == 1
+        assert "X-Next-Cursor" not in resp.headers
+
+    async def test_chats_and_transactions_list(self, client, db):
+        user = await create_test_user(db)
+        token = await get_auth_token(client, user.phone)
+        await client.post("/api/v1/chats", json={
+            "provider_id": user.id, "provider_name": "Shop", "initial_message": "Hi",
+        }, headers=auth_headers(token))
+
+        resp = await client.get("/api/v1/chats", headers=auth_headers(token))
+        assert resp.status_code == 200
+        assert len(resp.json()) == 1
+        resp = await client.get("/api/v1/wallet/transactions", headers=auth_headers(token))
+        assert resp.status_code == 200
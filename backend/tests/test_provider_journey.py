@@ -58,6 +58,69 @@ class TestProviderRegistration:
         assert resp.status_code == 200
         assert resp.json()["name"] == "Gel Manicure"
 
+    async def test_upload_image_validated_off_event_loop_with_variants(self, client, db, monkeypatch):
+        import threading
+        import cloudinary.uploader
+        user, provider = await create_test_provider(db)
+        token = await get_auth_token(client, user.phone)
+        uploads = []
+
+        def fake_upload(file, **kwargs):
+            uploads.append((threading.current_thread().name, len(file.read())))
+            assert kwargs["eager_async"] and len(kwargs["eager"]) == 4
+            return {"secure_url": "https://res.cloudinary.com/demo/image/upload/v1/quickgift/nails.png"}
+
+        monkeypatch.setattr(cloudinary.uploader, "upload", fake_upload)
+        png = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+
+        resp = await client.post("/api/v1/upload/image", files={"file": ("nails.png", png, "image/png")},
+                                 headers=auth_headers(token))
+        assert resp.status_code == 200
+        assert resp.json()["url"].endswith("nails.png")
+        thread, size = uploads[0]
+        assert thread.startswith("upload") and size == len(png)
+        variants = resp.json()["variants"]
+        assert variants["thumb"] == (
+            "https://res.cloudinary.com/demo/image/upload/"
+            "c_fill,g_auto,w_200,h_200,f_webp,q_auto/v1/quickgift/nails.png"
+        )
+        assert set(variants) == {"thumb", "medium", "large", "placeholder"}
+
+        provider.avatar_url = resp.json()["url"]
+        await db.commit()
+        resp = await client.get("/api/v1/providers/me", headers=auth_headers(token))
+        assert resp.json()["avatar_variants"] == variants
+
+        # Renamed non-image and oversized files are rejected before reaching Cloudinary
+        resp = await client.post("/api/v1/upload/image", files={"file": ("x.png", b"<html>", "image/png")},
+                                 headers=auth_headers(token))
+        assert resp.status_code == 400
+        big = b"\x89PNG\r\n\x1a\n" + b"\x00" * (5 * 1024 * 1024)
+        resp = await client.post("/api/v1/upload/image", files={"file": ("big.png", big, "image/png")},
+                                 headers=auth_headers(token))
+        assert resp.status_code == 400
+        # Well past the limit: refused from Content-Length before the form is parsed
+        resp = await client.post("/api/v1/upload/image", files={"file": ("big.png", big * 2, "image/png")},
+                                 headers=auth_headers(token))
+        assert resp.status_code == 413
+
+        # Without Content-Length the body is cut off once it passes the limit
+        sent = []
+
+        async def chunked():
+            yield b'--b\r\nContent-Disposition: form-data; name="file"; filename="big.png"\r\n'
+            yield b"Content-Type: image/png\r\n\r\n\x89PNG\r\n\x1a\n"
+            for _ in range(8):
+                sent.append(1)
+                yield b"\x00" * (1024 * 1024)
+
+        resp = await client.post("/api/v1/upload/image", content=chunked(), headers={
+            **auth_headers(token), "Content-Type": "multipart/form-data; boundary=b",
+        })
+        assert resp.status_code == 413
+        assert len(sent) < 8
+        assert len(uploads) == 1
+
 
 class TestProviderApproval:
     """Admin approves/rejects provider."""
@@ -132,6 +195,33 @@ class TestProviderOrders:
         resp = await client.get("/api/v1/orders/my-vendor-orders", headers=auth_headers(provider_token))
         assert resp.status_code == 200
 
+    async def test_provider_identity_cached_across_requests(self, client, db):
+        from sqlalchemy import event
+        from app.core import security
+        from tests.conftest import test_engine
+        user, provider = await create_test_provider(db)
+        token = await get_auth_token(client, user.phone)
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(test_engine.sync_engine, "before_cursor_execute", record)
+        try:
+            await client.get("/api/v1/orders/my-vendor-orders", headers=auth_headers(token))
+            assert any("FROM providers" in s for s in statements)
+            statements.clear()
+            resp = await client.get("/api/v1/orders/my-vendor-orders", headers=auth_headers(token))
+            assert resp.status_code == 200
+            assert not any("FROM providers" in s for s in statements)
+        finally:
+            event.remove(test_engine.sync_engine, "before_cursor_execute", record)
+        assert token in security._verified_tokens
+
+        # A profile change drops the cached lookup
+        await client.patch("/api/v1/providers/me", json={"bio": "New bio"}, headers=auth_headers(token))
+        assert await security.CurrentUser(user_id=user.id)._cached_provider_id() is None
+
     async def test_provider_updates_order_status(self, client, db):
         user, provider = await create_test_provider(db)
         product = await create_test_product(db, provider_id=provider.id)